@@ -1,3 +1,10 @@
 from django.test import TestCase
 
-# Create your tests here.
+from home.tests.presupuesto_consultas import PresupuestoConsultasMixin
+
+
+class PresupuestoConsultasGerTests(PresupuestoConsultasMixin, TestCase):
+    app = 'ger'
+    omitidas = {
+        'gerson': "falta la plantilla gerson2.html",
+    }
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Asistencia, Fecha
+from .models import Asistencia, Clasificacion, Fecha, MovimientoPuntos, TotalPuntos
 
 class AsistenciaAdmin(admin.ModelAdmin):
     list_display = ('nickname', 'apodo', 'puntos', 'puntos_acumulados', 'grupo', 'fecha',)
@@ -15,8 +15,41 @@ class FechaAdmin(admin.ModelAdmin):
     ordering = ('-fecha',)
     
     def total_asistencias(self, obj):
-        return obj.asistencias.count()
+        return Asistencia.objects.filter(dia=obj.fecha).count()
     total_asistencias.short_description = 'Total de asistencias'
 
+class ClasificacionAdmin(admin.ModelAdmin):
+    list_display = ('posicion', 'nickname', 'puntos_acumulados', 'grupo', 'dia_registro', 'hora_registro')
+    list_filter = ('grupo',)
+    search_fields = ('nickname',)
+    ordering = ('posicion',)
+
+class MovimientoPuntosAdmin(admin.ModelAdmin):
+    list_display = ('creado', 'nickname', 'delta', 'motivo', 'dia', 'asistencia_id')
+    list_filter = ('motivo',)
+    search_fields = ('nickname',)
+    ordering = ('-id',)
+
+    # El libro solo admite movimientos nuevos: las correcciones son otro movimiento
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+class TotalPuntosAdmin(admin.ModelAdmin):
+    list_display = ('nickname', 'total')
+    search_fields = ('nickname',)
+    ordering = ('-total',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 admin.site.register(Asistencia, AsistenciaAdmin)
-admin.site.register(Fecha, FechaAdmin)
\ No newline at end of file
+admin.site.register(Clasificacion, ClasificacionAdmin)
+admin.site.register(Fecha, FechaAdmin)
+admin.site.register(MovimientoPuntos, MovimientoPuntosAdmin)
+admin.site.register(TotalPuntos, TotalPuntosAdmin)
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+Almacenamiento de imágenes por contenido.
+
+Cada archivo subido se guarda una sola vez bajo su hash SHA-256
+(ej: avatars/3f/3fa9...c1.jpg), calculado mientras se escribe. Si el mismo contenido
+ya existe, la subida reutiliza el archivo existente en lugar de crear una copia.
+
+Cada archivo lleva un contador de referencias (home.models.ArchivoContenido) que se
+mantiene con señales en los modelos registrados con registrar_referencias(). Cuando
+ningún registro lo usa, el archivo se borra del disco.
+
+La subida y el guardado del registro que la usa son dos pasos: entre ambos el archivo
+tiene 0 referencias. Para que otro proceso no lo borre justo entonces, cada subida
+anota su hora (ArchivoContenido.subido) y solo se borran los archivos sin referencias
+subidos hace más de ARCHIVOS_GRACIA_SEGUNDOS. Los que siguen sin referencias pasado
+ese tiempo (un formulario que falló tras subir la imagen, un borrado dentro del plazo)
+los borra el comando limpiar_archivos.
+
+Subir y borrar toman el mismo cerrojo sobre la fila de ArchivoContenido: el borrado
+vuelve a comprobar las referencias con la fila bloqueada, y una subida que no encuentra
+la fila vuelve a escribir el archivo.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils.deconstruct import deconstructible
+
+from home.miniaturas import borrar_variantes
+
+
+# Imágenes cuyas miniaturas conservan la proporción en lugar de recortarse al cuadrado
+DIRECTORIOS_SIN_RECORTE = ('banner_images/',)
+
+
+def _modelo_archivo():
+    return apps.get_model('home', 'ArchivoContenido')
+
+
+@deconstructible
+class AlmacenamientoPorContenido(FileSystemStorage):
+    """FileSystemStorage que nombra cada archivo por el hash de su contenido."""
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre definitivo lo decide _save según el contenido
+        return name
+
+    def _save(self, name, content):
+        directorio, nombre_original = posixpath.split(name)
+        extension = os.path.splitext(nombre_original)[1].lower()
+        os.makedirs(self.path(directorio), exist_ok=True)
+
+        # Calcular el hash mientras se escribe a un archivo temporal (sin cargarlo entero en memoria)
+        hasher = hashlib.sha256()
+        tamano = 0
+        descriptor, temporal = tempfile.mkstemp(dir=self.path(directorio), prefix='.subida-')
+        try:
+            with os.fdopen(descriptor, 'wb') as destino:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for bloque in content.chunks():
+                    hasher.update(bloque)
+                    destino.write(bloque)
+                    tamano += len(bloque)
+
+            digest = hasher.hexdigest()
+            nombre = posixpath.join(directorio, digest[:2], digest + extension)
+            ruta = self.path(nombre)
+            with transaction.atomic():
+                # Con la fila bloqueada nadie la borra (ni su archivo) hasta el commit
+                ArchivoContenido = _modelo_archivo()
+                archivo = ArchivoContenido.objects.select_for_update().filter(nombre=nombre).first()
+                # Sin fila el archivo puede estar borrándose: se escribe de nuevo
+                nuevo = archivo is None or not os.path.exists(ruta)
+                if nuevo:
+                    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+                    os.replace(temporal, ruta)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(ruta, self.file_permissions_mode)
+                if archivo is None:
+                    try:
+                        with transaction.atomic():
+                            ArchivoContenido.objects.create(nombre=nombre, sha256=digest, tamano=tamano)
+                    except IntegrityError:
+                        # Otra subida del mismo contenido creó la fila a la vez
+                        ArchivoContenido.objects.filter(nombre=nombre).update(subido=datetime.now())
+                else:
+                    ArchivoContenido.objects.filter(pk=archivo.pk).update(subido=datetime.now())
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+
+        if nuevo:
+            # Generar las miniaturas en segundo plano (los banners no se recortan al cuadrado)
+            from home.tasks import generar_miniaturas
+            recortar = not nombre.startswith(DIRECTORIOS_SIN_RECORTE)
+            transaction.on_commit(lambda: generar_miniaturas.delay(nombre, recortar))
+        return nombre
+
+
+almacenamiento_por_contenido = AlmacenamientoPorContenido()
+
+
+def sumar_referencias(nombres):
+    """
+    Incrementa el contador de referencias de los archivos dados.
+
+    Args:
+        nombres: Iterable de nombres de archivo (se cuentan los repetidos); se ignoran
+                 los vacíos y los que no están almacenados por contenido
+    """
+    ArchivoContenido = _modelo_archivo()
+    for nombre, cantidad in Counter(n for n in nombres if n).items():
+        ArchivoContenido.objects.filter(nombre=nombre).update(referencias=F('referencias') + cantidad)
+
+
+def restar_referencias(nombres):
+    """
+    Decrementa el contador de referencias de los archivos dados y, tras el commit,
+    borra del disco los que ya no usa nadie.
+    """
+    ArchivoContenido = _modelo_archivo()
+    conteo = Counter(n for n in nombres if n)
+    for nombre, cantidad in conteo.items():
+        ArchivoContenido.objects.filter(nombre=nombre).update(referencias=F('referencias') - cantidad)
+    if conteo:
+        transaction.on_commit(lambda: borrar_sin_referencias(list(conteo)))
+
+
+def borrar_sin_referencias(nombres=None):
+    """
+    Borra los archivos que no usa ningún registro y no se subieron en los últimos
+    ARCHIVOS_GRACIA_SEGUNDOS.
+
+    Args:
+        nombres: Archivos a comprobar, o None para todos
+
+    Returns:
+        Número de archivos borrados
+    """
+    ArchivoContenido = _modelo_archivo()
+    limite = datetime.now() - timedelta(seconds=getattr(settings, 'ARCHIVOS_GRACIA_SEGUNDOS', 600))
+    candidatos = ArchivoContenido.objects.filter(referencias__lte=0, subido__lt=limite)
+    if nombres is not None:
+        candidatos = candidatos.filter(nombre__in=nombres)
+
+    borrados = 0
+    for pk in candidatos.values_list('pk', flat=True):
+        with transaction.atomic():
+            # Volver a comprobarlo con la fila bloqueada: una subida o una referencia
+            # nueva pudo llegar después de la consulta anterior
+            archivo = ArchivoContenido.objects.select_for_update().filter(
+                pk=pk, referencias__lte=0, subido__lt=limite
+            ).first()
+            if archivo is None:
+                continue
+            almacenamiento_por_contenido.delete(archivo.nombre)
+            borrar_variantes(almacenamiento_por_contenido, archivo.nombre)
+            archivo.delete()
+            borrados += 1
+    return borrados
+
+
+def registrar_referencias(modelo, *campos):
+    """
+    Mantiene el contador de referencias de los campos de archivo indicados del modelo:
+    suma al guardar un archivo nuevo y resta al reemplazarlo o al borrar el registro.
+    """
+    def _nombres(instancia):
+        return {campo: getattr(instancia, campo).name or '' for campo in campos}
+
+    def antes_de_guardar(sender, instance, update_fields=None, **kwargs):
+        if update_fields is not None and not set(campos) & set(update_fields):
+            # Guardado parcial que no toca los archivos: nada que contar
+            instance._archivos_anteriores = None
+            return
+        anteriores = {}
+        if instance.pk is not None:
+            anteriores = sender.objects.filter(pk=instance.pk).values(*campos).first() or {}
+        instance._archivos_anteriores = anteriores
+
+    def despues_de_guardar(sender, instance, **kwargs):
+        anteriores = getattr(instance, '_archivos_anteriores', None)
+        if anteriores is None:
+            return
+        actuales = _nombres(instance)
+        cambiados = [c for c in campos if (anteriores.get(c) or '') != actuales[c]]
+        sumar_referencias(actuales[c] for c in cambiados)
+        restar_referencias(anteriores.get(c) for c in cambiados)
+        instance._archivos_anteriores = actuales
+
+    def despues_de_borrar(sender, instance, **kwargs):
+        restar_referencias(_nombres(instance).values())
+
+    uid = f'referencias_archivo_{modelo._meta.label_lower}'
+    pre_save.connect(antes_de_guardar, sender=modelo, weak=False, dispatch_uid=uid)
+    post_save.connect(despues_de_guardar, sender=modelo, weak=False, dispatch_uid=uid)
+    post_delete.connect(despues_de_borrar, sender=modelo, weak=False, dispatch_uid=uid)
@@ -0,0 +1,163 @@
+"""
+Caché versionada de la clasificación (puntos_generales).
+
+Cada entrada se guarda bajo una clave que incluye un contador global de versión.
+Cualquier cambio en Asistencia o Fecha incrementa ese contador (ver home.signals),
+de modo que invalidar toda la clasificación cuesta una sola operación y las entradas
+antiguas simplemente dejan de leerse hasta que caducan.
+
+Las tablas de cada grupo se guardan además ya renderizadas (fragmentos HTML) bajo una
+huella de su contenido, no de la versión: si tras un cambio solo cambia el grupo C, las
+tablas de A y B se siguen sirviendo desde la caché.
+
+verificar_nickname guarda además los datos de cada jugador poco tiempo
+(JUGADOR_CACHE_TIMEOUT) bajo una clave por nickname y día; cualquier registro de
+asistencia del jugador borra su entrada (ver home.signals).
+
+Funciona con cualquier backend de caché de Django (memoria local, archivos, Redis...).
+Con una caché por proceso (LocMemCache) el contador solo cambia en el proceso que hizo
+el cambio: los demás siguen leyendo su copia, así que las entradas caducan a los
+CLASIFICACION_CACHE_TIMEOUT_PROCESO segundos en lugar de a los CLASIFICACION_CACHE_TIMEOUT.
+"""
+import hashlib
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+CLAVE_VERSION = 'clasificacion:version'
+
+
+def cache_compartida():
+    """
+    Indica si la caché por defecto la comparten todos los procesos.
+
+    LocMemCache guarda una copia por proceso y DummyCache no guarda nada: los avisos entre
+    workers que dependen de la caché (recálculo en espera, versión de la instantánea)
+    solo funcionan con un backend compartido (Redis, Memcached, base de datos, archivos).
+    """
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def version_contador(clave):
+    """
+    Devuelve el valor actual de un contador de versión de la caché, inicializándolo si no existe.
+
+    Args:
+        clave: Clave del contador
+    """
+    version = cache.get(clave)
+    if version is None:
+        # Partir de la hora actual evita reutilizar versiones viejas si la clave se pierde
+        cache.add(clave, int(time.time() * 1000), timeout=None)
+        version = cache.get(clave)
+    return version
+
+
+def incrementar_contador(clave):
+    """
+    Incrementa un contador de versión de la caché.
+
+    Returns:
+        El nuevo valor, o None si el contador no existía y se creó uno nuevo
+    """
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        # La clave no existía: se crea una versión nueva, mayor que cualquiera anterior
+        version_contador(clave)
+        return None
+
+
+def version_clasificacion():
+    """Devuelve la versión actual de la clasificación en caché."""
+    return version_contador(CLAVE_VERSION)
+
+
+def invalidar_clasificacion():
+    """Invalida todas las clasificaciones en caché incrementando la versión global."""
+    return incrementar_contador(CLAVE_VERSION)
+
+
+def _timeout_clasificacion():
+    """Segundos que se guarda una clasificación o un fragmento (pocos si la caché es de cada proceso)."""
+    if cache_compartida():
+        return getattr(settings, 'CLASIFICACION_CACHE_TIMEOUT', 3600)
+    return getattr(settings, 'CLASIFICACION_CACHE_TIMEOUT_PROCESO', 30)
+
+
+def obtener_clasificacion(clave, calcular):
+    """
+    Devuelve la clasificación en caché para la clave dada o la calcula y la guarda.
+
+    Args:
+        clave: Identificador de la vista de clasificación (ej: 'ultima', 'fecha_id:3')
+        calcular: Función sin argumentos que calcula los datos si no están en caché
+
+    Returns:
+        Los datos de la clasificación (lo que devuelva calcular)
+    """
+    clave_cache = f'clasificacion:{version_clasificacion()}:{clave}'
+    datos = cache.get(clave_cache)
+    if datos is None:
+        datos = calcular()
+        cache.set(clave_cache, datos, _timeout_clasificacion())
+    return datos
+
+
+def clave_fragmento(vista, grupo, contenido):
+    """
+    Clave de caché de la tabla renderizada de un grupo.
+
+    Args:
+        vista: Identificador de la vista de clasificación (ej: 'ultima', 'fecha_id:3')
+        grupo: Letra del grupo
+        contenido: Valores que muestra la tabla (cualquier cambio produce otra clave)
+    """
+    huella = hashlib.sha1(repr(contenido).encode('utf-8')).hexdigest()
+    return f'clasificacion:fragmento:{vista}:{grupo}:{huella}'
+
+
+def obtener_fragmentos(claves):
+    """Fragmentos HTML en caché: diccionario clave -> HTML (sin las claves que falten)."""
+    return cache.get_many(list(claves))
+
+
+def guardar_fragmentos(fragmentos):
+    """Guarda fragmentos HTML (diccionario clave -> HTML)."""
+    if fragmentos:
+        cache.set_many(fragmentos, _timeout_clasificacion())
+
+
+def clave_jugador(nickname, dia):
+    """Clave de caché de los datos de un jugador en un día (registro_hoy depende del día)."""
+    huella = hashlib.sha1(nickname.encode('utf-8')).hexdigest()
+    return f'jugador:{dia.isoformat()}:{huella}'
+
+
+def obtener_jugador(nickname, dia, calcular):
+    """
+    Devuelve los datos de un jugador en caché o los calcula y los guarda.
+
+    Args:
+        nickname: Jugador consultado
+        dia: Día de la consulta (forma parte de la clave)
+        calcular: Función sin argumentos que devuelve los datos si no están en caché
+
+    Returns:
+        Lo que devuelva calcular (también si el jugador no existe, para no repetir la consulta)
+    """
+    clave = clave_jugador(nickname, dia)
+    datos = cache.get(clave)
+    if datos is None:
+        datos = calcular()
+        cache.set(clave, datos, getattr(settings, 'JUGADOR_CACHE_TIMEOUT', 60))
+    return datos
+
+
+def invalidar_jugador(nickname):
+    """Borra los datos en caché de un jugador para el día de hoy."""
+    cache.delete(clave_jugador(nickname, date.today()))
@@ -0,0 +1,116 @@
+"""
+Datos sintéticos reproducibles para medir rendimiento (comando medir_rendimiento) y
+para las pruebas de número de consultas.
+
+Con la misma semilla y los mismos tamaños se generan siempre los mismos jugadores,
+fechas, asistencias, usuarios y perfiles.
+"""
+import random
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from home.fechas import invalidar_fechas
+from home.models import Asistencia, Clasificacion, Fecha, MovimientoPuntos
+from users.busqueda import indexar_usuarios
+from users.indice_nicknames import invalidar_indice
+from users.models import CreateUser, Perfil
+
+
+def nickname_de(indice):
+    """Nickname del jugador sintético número `indice`."""
+    return f"Lobo{indice:05d}"
+
+
+@transaction.atomic
+def sembrar_datos(jugadores=200, fechas=30, envios_por_dia=2, usuarios=100, asistencia=0.8, semilla=42, hasta=None):
+    """
+    Crea un conjunto de datos sintético.
+
+    Args:
+        jugadores: Número de jugadores (nicknames) distintos
+        fechas: Número de días de evento (Fecha), terminando en `hasta`
+        envios_por_dia: Máximo de envíos de asistencia de un jugador en un mismo día
+        usuarios: Número de usuarios registrados (con perfil); usan los primeros nicknames
+        asistencia: Probabilidad de que un jugador asista a cada día
+        semilla: Semilla del generador aleatorio
+        hasta: Último día de evento (por defecto hoy)
+
+    Returns:
+        Diccionario con los totales creados y la lista de 'nicknames'
+    """
+    rng = random.Random(semilla)
+    hasta = hasta or date.today()
+    dias = [hasta - timedelta(days=n) for n in range(fechas - 1, -1, -1)]
+
+    Fecha.objects.bulk_create([
+        Fecha(nombre=f"Día {numero}", fecha=dia, activa=True) for numero, dia in enumerate(dias, 1)
+    ])
+    # bulk_create no dispara señales: descartar el registro de fechas en caché
+    transaction.on_commit(invalidar_fechas)
+
+    # Asistencias: los puntos acumulados se calculan en orden cronológico por jugador
+    nicknames = [nickname_de(i) for i in range(jugadores)]
+    registros = []
+    for nickname in nicknames:
+        apodo = f"El {nickname}"
+        acumulado = 0
+        for dia in dias:
+            if rng.random() >= asistencia:
+                continue
+            minutos = sorted(rng.sample(range(18 * 60, 22 * 60 + 50), rng.randint(1, envios_por_dia)))
+            for minuto in minutos:
+                puntos = rng.randint(1, 20)
+                acumulado += puntos
+                fecha = datetime.combine(dia, time(minuto // 60, minuto % 60))
+                registros.append(Asistencia(
+                    nickname=nickname, apodo=apodo, puntos=puntos, puntos_acumulados=acumulado,
+                    fecha=fecha, dia=dia, grupo='C',
+                ))
+    Asistencia.objects.bulk_create(registros, batch_size=1000)
+    # bulk_create no dispara señales: anotar los puntos en el libro aquí
+    MovimientoPuntos.registrar([
+        MovimientoPuntos(
+            nickname=registro.nickname, dia=registro.dia, delta=registro.puntos,
+            motivo=MovimientoPuntos.REGISTRO, asistencia_id=registro.pk,
+        )
+        for registro in registros
+    ])
+    Clasificacion.reconstruir()
+
+    # Usuarios y perfiles (bulk_create no llama a CreateUser.save, que crea el perfil)
+    clave = make_password('medir_rendimiento')
+    cuentas = CreateUser.objects.bulk_create([
+        CreateUser(
+            username=nickname_de(i).lower(), nickname=nickname_de(i), password=clave,
+            pais='Perú', ciudad='Lima', estado_cpl='', modo_de_juego='',
+            lv_audi=rng.randint(1, 99),
+        )
+        for i in range(usuarios)
+    ], batch_size=1000)
+    # bulk_create no dispara señales: recargar el índice de autocompletado
+    transaction.on_commit(invalidar_indice)
+    if cuentas and cuentas[0].pk is None:
+        # Motores que no devuelven la clave primaria en bulk_create
+        cuentas = list(CreateUser.objects.filter(username__in=[c.username for c in cuentas]))
+    indexar_usuarios(cuentas)
+    Perfil.objects.bulk_create([
+        Perfil(
+            user=cuenta, nickname=cuenta.nickname, nickname_orden=cuenta.nickname, nivel=rng.randint(1, 60),
+            puntos_exp=rng.randint(0, 99), puntos_honor=rng.randint(0, 500),
+        )
+        for cuenta in cuentas
+    ], batch_size=1000)
+
+    por_jugador = defaultdict(int)
+    for registro in registros:
+        por_jugador[registro.nickname] += 1
+    return {
+        'jugadores': len(por_jugador),
+        'fechas': len(dias),
+        'asistencias': len(registros),
+        'usuarios': len(cuentas),
+        'nicknames': sorted(por_jugador),
+    }
@@ -0,0 +1,53 @@
+"""
+Registro en caché de las fechas de evento (Fecha).
+
+Las fechas cambian muy pocas veces (el staff crea una por día de evento), pero
+registrar_asistencia, puntos_generales y los formularios las consultan en cada
+petición. registro_fechas() las lee una sola vez, las guarda en la caché y devuelve:
+    - activas: fechas activas, de la más reciente a la más antigua
+    - ultima_activa: la fecha activa más reciente (o None)
+    - por_dia: día -> Fecha (todas, activas o no)
+    - por_id: id -> Fecha (todas)
+
+Guardar o borrar una Fecha borra la entrada de la caché (ver home.signals). Con una
+caché por proceso (LocMemCache) eso solo llega al proceso que hizo el cambio, así que
+la entrada caduca a los FECHAS_CACHE_TIMEOUT segundos; con una caché compartida se
+guarda sin caducidad.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from home.cache import cache_compartida
+from home.models import Fecha
+
+CLAVE_FECHAS = 'fechas:registro'
+
+
+class RegistroFechas:
+    """Todas las fechas de evento con los índices que usan las vistas."""
+
+    def __init__(self, fechas):
+        """
+        Args:
+            fechas: Iterable de instancias de Fecha
+        """
+        todas = sorted(fechas, key=lambda fecha: fecha.fecha, reverse=True)
+        self.activas = [fecha for fecha in todas if fecha.activa]
+        self.ultima_activa = self.activas[0] if self.activas else None
+        self.por_dia = {fecha.fecha: fecha for fecha in todas}
+        self.por_id = {fecha.pk: fecha for fecha in todas}
+
+
+def registro_fechas():
+    """Devuelve el registro de fechas desde la caché, leyéndolo de la base de datos si no está."""
+    registro = cache.get(CLAVE_FECHAS)
+    if registro is None:
+        registro = RegistroFechas(Fecha.objects.all())
+        timeout = None if cache_compartida() else getattr(settings, 'FECHAS_CACHE_TIMEOUT', 30)
+        cache.set(CLAVE_FECHAS, registro, timeout=timeout)
+    return registro
+
+
+def invalidar_fechas():
+    """Borra el registro de la caché; la próxima petición lo vuelve a leer."""
+    cache.delete(CLAVE_FECHAS)
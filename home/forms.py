@@ -1,5 +1,6 @@
 from django import forms
 from .models import Asistencia, Fecha
+from .fechas import registro_fechas
 from django.utils import timezone
 
 class AsistenciaForm(forms.ModelForm):
@@ -36,6 +37,17 @@ class AsistenciaForm(forms.ModelForm):
         # Por defecto, establecer la fecha y hora actual
         self.fields['fecha'].initial = timezone.now()
 
+    def validate_unique(self):
+        # Repetir nickname y fecha no es un error: registrar_o_actualizar suma los puntos al
+        # registro existente. Solo se omite esa restricción (excluyendo 'fecha', que no forma
+        # parte de ninguna otra); las demás comprobaciones de unicidad siguen activas
+        exclude = self._get_validation_exclusions()
+        exclude.add('fecha')
+        try:
+            self.instance.validate_unique(exclude=exclude)
+        except forms.ValidationError as e:
+            self._update_errors(e)
+
 
 class FechaForm(forms.ModelForm):
     class Meta:
@@ -49,8 +61,21 @@ class FechaForm(forms.ModelForm):
     
     def clean_fecha(self):
         fecha = self.cleaned_data.get('fecha')
-        # Verificar si ya existe una fecha con el mismo valor
-        if Fecha.objects.filter(fecha=fecha).exists():
+        # Verificar si ya existe otra fecha con el mismo valor (registro de fechas en caché;
+        # al editar, la propia fecha no cuenta)
+        existente = registro_fechas().por_dia.get(fecha)
+        if existente is not None and existente.pk != self.instance.pk:
             raise forms.ValidationError("Ya existe un registro para esta fecha")
         return fecha
-    
\ No newline at end of file
+    
+
+class ImportarAsistenciasForm(forms.Form):
+    archivo = forms.FileField(
+        help_text="CSV con cabecera o JSONL con los campos nickname, apodo, puntos y fecha",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.jsonl,.json'}),
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        label="Solo validar (no guardar)",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
@@ -0,0 +1,199 @@
+"""
+Importación masiva de asistencias desde CSV o JSONL.
+
+Cada fila se valida con AsistenciaForm (mismas reglas que registrar_asistencia) y
+todas las filas válidas se aplican en una sola transacción con bulk_create/bulk_update.
+Los puntos acumulados de los jugadores afectados se recalculan en una sola pasada, los
+puntos importados se anotan en el libro de puntos (MovimientoPuntos) y la clasificación
+se reconstruye una única vez al final.
+"""
+import csv
+import io
+import json
+import logging
+from collections import defaultdict
+
+from django.db import connections, transaction
+
+from home.almacenamiento import sumar_referencias
+from home.cache import invalidar_jugador
+from home.forms import AsistenciaForm
+from home.models import Asistencia, Clasificacion, MovimientoPuntos
+
+logger = logging.getLogger('asistencia_debug')
+
+CAMPOS_IMPORTACION = ['nickname', 'apodo', 'puntos', 'fecha']
+
+
+def leer_filas(archivo, formato=None):
+    """
+    Lee las filas de un archivo CSV (con cabecera) o JSONL (un objeto por línea).
+
+    Args:
+        archivo: Archivo abierto en modo binario o texto
+        formato: 'csv' o 'jsonl'; si es None se deduce del nombre del archivo
+
+    Returns:
+        Lista de tuplas (número de línea, diccionario con los datos de la fila)
+    """
+    if formato is None:
+        nombre = getattr(archivo, 'name', '') or ''
+        formato = 'jsonl' if nombre.lower().endswith(('.jsonl', '.json')) else 'csv'
+
+    contenido = archivo.read()
+    if isinstance(contenido, bytes):
+        contenido = contenido.decode('utf-8-sig')
+
+    filas = []
+    if formato == 'jsonl':
+        for linea, texto in enumerate(contenido.splitlines(), 1):
+            if not texto.strip():
+                continue
+            try:
+                datos = json.loads(texto)
+            except json.JSONDecodeError as e:
+                datos = {'__error__': f"JSON inválido: {e}"}
+            filas.append((linea, datos))
+    else:
+        lector = csv.DictReader(io.StringIO(contenido))
+        # La línea 1 es la cabecera
+        for linea, datos in enumerate(lector, 2):
+            filas.append((linea, datos))
+    return filas
+
+
+def invalidar_jugadores(nicknames):
+    """Borra los datos en caché de varios jugadores (llamar tras el commit)."""
+    for nickname in nicknames:
+        invalidar_jugador(nickname)
+
+
+def importar_asistencias(filas, dry_run=False):
+    """
+    Valida e importa filas de asistencia.
+
+    Si algún jugador ya tiene un registro en la misma fecha, los puntos se suman a ese
+    registro (igual que registrar_o_actualizar). Las filas con errores se omiten y se
+    informan; el resto se aplica.
+
+    Args:
+        filas: Lista de tuplas (número de línea, diccionario de datos), ver leer_filas
+        dry_run: Si es True, valida y calcula el resultado sin escribir nada
+
+    Returns:
+        Diccionario con 'validas', 'creados', 'actualizados', 'jugadores' y
+        'errores' (lista de {'linea', 'errores'})
+    """
+    resultado = {'validas': 0, 'creados': 0, 'actualizados': 0, 'jugadores': 0, 'errores': []}
+
+    # Validar cada fila con las reglas del formulario y agrupar por (nickname, fecha)
+    puntos_por_registro = defaultdict(int)
+    apodo_por_registro = {}
+    for linea, datos in filas:
+        if not isinstance(datos, dict) or '__error__' in datos:
+            error = datos.get('__error__') if isinstance(datos, dict) else "La fila debe ser un objeto"
+            resultado['errores'].append({'linea': linea, 'errores': {'__all__': [{'message': error, 'code': 'invalid'}]}})
+            continue
+        form = AsistenciaForm({campo: datos.get(campo) for campo in CAMPOS_IMPORTACION})
+        if not form.is_valid():
+            resultado['errores'].append({'linea': linea, 'errores': form.errors.get_json_data()})
+            continue
+        clave = (form.cleaned_data['nickname'], form.cleaned_data['fecha'])
+        puntos_por_registro[clave] += form.cleaned_data['puntos']
+        if form.cleaned_data['apodo']:
+            apodo_por_registro[clave] = form.cleaned_data['apodo']
+        resultado['validas'] += 1
+
+    nicknames = {nickname for nickname, _ in puntos_por_registro}
+    resultado['jugadores'] = len(nicknames)
+    if not puntos_por_registro:
+        return resultado
+
+    with transaction.atomic():
+        # Todos los registros de los jugadores afectados, en una sola consulta
+        existentes = {}
+        por_jugador = defaultdict(list)
+        consulta = Asistencia.objects.filter(nickname__in=nicknames)
+        if not dry_run:
+            # Solo se bloquean los registros que se van a escribir: un dry-run no retiene a nadie
+            consulta = consulta.select_for_update()
+        for registro in consulta.order_by('nickname', 'fecha'):
+            existentes[(registro.nickname, registro.fecha)] = registro
+            por_jugador[registro.nickname].append(registro)
+
+        nuevos = []
+        actualizados = set()
+        for (nickname, fecha), puntos in puntos_por_registro.items():
+            apodo = apodo_por_registro.get((nickname, fecha))
+            registro = existentes.get((nickname, fecha))
+            if registro:
+                registro.puntos += puntos
+                if apodo:
+                    registro.apodo = apodo
+                actualizados.add(registro.pk)
+            else:
+                # bulk_create no llama a save(): calcular aquí el día de registro
+                registro = Asistencia(
+                    nickname=nickname, apodo=apodo or '', puntos=puntos, fecha=fecha, dia=fecha.date(), grupo='C'
+                )
+                nuevos.append(registro)
+                por_jugador[nickname].append(registro)
+
+        # Recalcular puntos acumulados de cada jugador afectado en una sola pasada
+        for registros in por_jugador.values():
+            registros.sort(key=lambda r: r.fecha)
+            acumulado = 0
+            anterior = None
+            for registro in registros:
+                acumulado += registro.puntos
+                if registro.pk is None and anterior is not None:
+                    # Igual que crear_nuevo_registro: heredar grupo, avatar y apodo del registro anterior
+                    registro.grupo = anterior.grupo
+                    registro.avatar = registro.avatar or anterior.avatar
+                    registro.apodo = registro.apodo or anterior.apodo
+                if registro.pk is not None and registro.puntos_acumulados != acumulado:
+                    actualizados.add(registro.pk)
+                registro.puntos_acumulados = acumulado
+                anterior = registro
+
+        cambiados = [r for registros in por_jugador.values() for r in registros if r.pk in actualizados]
+        resultado['creados'] = len(nuevos)
+        resultado['actualizados'] = len(cambiados)
+
+        if dry_run:
+            logger.debug("Importación (dry-run): %s nuevos, %s actualizados, %s errores", resultado['creados'], resultado['actualizados'], len(resultado['errores']))
+            return resultado
+
+        Asistencia.objects.bulk_create(nuevos, batch_size=500)
+        if nuevos and not connections[Asistencia.objects.db].features.can_return_rows_from_bulk_insert:
+            # MySQL no devuelve la clave primaria en bulk_create: leerla por (nickname, fecha), que es única
+            ids = {
+                (nickname, fecha): pk for nickname, fecha, pk in Asistencia.objects.filter(
+                    nickname__in={r.nickname for r in nuevos}, fecha__in={r.fecha for r in nuevos},
+                ).values_list('nickname', 'fecha', 'pk')
+            }
+            for registro in nuevos:
+                registro.pk = ids[(registro.nickname, registro.fecha)]
+        # bulk_create no dispara señales: contar aquí los avatares heredados
+        sumar_referencias(registro.avatar.name for registro in nuevos)
+        Asistencia.objects.bulk_update(cambiados, ['puntos', 'puntos_acumulados', 'apodo'], batch_size=500)
+
+        # Los puntos importados se anotan en el libro, un movimiento por registro
+        por_clave = {(r.nickname, r.fecha): r for r in nuevos}
+        por_clave.update(existentes)
+        MovimientoPuntos.registrar([
+            MovimientoPuntos(
+                nickname=nickname, dia=fecha.date(), delta=puntos, motivo=MovimientoPuntos.IMPORTACION,
+                asistencia_id=por_clave[(nickname, fecha)].pk,
+            )
+            for (nickname, fecha), puntos in puntos_por_registro.items()
+        ])
+
+        # bulk_create/bulk_update no disparan señales: reasignar grupos una sola vez al final
+        # (reconstruir también recarga tras el commit la tabla de posiciones y su índice de nicknames)
+        Clasificacion.reconstruir()
+        # ...y borrar tras el commit los datos en caché de cada jugador importado (verificar_nickname)
+        transaction.on_commit(lambda: invalidar_jugadores(nicknames))
+
+    logger.debug("Importación aplicada: %s nuevos, %s actualizados, %s errores", resultado['creados'], resultado['actualizados'], len(resultado['errores']))
+    return resultado
@@ -0,0 +1,260 @@
+"""
+Instantánea de la clasificación en un archivo compartido por todos los procesos.
+
+Tras cada recálculo de la clasificación se escribe un archivo binario con un registro
+de tamaño fijo por jugador, en orden de posición. Cada worker de gunicorn lo abre con
+mmap en solo lectura: el sistema operativo comparte esas páginas entre procesos, así
+que consultar el ranking no cuesta consultas a la base de datos ni memoria propia de
+cada worker.
+
+Formato (little-endian):
+    cabecera   CABECERA: firma, formato, tamaño de registro, versión, jugadores, bytes de nombres
+    registros  REGISTRO por jugador, en orden de posición: asistencia_id (0 = ninguna),
+               inicio y longitud del nickname, puntos acumulados, día (ordinal),
+               hora de registro (microsegundos desde 1970) y grupo
+    índice     Número de registro de cada jugador, en el orden alfabético de
+               home.models.clave_nickname (búsqueda binaria, también por prefijo)
+    nombres    Nicknames en UTF-8, uno detrás de otro
+
+El archivo se escribe completo con otro nombre y se cambia por el anterior con
+os.replace, que es atómico: un lector ve siempre la instantánea vieja o la nueva, nunca
+una a medias. Los procesos que ya tenían la vieja abierta la siguen leyendo hasta que
+vuelven a abrir la ruta.
+"""
+import heapq
+import mmap
+import os
+import struct
+import threading
+from datetime import date, datetime, timedelta
+
+from home.models import clave_nickname, limites_de_prefijo, rangos_de_grupo
+
+FIRMA = b'WLVC'
+# 2: el índice pasa a ordenarse sin distinguir mayúsculas (los archivos de formato 1 se ignoran)
+FORMATO = 2
+
+CABECERA = struct.Struct('<4sHHQII')
+REGISTRO = struct.Struct('<QIHiiqc1x')
+INDICE = struct.Struct('<I')
+
+# Origen de las horas de registro guardadas como microsegundos
+EPOCA = datetime(1970, 1, 1)
+
+
+def _microsegundos(hora):
+    return (hora.replace(tzinfo=None) - EPOCA) // timedelta(microseconds=1)
+
+
+def escribir_instantanea(ruta, jugadores, version):
+    """
+    Escribe la instantánea de forma atómica.
+
+    Args:
+        ruta: Archivo de destino
+        jugadores: Lista de diccionarios (nickname, puntos_acumulados, dia_registro,
+                   hora_registro, asistencia_id, grupo) en orden de posición
+        version: Versión de la clasificación a la que corresponden los datos
+
+    Returns:
+        Número de bytes escritos
+    """
+    nombres = bytearray()
+    registros = bytearray()
+    for jugador in jugadores:
+        nombre = jugador['nickname'].encode('utf-8')
+        registros += REGISTRO.pack(
+            jugador['asistencia_id'] or 0, len(nombres), len(nombre), jugador['puntos_acumulados'],
+            jugador['dia_registro'].toordinal(), _microsegundos(jugador['hora_registro']),
+            jugador['grupo'].encode('ascii'),
+        )
+        nombres += nombre
+
+    indice = bytearray()
+    for numero in sorted(range(len(jugadores)), key=lambda numero: clave_nickname(jugadores[numero]['nickname'])):
+        indice += INDICE.pack(numero)
+
+    datos = CABECERA.pack(FIRMA, FORMATO, REGISTRO.size, version, len(jugadores), len(nombres))
+    datos += registros + indice + nombres
+
+    directorio = os.path.dirname(ruta) or '.'
+    os.makedirs(directorio, exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as archivo:
+        archivo.write(datos)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(temporal, ruta)
+    return len(datos)
+
+
+class Instantanea:
+    """
+    Lectura de una instantánea mapeada en memoria.
+
+    Ofrece las mismas consultas que home.tabla_posiciones.TablaPosiciones (posicion,
+    grupo, rango, pagina, del_grupo, todos, con_prefijo), todas sin copiar el archivo.
+    """
+
+    def __init__(self, mapa):
+        firma, formato, tamano_registro, version, cantidad, tamano_nombres = CABECERA.unpack_from(mapa, 0)
+        if firma != FIRMA or formato != FORMATO or tamano_registro != REGISTRO.size:
+            raise ValueError("El archivo no es una instantánea de la clasificación válida")
+        self.version = version
+        self._mapa = mapa
+        self._cantidad = cantidad
+        self._registros = CABECERA.size
+        self._indice = self._registros + cantidad * REGISTRO.size
+        self._nombres = self._indice + cantidad * INDICE.size
+        if len(mapa) < self._nombres + tamano_nombres:
+            raise ValueError("Instantánea de la clasificación incompleta")
+
+    def __len__(self):
+        return self._cantidad
+
+    def _registro(self, numero):
+        """Campos del registro `numero` (0 es el primero de la clasificación)."""
+        return REGISTRO.unpack_from(self._mapa, self._registros + numero * REGISTRO.size)
+
+    def _nombre(self, registro):
+        inicio = self._nombres + registro[1]
+        return self._mapa[inicio:inicio + registro[2]]
+
+    def _nombre_en_indice(self, lugar):
+        """Número de registro y nickname (bytes) del lugar `lugar` del índice alfabético."""
+        numero = INDICE.unpack_from(self._mapa, self._indice + lugar * INDICE.size)[0]
+        return numero, self._nombre(self._registro(numero))
+
+    def _primer_lugar(self, clave):
+        """Primer lugar del índice cuyo nickname no es menor que `clave` (ver clave_nickname)."""
+        bajo, alto = 0, self._cantidad
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            if clave_nickname(self._nombre_en_indice(medio)[1].decode('utf-8')) < clave:
+                bajo = medio + 1
+            else:
+                alto = medio
+        return bajo
+
+    def _buscar(self, nickname):
+        """Número de registro de un jugador (búsqueda binaria en el índice), o None."""
+        lugar = self._primer_lugar(clave_nickname(nickname))
+        if lugar < self._cantidad:
+            numero, nombre = self._nombre_en_indice(lugar)
+            if nombre == nickname.encode('utf-8'):
+                return numero
+        return None
+
+    def posicion(self, nickname):
+        """Posición (1, 2, 3...) de un jugador, o None si no está en la instantánea."""
+        numero = self._buscar(nickname)
+        return numero + 1 if numero is not None else None
+
+    def grupo(self, nickname):
+        """Grupo guardado para un jugador, o None."""
+        numero = self._buscar(nickname)
+        return self._registro(numero)[6].decode('ascii') if numero is not None else None
+
+    def rango(self, desde, hasta=None):
+        """
+        Jugadores entre dos posiciones (ambas incluidas).
+
+        Returns:
+            Lista de diccionarios con los datos del jugador más 'posicion' y 'grupo'
+        """
+        fin = self._cantidad if hasta is None else min(hasta, self._cantidad)
+        return [self._jugador(numero) for numero in range(max(desde, 1) - 1, fin)]
+
+    def _jugador(self, numero):
+        """Datos del jugador del registro `numero`, con 'posicion' y 'grupo'."""
+        registro = self._registro(numero)
+        asistencia_id, _, _, puntos, dia, hora, grupo = registro
+        return {
+            'nickname': self._nombre(registro).decode('utf-8'),
+            'puntos_acumulados': puntos,
+            'dia_registro': date.fromordinal(dia),
+            'hora_registro': EPOCA + timedelta(microseconds=hora),
+            'asistencia_id': asistencia_id or None,
+            'posicion': numero + 1,
+            'grupo': grupo.decode('ascii'),
+        }
+
+    def pagina(self, numero, tamano=50):
+        """Página `numero` (empezando en 1) del ranking, con `tamano` jugadores por página."""
+        desde = (numero - 1) * tamano + 1
+        return self.rango(desde, desde + tamano - 1)
+
+    def del_grupo(self, grupo):
+        """Jugadores de un grupo (A, B o C) en orden de posición."""
+        for letra, desde, hasta in rangos_de_grupo():
+            if letra == grupo:
+                return self.rango(desde, hasta)
+        return []
+
+    def todos(self):
+        """Todos los jugadores en orden de posición."""
+        return self.rango(1)
+
+    def con_prefijo(self, prefijo, limite=10):
+        """
+        Jugadores cuyo nickname empieza por `prefijo` (sin distinguir mayúsculas).
+
+        Igual que TablaPosiciones.con_prefijo: los nicknames con el prefijo están seguidos
+        en el índice alfabético; si hay más que `limite`, antes se recorre el ranking desde
+        el primer puesto (con el mismo presupuesto de pasos) hasta encontrar `limite`.
+
+        Returns:
+            Los `limite` mejor clasificados, en orden de posición
+        """
+        limites = limites_de_prefijo(prefijo)
+        if limites is None:
+            return []
+        desde, hasta = limites
+        inicio = self._primer_lugar(desde)
+        fin = self._cantidad if hasta is None else self._primer_lugar(hasta)
+        numeros = []
+        if fin - inicio > limite:
+            presupuesto = (fin - inicio) * self._cantidad.bit_length()
+            for numero in range(min(presupuesto, self._cantidad)):
+                if self._nombre(self._registro(numero)).decode('utf-8').casefold().startswith(desde[0]):
+                    numeros.append(numero)
+                    if len(numeros) == limite:
+                        break
+        if len(numeros) < limite:
+            numeros = heapq.nsmallest(limite, (self._nombre_en_indice(lugar)[0] for lugar in range(inicio, fin)))
+        return [self._jugador(numero) for numero in numeros]
+
+
+# Instantánea abierta por este proceso: (ruta, identidad del archivo, Instantanea)
+_abierta = None
+_cerrojo = threading.Lock()
+
+
+def abrir_instantanea(ruta):
+    """
+    Devuelve la instantánea de la ruta, mapeándola de nuevo solo si el archivo cambió.
+
+    Returns:
+        Instantanea, o None si el archivo no existe o no es válido
+    """
+    global _abierta
+    try:
+        estado = os.stat(ruta)
+    except OSError:
+        return None
+    identidad = (estado.st_ino, estado.st_mtime_ns, estado.st_size)
+
+    abierta = _abierta
+    if abierta is not None and abierta[0] == ruta and abierta[1] == identidad:
+        return abierta[2]
+
+    with _cerrojo:
+        try:
+            with open(ruta, 'rb') as archivo:
+                # El mapa sigue siendo válido después de cerrar el archivo (y de que se reemplace)
+                mapa = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+            instantanea = Instantanea(mapa)
+        except (OSError, ValueError, struct.error):
+            return None
+        _abierta = (ruta, identidad, instantanea)
+    return instantanea
@@ -0,0 +1,364 @@
+"""
+Logging sin bloqueo para el logger 'asistencia_debug'.
+
+Las vistas y modelos solo ponen cada registro en una cola en memoria (ColaHandler); un
+hilo aparte (QueueListener) los escribe a disco, así una petición nunca espera por la
+escritura del archivo. Cada proceso (worker de gunicorn, worker de Celery) escribe en su
+propio archivo rotativo, ej: logs/asistencia_debug.12345.log, para que varios procesos
+no se pisen al rotar. Cada proceso nuevo borra al arrancar los archivos de procesos que
+llevan días sin escribir y, si entre todos pasan del tamaño máximo, los más antiguos.
+Nunca borra el archivo abierto de un proceso que sigue vivo: seguiría escribiendo en un
+archivo sin nombre y sus mensajes se perderían.
+
+Se configura desde settings.LOGGING (ver wolves/settings.py). Con el nivel por encima
+de DEBUG, cada logger.debug() cuesta solo la comprobación del nivel: los mensajes usan
+argumentos (logger.debug("... %s", valor)) y nunca se formatean si no se van a escribir.
+"""
+import atexit
+import glob
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+
+def archivo_de_proceso(archivo, pid=None):
+    """
+    Nombre del archivo de log de un proceso.
+
+    Args:
+        archivo: Ruta base, ej: logs/asistencia_debug.log
+        pid: Id del proceso (por defecto el actual)
+
+    Returns:
+        La ruta con el pid antes de la extensión, ej: logs/asistencia_debug.12345.log
+    """
+    base, extension = os.path.splitext(archivo)
+    return f"{base}.{pid or os.getpid()}{extension}"
+
+
+def archivos_de_log(archivo, rotados=False):
+    """
+    Archivos de log de todos los procesos, del más reciente al más antiguo.
+
+    Args:
+        archivo: Ruta base, ej: logs/asistencia_debug.log
+        rotados: Si es True incluye también los archivos rotados (.log.1, .log.2...)
+    """
+    base, extension = os.path.splitext(archivo)
+    candidatos = set(glob.glob(f"{glob.escape(base)}.*{extension}"))
+    if rotados:
+        candidatos.update(glob.glob(f"{glob.escape(base)}*{extension}.[0-9]*"))
+    if os.path.exists(archivo):
+        # Archivo único de antes del log por proceso
+        candidatos.add(archivo)
+    return sorted(candidatos, key=os.path.getmtime, reverse=True)
+
+
+def proceso_vivo(pid):
+    """Indica si existe un proceso con ese id (en esta máquina)."""
+    if pid <= 0:
+        # os.kill(0, ...) se refiere al grupo de procesos, no a un proceso
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Existe, pero es de otro usuario
+        return True
+    return True
+
+
+class ColaHandler(QueueHandler):
+    """
+    QueueHandler que escribe en un RotatingFileHandler por proceso desde un hilo aparte.
+
+    El hilo se arranca con el primer mensaje de cada proceso (también en los procesos
+    hijos creados con fork, donde el hilo del padre no existe) y se detiene al salir,
+    escribiendo lo que quede en la cola.
+    """
+
+    def __init__(self, archivo, max_bytes=5 * 1024 * 1024, backup_count=5, retencion_dias=7,
+                 max_total_bytes=50 * 1024 * 1024, tamano_cola=10000):
+        """
+        Args:
+            archivo: Ruta base del log; cada proceso añade su pid al nombre
+            max_bytes: Tamaño a partir del cual se rota el archivo
+            backup_count: Número de archivos rotados que se conservan por proceso
+            retencion_dias: Los logs de procesos que no se han escrito en estos días se borran
+            max_total_bytes: Tamaño máximo de los logs de todos los procesos juntos; al
+                             arrancar un proceso se borran los más antiguos que sobren
+            tamano_cola: Mensajes en espera como máximo; si la cola está llena se descartan
+        """
+        super().__init__(queue.Queue(tamano_cola))
+        self.archivo = str(archivo)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.retencion_dias = retencion_dias
+        self.max_total_bytes = max_total_bytes
+        self.formato_archivo = None
+        self.descartados = 0
+        self._pid = None
+        self._listener = None
+        self._arranque = threading.Lock()
+
+    def setFormatter(self, fmt):
+        # El formato (fecha, nivel...) lo aplica el hilo escritor, no la petición
+        self.formato_archivo = fmt
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._iniciar()
+        super().emit(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Nunca bloquear la petición: si el disco no da abasto, se pierde el mensaje
+            self.descartados += 1
+
+    def _iniciar(self):
+        with self._arranque:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Proceso hijo (fork): la cola y el hilo heredados son del padre
+                self.queue = queue.Queue(self.queue.maxsize)
+            os.makedirs(os.path.dirname(self.archivo) or '.', exist_ok=True)
+            self._borrar_antiguos()
+            destino = RotatingFileHandler(
+                archivo_de_proceso(self.archivo), maxBytes=self.max_bytes,
+                backupCount=self.backup_count, encoding='utf-8', delay=True,
+            )
+            destino.setFormatter(self.formato_archivo)
+            self._listener = QueueListener(self.queue, destino, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.detener)
+
+    def _borrar_antiguos(self):
+        """
+        Borra los logs (y sus rotados) de procesos que llevan retencion_dias sin escribir y,
+        si los que quedan ocupan más de max_total_bytes, los más antiguos hasta no pasar
+        de ese tamaño. El archivo actual (sin rotar) de un proceso vivo no se borra nunca,
+        aunque ocupa sitio en el total.
+        """
+        limite = time.time() - self.retencion_dias * 86400 if self.retencion_dias else None
+        base, extension = os.path.splitext(self.archivo)
+        patron_abierto = re.compile(rf'{re.escape(base)}\.(\d+){re.escape(extension)}')
+        archivos = []
+        for ruta in glob.glob(f"{glob.escape(base)}.*{extension}*"):
+            abierto = patron_abierto.fullmatch(ruta)
+            en_uso = abierto is not None and proceso_vivo(int(abierto.group(1)))
+            try:
+                # Otro proceso puede estar borrando los mismos archivos a la vez
+                estado = os.stat(ruta)
+                if limite is not None and estado.st_mtime < limite and not en_uso:
+                    os.remove(ruta)
+                else:
+                    archivos.append((estado.st_mtime, estado.st_size, ruta, en_uso))
+            except OSError:
+                pass
+        if not self.max_total_bytes:
+            return
+        # Del más reciente al más antiguo: se conservan mientras quepan
+        total = 0
+        for _, tamano, ruta, en_uso in sorted(archivos, reverse=True):
+            total += tamano
+            if total > self.max_total_bytes and not en_uso:
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+
+    def detener(self):
+        """Escribe los mensajes pendientes y detiene el hilo escritor del proceso actual."""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            for destino in self._listener.handlers:
+                destino.close()
+            self._listener = None
+            self._pid = None
+
+    def close(self):
+        self.detener()
+        super().close()
+
+
+class FiltroMuestreo(logging.Filter):
+    """
+    Deja pasar solo una fracción de los mensajes de nivel DEBUG.
+
+    Los mensajes INFO o superiores se escriben siempre.
+    """
+
+    def __init__(self, proporcion=1.0, name=''):
+        """
+        Args:
+            proporcion: Fracción de mensajes DEBUG que se escriben (1.0 = todos, 0.1 = uno de cada diez)
+        """
+        super().__init__(name)
+        self.proporcion = float(proporcion)
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.proporcion >= 1.0:
+            return True
+        return random.random() < self.proporcion
+
+
+# Lectura de los logs (vista ver_debug_logs)
+
+# Tamaño de los bloques leídos desde el final del archivo
+TAMANO_BLOQUE = 64 * 1024
+
+# Formato de cada línea: "2025-07-04 21:30:00,123 - DEBUG - mensaje"
+PATRON_LINEA = re.compile(r'^(\d{4}-\d{2}-\d{2} [\d:,]+) - ([A-Z]+) - (.*)$')
+
+
+def lineas_hacia_atras(ruta, fin=None, bloque=TAMANO_BLOQUE):
+    """
+    Recorre las líneas de un archivo desde el final hacia el principio.
+
+    Lee bloques de tamaño fijo desde el final, así la memoria usada depende del
+    bloque y de la línea más larga, no del tamaño del archivo.
+
+    Args:
+        ruta: Ruta del archivo
+        fin: Posición (en bytes) desde la que se lee hacia atrás; None para el final
+        bloque: Bytes leídos en cada lectura
+
+    Yields:
+        Tuplas (posición en bytes donde empieza la línea, texto de la línea)
+    """
+    with open(ruta, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        posicion = f.tell() if fin is None else min(fin, f.tell())
+        resto = b''
+        while posicion > 0:
+            leer = min(bloque, posicion)
+            posicion -= leer
+            f.seek(posicion)
+            datos = f.read(leer) + resto
+            lineas = datos.split(b'\n')
+            # La primera línea puede estar cortada: se completa con el bloque anterior
+            resto = lineas.pop(0)
+            inicio = posicion + len(datos)
+            for linea in reversed(lineas):
+                inicio -= len(linea) + 1
+                if linea:
+                    yield inicio + 1, linea.decode('utf-8', 'replace')
+        if resto:
+            yield 0, resto.decode('utf-8', 'replace')
+
+
+def lineas_desde(ruta, inicio, limite_bytes=TAMANO_BLOQUE * 4):
+    """
+    Líneas completas escritas a partir de una posición (para seguir el log en vivo).
+
+    Args:
+        ruta: Ruta del archivo
+        inicio: Posición en bytes desde la que se lee
+        limite_bytes: Bytes leídos como máximo en una llamada
+
+    Returns:
+        Tupla (lista de (posición, línea), posición donde continuar la próxima vez)
+    """
+    with open(ruta, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if inicio > f.tell():
+            # El archivo se rotó: empezar de nuevo desde el principio
+            inicio = 0
+        f.seek(inicio)
+        datos = f.read(limite_bytes)
+    completo = datos.rfind(b'\n') + 1
+    lineas = []
+    posicion = inicio
+    for linea in datos[:completo].split(b'\n')[:-1]:
+        if linea:
+            lineas.append((posicion, linea.decode('utf-8', 'replace')))
+        posicion += len(linea) + 1
+    return lineas, inicio + completo
+
+
+def parsear_linea(linea, posicion=None):
+    """
+    Convierte una línea del log en un diccionario para la plantilla.
+
+    Returns:
+        Diccionario con timestamp, level, message, is_start, is_end, is_error y offset;
+        None si la línea no tiene el formato del log (ej: líneas de un traceback)
+    """
+    coincidencia = PATRON_LINEA.match(linea.rstrip('\r'))
+    if not coincidencia:
+        return None
+    timestamp, level, message = coincidencia.groups()
+    return {
+        'timestamp': timestamp,
+        'level': level,
+        'message': message,
+        'is_start': '[INICIO]' in message,
+        'is_end': '[FIN]' in message,
+        'is_error': level == 'ERROR',
+        'offset': posicion,
+    }
+
+
+def cumple_filtros(entrada, nivel=None, tipo=None, texto=None):
+    """
+    Indica si una entrada del log pasa los filtros.
+
+    Args:
+        entrada: Diccionario devuelto por parsear_linea
+        nivel: Nivel exacto (DEBUG, INFO, ERROR...) o None
+        tipo: 'start' ([INICIO]), 'end' ([FIN]), 'error' o None
+        texto: Texto (ej: un nickname) que debe aparecer en el mensaje, sin distinguir mayúsculas
+    """
+    if nivel and entrada['level'] != nivel:
+        return False
+    if tipo == 'start' and not entrada['is_start']:
+        return False
+    if tipo == 'end' and not entrada['is_end']:
+        return False
+    if tipo == 'error' and not entrada['is_error']:
+        return False
+    if texto and texto.lower() not in entrada['message'].lower():
+        return False
+    return True
+
+
+def buscar_entradas(ruta, antes=None, limite=500, max_bytes=16 * 1024 * 1024, **filtros):
+    """
+    Página de entradas del log que pasan los filtros, leyendo desde el final.
+
+    Args:
+        ruta: Ruta del archivo
+        antes: Posición en bytes donde termina la página (None para el final del archivo)
+        limite: Entradas por página
+        max_bytes: Bytes revisados como máximo por página; con filtros muy selectivos la
+                   página puede salir incompleta y se continúa en la siguiente
+        **filtros: nivel, tipo y texto (ver cumple_filtros)
+
+    Returns:
+        Tupla (entradas en orden cronológico, posición para pedir la página anterior o
+        None si se llegó al principio del archivo)
+    """
+    entradas = []
+    fin = os.path.getsize(ruta) if antes is None else antes
+    siguiente = fin
+    for posicion, linea in lineas_hacia_atras(ruta, fin):
+        siguiente = posicion
+        entrada = parsear_linea(linea, posicion)
+        if entrada is not None and cumple_filtros(entrada, **filtros):
+            entradas.append(entrada)
+            if len(entradas) >= limite:
+                break
+        if fin - posicion >= max_bytes:
+            break
+    entradas.reverse()
+    return entradas, (siguiente or None)
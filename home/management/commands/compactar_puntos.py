@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home.models import CierrePuntos, TotalPuntos
+
+
+class Command(BaseCommand):
+    help = ("Resume en un cierre por jugador los movimientos del libro de puntos más antiguos "
+            "que --dias y los borra. Los totales no cambian.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=90, help="Antigüedad mínima de los movimientos que se compactan")
+        parser.add_argument('--verificar', action='store_true',
+                            help="Comprobar antes y después que cada total coincide con su cierre más sus movimientos")
+
+    def handle(self, *args, **options):
+        if options['dias'] < 0:
+            raise CommandError("--dias no puede ser negativo")
+        if options['verificar']:
+            self._verificar()
+
+        compactados = CierrePuntos.compactar(datetime.now() - timedelta(days=options['dias']))
+        self.stdout.write(self.style.SUCCESS(f"{compactados} movimientos compactados"))
+
+        if options['verificar']:
+            self._verificar()
+
+    def _verificar(self):
+        diferencias = TotalPuntos.verificar()
+        for nickname, guardado, esperado in diferencias[:20]:
+            self.stderr.write(f"{nickname}: total {guardado}, según el libro {esperado}")
+        if diferencias:
+            raise CommandError(f"{len(diferencias)} totales no coinciden con el libro de puntos")
@@ -0,0 +1,84 @@
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from home.almacenamiento import almacenamiento_por_contenido
+from home.miniaturas import borrar_variantes
+from home.models import ArchivoContenido, Asistencia
+from users.models import CreateUser
+
+# Campos de archivo que usan el almacenamiento por contenido
+CAMPOS_ARCHIVO = [
+    (Asistencia, 'avatar'),
+    (CreateUser, 'profile_image'),
+    (CreateUser, 'banner_image'),
+]
+
+
+class Command(BaseCommand):
+    help = ("Pasa los archivos subidos antes del almacenamiento por contenido a su ruta por hash, "
+            "borra las copias repetidas y recalcula el contador de referencias")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Mostrar lo que se haría sin modificar nada")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        conocidos = set(ArchivoContenido.objects.values_list('nombre', flat=True))
+        migrados = {}
+        encontrados = 0
+        liberados = 0
+
+        for modelo, campo in CAMPOS_ARCHIVO:
+            antiguos = modelo.objects.exclude(**{campo: ''}).exclude(**{f'{campo}__isnull': True}).exclude(
+                **{f'{campo}__in': conocidos}
+            ).values_list(campo, flat=True).distinct()
+            for nombre in antiguos:
+                ruta = almacenamiento_por_contenido.path(nombre)
+                if not os.path.isfile(ruta):
+                    self.stderr.write(f"No existe el archivo {nombre}, se omite")
+                    continue
+                encontrados += 1
+                liberados += os.path.getsize(ruta)
+                if dry_run:
+                    self.stdout.write(f"{modelo._meta.label}.{campo}: {nombre}")
+                    continue
+
+                if nombre not in migrados:
+                    with open(ruta, 'rb') as archivo:
+                        directorio = posixpath.dirname(nombre)
+                        migrados[nombre] = almacenamiento_por_contenido.save(
+                            posixpath.join(directorio, posixpath.basename(nombre)), File(archivo)
+                        )
+                modelo.objects.filter(**{campo: nombre}).update(**{campo: migrados[nombre]})
+
+        if not dry_run:
+            # Las copias antiguas ya no las usa ningún registro
+            for nombre in migrados:
+                almacenamiento_por_contenido.delete(nombre)
+                borrar_variantes(almacenamiento_por_contenido, nombre)
+            self._recontar_referencias()
+
+        prefijo = "[dry-run] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}{encontrados} archivos antiguos ({liberados / 1024 / 1024:.1f} MB), "
+            f"{len(set(migrados.values()))} archivos únicos tras deduplicar"
+        ))
+
+    @staticmethod
+    def _recontar_referencias():
+        """Recalcula desde cero cuántos registros usan cada archivo."""
+        referencias = {}
+        for modelo, campo in CAMPOS_ARCHIVO:
+            for fila in modelo.objects.exclude(**{campo: ''}).values(campo).annotate(total=Count('pk')):
+                referencias[fila[campo]] = referencias.get(fila[campo], 0) + fila['total']
+
+        with transaction.atomic():
+            archivos = list(ArchivoContenido.objects.all())
+            for archivo in archivos:
+                archivo.referencias = referencias.get(archivo.nombre, 0)
+            ArchivoContenido.objects.bulk_update(archivos, ['referencias'], batch_size=500)
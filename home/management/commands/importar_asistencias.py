@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from home.importacion import importar_asistencias, leer_filas
+
+
+class Command(BaseCommand):
+    help = "Importa asistencias en bloque desde un archivo CSV o JSONL (nickname, apodo, puntos, fecha)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo CSV (con cabecera) o JSONL")
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help="Formato del archivo (por defecto según la extensión)")
+        parser.add_argument('--dry-run', action='store_true', help="Validar y mostrar el resultado sin guardar nada")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                filas = leer_filas(archivo, options['formato'])
+        except OSError as e:
+            raise CommandError(f"No se pudo leer el archivo: {e}")
+
+        resultado = importar_asistencias(filas, dry_run=options['dry_run'])
+
+        for error in resultado['errores']:
+            detalle = '; '.join(
+                f"{campo}: {' '.join(e['message'] for e in errores)}"
+                for campo, errores in error['errores'].items()
+            )
+            self.stderr.write(f"Línea {error['linea']}: {detalle}")
+
+        prefijo = "[dry-run] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}{resultado['validas']} filas válidas, {len(resultado['errores'])} con errores. "
+            f"Registros nuevos: {resultado['creados']}, actualizados: {resultado['actualizados']}, "
+            f"jugadores afectados: {resultado['jugadores']}."
+        ))
+
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from home.almacenamiento import borrar_sin_referencias
+
+
+class Command(BaseCommand):
+    help = ("Borra las imágenes guardadas por contenido que no usa ningún registro "
+            "(subidas hace más de ARCHIVOS_GRACIA_SEGUNDOS)")
+
+    def handle(self, *args, **options):
+        borrados = borrar_sin_referencias()
+        self.stdout.write(self.style.SUCCESS(f"{borrados} archivos sin referencias borrados"))
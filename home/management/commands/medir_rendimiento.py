@@ -0,0 +1,228 @@
+import json
+import logging
+import platform
+import random
+import time
+import tracemalloc
+from datetime import datetime, time as hora
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from wolves.celery import app as celery_app
+
+# Percentiles de latencia que se informan
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentil(valores, p):
+    """Percentil p (método del rango más cercano) de una lista de valores."""
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+class Command(BaseCommand):
+    help = ("Mide latencia (percentiles), número de consultas y memoria pico de puntos_generales, "
+            "registrar_asistencia, verificar_nickname y actualizar_grupos sobre un conjunto de datos "
+            "sintético reproducible, en una base de datos de prueba temporal (la del motor configurado; "
+            "con --settings=wolves.settings_medicion, SQLite en memoria). El resultado se escribe en JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jugadores', type=int, default=200, help="Número de jugadores distintos")
+        parser.add_argument('--fechas', type=int, default=30, help="Número de días de evento")
+        parser.add_argument('--envios', type=int, default=2, help="Máximo de envíos por jugador y día")
+        parser.add_argument('--usuarios', type=int, default=100, help="Número de usuarios registrados (con perfil)")
+        parser.add_argument('--semilla', type=int, default=42, help="Semilla de los datos y de las peticiones")
+        parser.add_argument('--repeticiones', type=int, default=30, help="Mediciones por escenario")
+        parser.add_argument('--calentamiento', type=int, default=3, help="Ejecuciones previas no medidas por escenario")
+        parser.add_argument('--nivel-log', default='INFO', help="Nivel del logger asistencia_debug durante la medición")
+        parser.add_argument('--salida', help="Archivo donde guardar el JSON (por defecto se muestra por pantalla)")
+        parser.add_argument('--comparar', help="JSON de una medición anterior para detectar regresiones")
+        parser.add_argument('--tolerancia', type=float, default=0.25,
+                            help="Aumento relativo de p95 o de consultas a partir del cual se considera regresión")
+
+    def handle(self, *args, **options):
+        logger = logging.getLogger('asistencia_debug')
+        nivel_anterior = logger.level
+        logger.setLevel(options['nivel_log'].upper())
+        eager_anterior = celery_app.conf.task_always_eager
+        # Las tareas (recalcular la clasificación) se miden dentro de la petición que las encola
+        celery_app.conf.task_always_eager = True
+
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        bases = runner.setup_databases()
+        try:
+            # Caché local de un solo proceso: sin instantánea compartida (y nunca se toca la real)
+            with override_settings(
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'medir_rendimiento'}},
+                CLASIFICACION_DEBOUNCE_SEGUNDOS=0,
+                CLASIFICACION_INSTANTANEA=None,
+            ):
+                resultado = self._medir(options)
+        finally:
+            runner.teardown_databases(bases)
+            teardown_test_environment()
+            celery_app.conf.task_always_eager = eager_anterior
+            logger.setLevel(nivel_anterior)
+
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto)
+            self.stdout.write(self.style.SUCCESS(f"Resultado guardado en {options['salida']}"))
+        else:
+            self.stdout.write(texto)
+
+        if options['comparar']:
+            self._comparar(resultado, options['comparar'], options['tolerancia'])
+
+    def _medir(self, options):
+        from home.datos_prueba import sembrar_datos
+        from home.models import Asistencia
+
+        inicio = time.perf_counter()
+        datos = sembrar_datos(
+            jugadores=options['jugadores'], fechas=options['fechas'], envios_por_dia=options['envios'],
+            usuarios=options['usuarios'], semilla=options['semilla'],
+        )
+        segundos_siembra = time.perf_counter() - inicio
+        nicknames = datos.pop('nicknames')
+
+        rng = random.Random(options['semilla'])
+        cliente = Client()
+        hoy = datetime.now().date()
+        minutos_usados = set()
+
+        def puntos_generales():
+            return cliente.get(reverse('puntos_generales'))
+
+        def puntos_generales_sin_cache():
+            from django.core.cache import cache
+            cache.clear()
+            return cliente.get(reverse('puntos_generales'))
+
+        def verificar_nickname():
+            return cliente.get(reverse('verificar_nickname'), {'nickname': rng.choice(nicknames)})
+
+        def registrar_asistencia():
+            # Cada envío es de un jugador al azar, hoy, a una hora distinta (registro nuevo)
+            minuto = rng.randrange(24 * 60)
+            while minuto in minutos_usados and len(minutos_usados) < 24 * 60:
+                minuto = rng.randrange(24 * 60)
+            minutos_usados.add(minuto)
+            fecha = datetime.combine(hoy, hora(minuto // 60, minuto % 60))
+            return cliente.post(reverse('registrar_asistencia'), {
+                'nickname': rng.choice(nicknames), 'apodo': '', 'puntos': rng.randint(1, 20),
+                'fecha': fecha.strftime('%Y-%m-%d %H:%M'),
+            })
+
+        def actualizar_grupos():
+            return Asistencia.actualizar_grupos()
+
+        # Los escenarios que escriben van al final para no alterar los de lectura
+        escenarios = [
+            ('puntos_generales', puntos_generales),
+            ('puntos_generales_sin_cache', puntos_generales_sin_cache),
+            ('verificar_nickname', verificar_nickname),
+            ('actualizar_grupos', actualizar_grupos),
+            ('registrar_asistencia', registrar_asistencia),
+        ]
+        resultados = {}
+        for nombre, funcion in escenarios:
+            resultados[nombre] = self._medir_escenario(funcion, options['repeticiones'], options['calentamiento'])
+            self.stderr.write(f"{nombre}: p50 {resultados[nombre]['ms']['p50']} ms, "
+                              f"{resultados[nombre]['consultas']['media']} consultas")
+
+        return {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'configuracion': {clave: options[clave] for clave in (
+                'jugadores', 'fechas', 'envios', 'usuarios', 'semilla', 'repeticiones', 'calentamiento', 'nivel_log'
+            )},
+            'entorno': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'motor_bd': connection.vendor,
+            },
+            'datos': dict(datos, segundos_siembra=round(segundos_siembra, 3)),
+            'escenarios': resultados,
+        }
+
+    @staticmethod
+    def _medir_escenario(funcion, repeticiones, calentamiento):
+        """
+        Ejecuta un escenario y resume latencia, consultas y memoria pico.
+
+        La memoria se mide en pasadas aparte con tracemalloc, que ralentiza la ejecución
+        y falsearía las latencias.
+        """
+        for _ in range(calentamiento):
+            funcion()
+
+        tiempos = []
+        consultas = []
+        for _ in range(repeticiones):
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                respuesta = funcion()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            consultas.append(len(capturadas))
+            codigo = getattr(respuesta, 'status_code', 200)
+            if codigo >= 400:
+                raise CommandError(f"{funcion.__name__} respondió {codigo}")
+
+        tracemalloc.start()
+        pico = 0
+        for _ in range(min(3, repeticiones)):
+            tracemalloc.reset_peak()
+            funcion()
+            pico = max(pico, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+        return {
+            'repeticiones': repeticiones,
+            'ms': dict(
+                {f'p{p}': round(percentil(tiempos, p), 3) for p in PERCENTILES},
+                media=round(sum(tiempos) / len(tiempos), 3),
+                max=round(max(tiempos), 3),
+            ),
+            'consultas': {
+                'media': round(sum(consultas) / len(consultas), 2),
+                'max': max(consultas),
+            },
+            'memoria_pico_kb': round(pico / 1024, 1),
+        }
+
+    def _comparar(self, resultado, ruta, tolerancia):
+        """Compara p95 y consultas con una medición anterior y falla si alguna empeora más de la tolerancia."""
+        try:
+            with open(ruta, encoding='utf-8') as archivo:
+                anterior = json.load(archivo)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"No se pudo leer {ruta}: {e}")
+
+        regresiones = []
+        for nombre, actual in resultado['escenarios'].items():
+            previo = anterior.get('escenarios', {}).get(nombre)
+            if not previo:
+                continue
+            for metrica, antes, ahora in (
+                ('p95 ms', previo['ms']['p95'], actual['ms']['p95']),
+                ('consultas', previo['consultas']['media'], actual['consultas']['media']),
+            ):
+                cambio = (ahora - antes) / antes if antes else (1.0 if ahora else 0.0)
+                linea = f"{nombre} {metrica}: {antes} -> {ahora} ({cambio:+.0%})"
+                if cambio > tolerancia:
+                    regresiones.append(linea)
+                    self.stdout.write(self.style.ERROR(linea))
+                else:
+                    self.stdout.write(linea)
+
+        if regresiones:
+            raise CommandError(f"{len(regresiones)} regresiones por encima del {tolerancia:.0%}")
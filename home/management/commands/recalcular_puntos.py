@@ -0,0 +1,135 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from home.models import Asistencia, Clasificacion, MovimientoPuntos, TotalPuntos
+
+
+class Command(BaseCommand):
+    help = ("Recalcula los puntos acumulados de todos los registros de asistencia (suma de los puntos "
+            "de cada jugador en orden de fecha), guarda solo los que cambian y reasigna los grupos una vez. "
+            "Con --check solo informa de las diferencias.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Solo informar de las diferencias, sin escribir nada")
+        parser.add_argument('--nickname', action='append', dest='nicknames', metavar='NICKNAME',
+                            help="Recalcular solo este jugador (se puede repetir)")
+        parser.add_argument('--lote', type=int, default=2000,
+                            help="Filas leídas por consulta (y escritas tras leer cada lote)")
+        parser.add_argument('--corregir-libro', action='store_true',
+                            help="Añadir un movimiento de corrección a los jugadores cuyo total del libro "
+                                 "de puntos no coincide con la suma de sus registros")
+        parser.add_argument('--mostrar', type=int, default=20, help="Diferencias que se muestran como ejemplo")
+
+    def handle(self, *args, **options):
+        check = options['check']
+        lote = max(1, options['lote'])
+        self.mostradas = 0
+        self.max_mostrar = options['mostrar']
+
+        registros = Asistencia.objects.all()
+        totales = TotalPuntos.objects.all()
+        if options['nicknames']:
+            registros = registros.filter(nickname__in=options['nicknames'])
+            totales = totales.filter(nickname__in=options['nicknames'])
+        # Un entero por jugador (no por registro): la memoria no depende del número de filas
+        totales_libro = dict(totales.values_list('nickname', 'total'))
+
+        leidas = 0
+        jugadores = 0
+        cambiadas = 0
+        pendientes = []
+        correcciones = []
+        nickname_actual = None
+        acumulado = 0
+
+        def cerrar_jugador():
+            # Comparar la suma de los registros del jugador con su total del libro
+            libro = totales_libro.get(nickname_actual, 0)
+            if libro != acumulado:
+                self._mostrar(f"{nickname_actual}: total del libro {libro}, suma de registros {acumulado}")
+                correcciones.append(MovimientoPuntos(
+                    nickname=nickname_actual, delta=acumulado - libro, motivo=MovimientoPuntos.CORRECCION,
+                ))
+
+        # Las filas se leen por lotes (nunca se cargan todas en memoria) y cada lote se
+        # corrige cuando ya se ha leído entero: no queda ningún cursor abierto al escribir
+        for filas in self._lotes(registros, lote):
+            for id_, nickname, fecha, puntos, guardado in filas:
+                leidas += 1
+                if nickname != nickname_actual:
+                    if nickname_actual is not None:
+                        cerrar_jugador()
+                    nickname_actual = nickname
+                    acumulado = 0
+                    jugadores += 1
+                acumulado += puntos
+                if guardado == acumulado:
+                    continue
+
+                cambiadas += 1
+                self._mostrar(f"{nickname} {fecha:%Y-%m-%d %H:%M}: puntos acumulados {guardado} -> {acumulado}")
+                if not check:
+                    pendientes.append(Asistencia(id=id_, puntos_acumulados=acumulado))
+            self._guardar(pendientes)
+            pendientes = []
+        if nickname_actual is not None:
+            cerrar_jugador()
+
+        corregir_libro = options['corregir_libro'] and not check and correcciones
+        if not check:
+            if corregir_libro:
+                MovimientoPuntos.registrar(correcciones)
+            if cambiadas or corregir_libro:
+                # Los grupos dependen de los totales: se reasignan una sola vez al final
+                Clasificacion.reconstruir()
+
+        prefijo = "[check] " if check else ""
+        resumen = (f"{prefijo}{leidas} registros de {jugadores} jugadores, {cambiadas} con puntos acumulados "
+                   f"{'incorrectos' if check else 'corregidos'}, {len(correcciones)} totales del libro distintos"
+                   f"{' (corregidos)' if corregir_libro else ''}")
+        estilo = self.style.WARNING if check and (cambiadas or correcciones) else self.style.SUCCESS
+        self.stdout.write(estilo(resumen))
+
+    @staticmethod
+    def _lotes(registros, lote):
+        """
+        Filas (id, nickname, fecha, puntos, puntos_acumulados) en orden de nickname, fecha
+        e id, en lotes de `lote` filas.
+
+        Cada lote es una consulta aparte que continúa donde terminó la anterior (por esas
+        tres columnas, no con OFFSET): el tamaño de lo leído está limitado en cualquier
+        motor, también en MySQL, donde iterator() lee el resultado entero.
+        """
+        ultima = None
+        while True:
+            consulta = registros
+            if ultima is not None:
+                id_, nickname, fecha = ultima
+                consulta = consulta.filter(
+                    Q(nickname__gt=nickname)
+                    | Q(nickname=nickname, fecha__gt=fecha)
+                    | Q(nickname=nickname, fecha=fecha, id__gt=id_)
+                )
+            filas = list(consulta.order_by('nickname', 'fecha', 'id').values_list(
+                'id', 'nickname', 'fecha', 'puntos', 'puntos_acumulados'
+            )[:lote])
+            if filas:
+                yield filas
+            if len(filas) < lote:
+                return
+            ultima = filas[-1][:3]
+
+    @staticmethod
+    def _guardar(pendientes):
+        """Escribe un lote de registros corregidos en una sola transacción."""
+        if not pendientes:
+            return
+        with transaction.atomic():
+            # bulk_update no dispara señales: el libro de puntos no cambia (los puntos son los mismos)
+            Asistencia.objects.bulk_update(pendientes, ['puntos_acumulados'])
+
+    def _mostrar(self, linea):
+        if self.mostradas < self.max_mostrar:
+            self.stdout.write(linea)
+        self.mostradas += 1
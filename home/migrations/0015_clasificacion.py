@@ -0,0 +1,95 @@
+# Generated by Django 5.2 on 2026-10-18 13:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copia de home.models al crear esta migración: la migración no debe cambiar si después
+# cambian esas funciones
+LIMITES_GRUPO = [
+    ('A', 10),
+    ('B', 25),
+    ('C', None),
+]
+
+
+def grupo_para_posicion(posicion):
+    for grupo, limite in LIMITES_GRUPO:
+        if limite is None or posicion <= limite:
+            return grupo
+
+
+def calcular_clasificacion(filas):
+    """Último registro de cada jugador (con la hora de su primer registro ese día), en orden de posición."""
+    jugadores = {}
+    for fila in filas:
+        dia = fila['fecha'].date()
+        jugador = jugadores.get(fila['nickname'])
+        if jugador is None or jugador['dia_registro'] != dia:
+            jugador = {
+                'nickname': fila['nickname'],
+                'dia_registro': dia,
+                'hora_registro': fila['fecha'],
+            }
+            jugadores[fila['nickname']] = jugador
+        jugador['puntos_acumulados'] = fila['puntos_acumulados']
+        jugador['asistencia_id'] = fila['id']
+
+    return sorted(jugadores.values(), key=lambda jugador: (
+        -jugador['puntos_acumulados'],
+        -jugador['dia_registro'].toordinal(),
+        jugador['hora_registro'],
+        jugador['nickname'],
+    ))
+
+
+def construir_clasificacion(apps, schema_editor):
+    """Carga la clasificación inicial a partir de las asistencias existentes"""
+    Asistencia = apps.get_model('home', 'Asistencia')
+    Clasificacion = apps.get_model('home', 'Clasificacion')
+
+    filas = Asistencia.objects.order_by('nickname', 'fecha').values(
+        'id', 'nickname', 'fecha', 'puntos_acumulados'
+    ).iterator()
+    Clasificacion.objects.bulk_create([
+        Clasificacion(
+            nickname=jugador['nickname'],
+            puntos_acumulados=jugador['puntos_acumulados'],
+            dia_registro=jugador['dia_registro'],
+            hora_registro=jugador['hora_registro'],
+            grupo=grupo_para_posicion(posicion),
+            posicion=posicion,
+            asistencia_id=jugador['asistencia_id'],
+        )
+        for posicion, jugador in enumerate(calcular_clasificacion(filas), 1)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0014_alter_cancion_duracion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Clasificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nickname', models.CharField(max_length=255, unique=True)),
+                ('puntos_acumulados', models.IntegerField(default=0)),
+                ('dia_registro', models.DateField(help_text='Día más reciente en que asistió el jugador')),
+                ('hora_registro', models.DateTimeField(help_text='Primer registro del jugador en ese día (desempate)')),
+                ('grupo', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('C', 'C')], default='C', max_length=255)),
+                ('posicion', models.PositiveIntegerField(db_index=True)),
+                ('asistencia', models.ForeignKey(blank=True, help_text='Último registro de asistencia del jugador', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='home.asistencia')),
+            ],
+            options={
+                'verbose_name': 'Clasificación',
+                'verbose_name_plural': 'Clasificación',
+                'ordering': ['posicion'],
+                'indexes': [models.Index(fields=['-puntos_acumulados', '-dia_registro', 'hora_registro', 'nickname'], name='clasificacion_orden_idx')],
+            },
+        ),
+        migrations.RunPython(construir_clasificacion, migrations.RunPython.noop),
+    ]
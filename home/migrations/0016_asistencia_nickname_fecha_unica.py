@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-18 13:54
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def fusionar_duplicados(apps, schema_editor):
+    """
+    Fusiona los registros repetidos (mismo nickname y fecha) en el más antiguo,
+    sumando sus puntos igual que haría Asistencia.registrar_o_actualizar.
+    """
+    Asistencia = apps.get_model('home', 'Asistencia')
+
+    duplicados = Asistencia.objects.values('nickname', 'fecha').annotate(
+        total=Count('id')
+    ).filter(total__gt=1)
+    for duplicado in duplicados:
+        registro, *repetidos = Asistencia.objects.filter(
+            nickname=duplicado['nickname'], fecha=duplicado['fecha']
+        ).order_by('id')
+        for repetido in repetidos:
+            registro.puntos += repetido.puntos
+            registro.puntos_acumulados += repetido.puntos
+            if not registro.avatar and repetido.avatar:
+                registro.avatar = repetido.avatar
+            if not registro.apodo and repetido.apodo:
+                registro.apodo = repetido.apodo
+        registro.save()
+        Asistencia.objects.filter(id__in=[r.id for r in repetidos]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0015_clasificacion'),
+    ]
+
+    operations = [
+        migrations.RunPython(fusionar_duplicados, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='asistencia',
+            unique_together={('nickname', 'fecha')},
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 13:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0016_asistencia_nickname_fecha_unica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClasificacionPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nickname', models.CharField(max_length=255, unique=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Clasificación pendiente',
+                'verbose_name_plural': 'Clasificaciones pendientes',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 14:10
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def rellenar_dia(apps, schema_editor):
+    """Calcula el día de registro de las asistencias existentes en una sola sentencia"""
+    Asistencia = apps.get_model('home', 'Asistencia')
+    Asistencia.objects.update(dia=TruncDate('fecha'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0017_clasificacionpendiente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asistencia',
+            name='dia',
+            field=models.DateField(null=True, editable=False, help_text='Día de registro (se calcula desde fecha)'),
+        ),
+        migrations.RunPython(rellenar_dia, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='asistencia',
+            name='dia',
+            field=models.DateField(db_index=True, editable=False, help_text='Día de registro (se calcula desde fecha)'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 13:59
+
+import datetime
+
+import home.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0018_asistencia_dia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoContenido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(help_text='Ruta relativa dentro de MEDIA_ROOT', max_length=255, unique=True)),
+                ('sha256', models.CharField(max_length=64)),
+                ('tamano', models.PositiveBigIntegerField(help_text='Tamaño en bytes')),
+                ('referencias', models.IntegerField(default=0)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('subido', models.DateTimeField(default=datetime.datetime.now, help_text='Última vez que se subió este contenido')),
+            ],
+            options={
+                'verbose_name': 'Archivo',
+                'verbose_name_plural': 'Archivos',
+            },
+        ),
+        migrations.AlterField(
+            model_name='asistencia',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, storage=home.almacenamiento.AlmacenamientoPorContenido(), upload_to='avatars/'),
+        ),
+    ]
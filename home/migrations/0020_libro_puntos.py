@@ -0,0 +1,87 @@
+# Generated by Django 5.2 on 2026-10-18 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def abrir_libro(apps, schema_editor):
+    """
+    Saldo inicial del libro de puntos: un movimiento de apertura por jugador con los
+    puntos acumulados de su último registro, para que los totales no cambien.
+    """
+    Asistencia = apps.get_model('home', 'Asistencia')
+    MovimientoPuntos = apps.get_model('home', 'MovimientoPuntos')
+    TotalPuntos = apps.get_model('home', 'TotalPuntos')
+
+    ultimos = {}
+    for fila in Asistencia.objects.order_by('nickname', 'fecha', 'id').values(
+        'id', 'nickname', 'dia', 'puntos_acumulados'
+    ).iterator():
+        ultimos[fila['nickname']] = fila
+
+    MovimientoPuntos.objects.bulk_create([
+        MovimientoPuntos(
+            nickname=fila['nickname'], dia=fila['dia'], delta=fila['puntos_acumulados'],
+            motivo='apertura', asistencia_id=fila['id'],
+        )
+        for fila in ultimos.values()
+    ], batch_size=500)
+    TotalPuntos.objects.bulk_create([
+        TotalPuntos(nickname=fila['nickname'], total=fila['puntos_acumulados']) for fila in ultimos.values()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0019_archivocontenido_alter_asistencia_avatar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CierrePuntos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nickname', models.CharField(max_length=255, unique=True)),
+                ('total', models.IntegerField(default=0)),
+                ('hasta_movimiento', models.PositiveBigIntegerField(help_text='Id del último movimiento incluido')),
+                ('movimientos', models.PositiveIntegerField(default=0, help_text='Movimientos resumidos en total')),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Cierre de puntos',
+                'verbose_name_plural': 'Cierres de puntos',
+            },
+        ),
+        migrations.CreateModel(
+            name='TotalPuntos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nickname', models.CharField(max_length=255, unique=True)),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Total de puntos',
+                'verbose_name_plural': 'Totales de puntos',
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoPuntos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nickname', models.CharField(max_length=255)),
+                ('dia', models.DateField(blank=True, help_text='Día de evento (Fecha) al que corresponden los puntos', null=True)),
+                ('delta', models.IntegerField(help_text='Puntos sumados (o restados si es negativo)')),
+                ('motivo', models.CharField(choices=[('apertura', 'Saldo inicial'), ('registro', 'Registro de asistencia'), ('correccion', 'Corrección de un registro'), ('eliminacion', 'Registro eliminado'), ('importacion', 'Importación')], max_length=20)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('asistencia', models.ForeignKey(blank=True, db_constraint=False, help_text='Registro de asistencia que originó el movimiento', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movimientos', to='home.asistencia')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de puntos',
+                'verbose_name_plural': 'Movimientos de puntos',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['nickname', 'id'], name='movimiento_jugador_idx')],
+            },
+        ),
+        migrations.RunPython(abrir_libro, migrations.RunPython.noop),
+    ]
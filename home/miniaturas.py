@@ -0,0 +1,124 @@
+"""
+Miniaturas y variantes WebP de las imágenes subidas (avatares, perfil y banner).
+
+Cada variante se guarda junto al original con el tamaño y el formato en el nombre
+(ej: avatars/cb/cb1a...58.jpg -> avatars/cb/cb1a...58.128.webp). Se generan al vuelo
+la primera vez que una plantilla las pide (ver home.templatetags.miniaturas) o, al
+subir una imagen nueva, en segundo plano con la tarea generar_miniaturas.
+
+Si una imagen no se puede procesar (falta, está dañada o es demasiado grande) se
+recuerda el fallo en la caché durante MINIATURAS_FALLO_TIMEOUT segundos: mientras,
+las plantillas usan el original sin volver a abrirla en cada página.
+"""
+import hashlib
+import logging
+import os
+import posixpath
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image, ImageOps
+
+logger = logging.getLogger('asistencia_debug')
+
+# Lados (en píxeles) de las miniaturas disponibles
+TAMANOS = (64, 128, 256)
+
+# Formatos de salida: extensión -> (formato de Pillow, opciones de guardado)
+FORMATOS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'png': ('PNG', {'optimize': True}),
+}
+
+
+def tamano_disponible(tamano):
+    """Devuelve el menor tamaño disponible que sea mayor o igual al pedido."""
+    for disponible in TAMANOS:
+        if tamano <= disponible:
+            return disponible
+    return TAMANOS[-1]
+
+
+def formato_original(nombre):
+    """Formato de la variante no-WebP: PNG si el original es PNG (transparencia), si no JPEG."""
+    return 'png' if nombre.lower().endswith('.png') else 'jpg'
+
+
+def nombre_variante(nombre, tamano, formato):
+    """Nombre (relativo al almacenamiento) de una variante de la imagen."""
+    base, _ = posixpath.splitext(nombre)
+    return f"{base}.{tamano}.{formato}"
+
+
+def clave_fallo(variante):
+    """Clave de caché que marca una variante que no se pudo generar."""
+    return 'miniatura:fallo:' + hashlib.sha1(variante.encode('utf-8')).hexdigest()
+
+
+def generar_variante(almacenamiento, nombre, tamano, formato='webp', recortar=True):
+    """
+    Genera (si no existe) la variante de una imagen y devuelve su nombre.
+
+    Args:
+        almacenamiento: Storage de sistema de archivos donde está la imagen
+        nombre: Nombre de la imagen original dentro del almacenamiento
+        tamano: Lado de la miniatura en píxeles (se ajusta a uno de TAMANOS)
+        formato: 'webp', 'jpg' o 'png'
+        recortar: True para recortar al cuadrado (avatares); False para conservar la proporción
+
+    Returns:
+        El nombre de la variante, o None si la imagen no se pudo procesar
+    """
+    tamano = tamano_disponible(tamano)
+    variante = nombre_variante(nombre, tamano, formato)
+    ruta = almacenamiento.path(variante)
+    if os.path.exists(ruta):
+        return variante
+    if cache.get(clave_fallo(variante)):
+        return None
+
+    formato_pil, opciones = FORMATOS[formato]
+    try:
+        with Image.open(almacenamiento.path(nombre)) as imagen:
+            imagen = ImageOps.exif_transpose(imagen)
+            if recortar:
+                imagen = ImageOps.fit(imagen, (tamano, tamano), Image.Resampling.LANCZOS)
+            else:
+                imagen.thumbnail((tamano, tamano), Image.Resampling.LANCZOS)
+            if formato_pil == 'JPEG' and imagen.mode not in ('RGB', 'L'):
+                imagen = imagen.convert('RGB')
+            elif imagen.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+                imagen = imagen.convert('RGBA')
+
+            # Escribir a un temporal y renombrar: nunca se sirve una variante a medio escribir
+            descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), prefix='.variante-')
+            try:
+                with os.fdopen(descriptor, 'wb') as destino:
+                    imagen.save(destino, formato_pil, **opciones)
+                os.replace(temporal, ruta)
+            except BaseException:
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+                raise
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        # DecompressionBombError no es un OSError: Pillow la lanza con imágenes enormes
+        logger.error("No se pudo generar la variante %s: %s", variante, e)
+        cache.set(clave_fallo(variante), True, getattr(settings, 'MINIATURAS_FALLO_TIMEOUT', 300))
+        return None
+    return variante
+
+
+def generar_variantes(almacenamiento, nombre, recortar=True):
+    """Genera todas las variantes (todos los tamaños, WebP y formato original) de una imagen."""
+    for tamano in TAMANOS:
+        for formato in ('webp', formato_original(nombre)):
+            generar_variante(almacenamiento, nombre, tamano, formato, recortar)
+
+
+def borrar_variantes(almacenamiento, nombre):
+    """Borra del disco todas las variantes de una imagen."""
+    for tamano in TAMANOS:
+        for formato in FORMATOS:
+            almacenamiento.delete(nombre_variante(nombre, tamano, formato))
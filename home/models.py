@@ -1,26 +1,17 @@
-from django.db import models
-import os
+from django.db import IntegrityError, models, transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, F, Max, Q, Sum, Window
 import logging
+import sys
+from collections import defaultdict
 from datetime import datetime
 
-# Configurar el logger para depuración
-logger = logging.getLogger('asistencia_debug')
-logger.setLevel(logging.DEBUG)
-
-# Crear un manejador de archivo para guardar los logs
-import os
-log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
-os.makedirs(log_dir, exist_ok=True)
-log_file = os.path.join(log_dir, 'asistencia_debug.log')
-file_handler = logging.FileHandler(log_file)
-file_handler.setLevel(logging.DEBUG)
+from home.almacenamiento import almacenamiento_por_contenido
+from home.cache import invalidar_clasificacion
+from home.trazas import span, trazar
 
-# Definir el formato del log
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-
-# Agregar el manejador al logger
-logger.addHandler(file_handler)
+# Logger de depuración: los manejadores, el nivel y el muestreo se configuran en
+# settings.LOGGING (ver home/logs.py)
+logger = logging.getLogger('asistencia_debug')
 
 # Create your models here.
 
@@ -49,6 +40,33 @@ class Fecha(models.Model):
         return f"{self.nombre} ({self.fecha.strftime('%d/%m/%Y')})"
 
 
+class AsistenciaQuerySet(models.QuerySet):
+    """Consultas sobre Asistencia resueltas en una sola sentencia SQL"""
+
+    def por_puntos(self):
+        """
+        Registros ordenados por puntos acumulados (descendente) y, a igualdad de puntos,
+        por hora de registro; el id desempata para que el orden sea estable.
+        """
+        return self.order_by('-puntos_acumulados', 'fecha', 'id')
+
+    def resumen_jugador(self, nickname, dia):
+        """
+        Último registro (por fecha) de un jugador con el total de sus registros
+        (total_registros) y los que tiene en el día dado (registros_dia).
+
+        Una sola consulta: los conteos son funciones de ventana sobre todas las filas del
+        jugador, que el índice único (nickname, fecha) lee ya ordenadas.
+
+        Returns:
+            Asistencia anotada, o None si el nickname no tiene registros
+        """
+        return self.filter(nickname=nickname).annotate(
+            total_registros=Window(Count('pk')),
+            registros_dia=Window(Count('pk', filter=Q(dia=dia))),
+        ).order_by('-fecha', '-id').first()
+
+
 class Asistencia(models.Model):
     nickname = models.CharField(max_length=255)
     apodo = models.CharField(max_length=255, blank=True, null=True, default='')
@@ -56,12 +74,29 @@ class Asistencia(models.Model):
     puntos_acumulados = models.IntegerField(default=0)
     grupo = models.CharField(max_length=255, choices=CHOICES_GRUPO)
     fecha = models.DateTimeField(auto_now_add=False, help_text="Fecha y hora de registro")
+    # Día calendario de la fecha de registro, para filtrar por día usando un índice
+    dia = models.DateField(db_index=True, editable=False, help_text="Día de registro (se calcula desde fecha)")
     # Relación con el modelo Fecha (opcional)
    
-    avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    avatar = models.ImageField(upload_to='avatars/', storage=almacenamiento_por_contenido, blank=True, null=True)
+
+    objects = AsistenciaQuerySet.as_manager()
+
+    class Meta:
+        # Un registro por jugador y fecha; el índice único también sirve a las búsquedas por nickname
+        unique_together = ('nickname', 'fecha')
 
     def __str__(self):
         return self.nickname
+
+    def save(self, *args, **kwargs):
+        # Mantener el día calendario sincronizado con la fecha y hora de registro
+        if isinstance(self.fecha, datetime):
+            self.dia = self.fecha.date()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'fecha' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'dia'}
+        super().save(*args, **kwargs)
     
     @classmethod
     def registrar_o_actualizar(cls, datos):
@@ -74,263 +109,695 @@ class Asistencia(models.Model):
         Returns:
             La instancia de Asistencia creada o actualizada
         """
-        inicio = datetime.now()
         nickname = datos.get('nickname')
         fecha = datos.get('fecha')
         
-        logger.debug(f"[INICIO] Registrar o actualizar asistencia - Nickname: {nickname}, Fecha: {fecha}, Timestamp: {inicio.strftime('%Y-%m-%d %H:%M:%S.%f')}")
-        logger.debug(f"Datos recibidos: {datos}")
-        
-        # Verificar si ya existe un registro para este nickname en la misma fecha
-        registro_existente = cls.objects.filter(nickname=nickname, fecha=fecha).first()
-        
-        resultado = None
-        if registro_existente:
-            logger.debug(f"Encontrado registro existente para {nickname} en fecha {fecha}")
-            resultado = cls.actualizar_registro_existente(registro_existente, datos)
-        else:
-            logger.debug(f"No se encontró registro existente para {nickname} en fecha {fecha}. Creando nuevo registro.")
-            resultado = cls.crear_nuevo_registro(datos)
-        
-        fin = datetime.now()
-        duracion = (fin - inicio).total_seconds()
-        logger.debug(f"[FIN] Registrar o actualizar asistencia - Nickname: {nickname}, Duración: {duracion} segundos")
+        with span('registrar_o_actualizar', nickname=nickname, fecha=fecha):
+            logger.debug("Datos recibidos: %s", datos)
+            
+            with transaction.atomic():
+                # Bloquear primero el total del jugador en el libro de puntos: todos los registros
+                # de un mismo jugador pasan por aquí y quedan en fila hasta el commit, así que
+                # lo que se lea a continuación no cambia por debajo
+                totales = TotalPuntos.bloquear([nickname])
+            
+                # Una sola lectura: el registro de esa fecha si existe y, si no, el último del
+                # jugador (del que un registro nuevo hereda grupo, avatar y apodo)
+                ultimo_registro = cls.objects.filter(nickname=nickname).annotate(
+                    misma_fecha=ExpressionWrapper(Q(fecha=fecha), output_field=BooleanField())
+                ).order_by('-misma_fecha', '-fecha').first()
+            
+                if ultimo_registro is not None and ultimo_registro.misma_fecha:
+                    logger.debug("Encontrado registro existente para %s en fecha %s", nickname, fecha)
+                    resultado = cls.actualizar_registro_existente(ultimo_registro, datos, totales)
+                else:
+                    logger.debug("No se encontró registro existente para %s en fecha %s. Creando nuevo registro.", nickname, fecha)
+                    try:
+                        resultado = cls.crear_nuevo_registro(datos, ultimo_registro, totales)
+                    except IntegrityError:
+                        # Otro proceso creó el registro sin pasar por aquí (admin, importación...):
+                        # sumar los puntos sobre él
+                        logger.debug("Registro concurrente detectado para %s en fecha %s. Actualizando.", nickname, fecha)
+                        registro_existente = cls.objects.select_for_update().get(nickname=nickname, fecha=fecha)
+                        resultado = cls.actualizar_registro_existente(registro_existente, datos, totales)
         
         return resultado
     
     @classmethod
-    def actualizar_registro_existente(cls, registro, datos):
+    def actualizar_registro_existente(cls, registro, datos, totales=None):
         """
         Actualiza un registro de asistencia existente
         
         Args:
             registro: La instancia de Asistencia a actualizar
             datos: Un diccionario con los nuevos datos
+            totales: Totales del libro ya bloqueados con TotalPuntos.bloquear (opcional)
             
         Returns:
             La instancia de Asistencia actualizada
         """
-        inicio = datetime.now()
-        logger.debug(f"[INICIO] Actualizar registro existente - Nickname: {registro.nickname}, ID: {registro.id}, Timestamp: {inicio.strftime('%Y-%m-%d %H:%M:%S.%f')}")
-        logger.debug(f"Datos antes de actualizar: Puntos: {registro.puntos}, Puntos acumulados: {registro.puntos_acumulados}, Grupo: {registro.grupo}")
-        
-        # Sumar los nuevos puntos a los puntos del día existentes
-        puntos_nuevos = datos.get('puntos', 0)
-        puntos_actuales = registro.puntos
-        
-        # Actualizar puntos del día (sumando los nuevos)
-        registro.puntos = puntos_actuales + puntos_nuevos
-        
-        # Actualizar puntos acumulados (sumando solo los nuevos puntos)
-        registro.puntos_acumulados = registro.puntos_acumulados + puntos_nuevos
-        
-        # Actualizar avatar si se proporciona uno nuevo
-        if 'avatar' in datos and datos['avatar']:
-            # Si había un avatar anterior, eliminarlo para no acumular archivos
-            if registro.avatar:
-                try:
-                    # Intentar eliminar el archivo físico
-                    if os.path.isfile(registro.avatar.path):
-                        os.remove(registro.avatar.path)
-                except Exception as e:
-                    logger.error(f"Error al eliminar avatar anterior: {e}")
-            registro.avatar = datos['avatar']
-        
-        # Actualizar apodo si se proporciona
-        if 'apodo' in datos and datos['apodo']:
-            registro.apodo = datos['apodo']
-        
-        # Guardar cambios
-        registro.save()
-        
-        fin = datetime.now()
-        duracion = (fin - inicio).total_seconds()
-        logger.debug(f"Datos después de actualizar: Puntos: {registro.puntos}, Puntos acumulados: {registro.puntos_acumulados}, Grupo: {registro.grupo}")
-        logger.debug(f"[FIN] Actualizar registro existente - Nickname: {registro.nickname}, ID: {registro.id}, Duración: {duracion} segundos")
+        with span('actualizar_registro_existente', nickname=registro.nickname, id=registro.id):
+            logger.debug("Datos antes de actualizar: Puntos: %s, Puntos acumulados: %s, Grupo: %s", registro.puntos, registro.puntos_acumulados, registro.grupo)
+        
+            # Sumar los nuevos puntos a los puntos del día existentes
+            puntos_nuevos = datos.get('puntos', 0)
+            puntos, puntos_acumulados = registro.puntos, registro.puntos_acumulados
+            campos = ['puntos', 'puntos_acumulados']
+        
+            # Actualizar puntos del día y acumulados en la base de datos (incremento atómico,
+            # no se pierden puntos aunque otro proceso edite el registro a la vez)
+            registro.puntos = F('puntos') + puntos_nuevos
+            registro.puntos_acumulados = F('puntos_acumulados') + puntos_nuevos
+        
+            # Actualizar avatar si se proporciona uno nuevo (el anterior se borra del disco
+            # cuando ningún otro registro lo usa, ver home.almacenamiento)
+            if 'avatar' in datos and datos['avatar']:
+                registro.avatar = datos['avatar']
+                campos.append('avatar')
+        
+            # Actualizar apodo si se proporciona
+            if 'apodo' in datos and datos['apodo']:
+                registro.apodo = datos['apodo']
+                campos.append('apodo')
+        
+            # Guardar cambios; los valores resultantes se calculan aquí en lugar de volver a
+            # leerlos (los registros del jugador están en fila tras el bloqueo de su total)
+            registro._movimiento_registrado = True
+            registro.save(update_fields=campos)
+            registro.puntos = puntos + puntos_nuevos
+            registro.puntos_acumulados = puntos_acumulados + puntos_nuevos
+            MovimientoPuntos.registrar([MovimientoPuntos(
+                nickname=registro.nickname, dia=registro.dia, delta=puntos_nuevos,
+                motivo=MovimientoPuntos.REGISTRO, asistencia=registro,
+            )], totales)
+            logger.debug("Datos después de actualizar: Puntos: %s, Puntos acumulados: %s, Grupo: %s", registro.puntos, registro.puntos_acumulados, registro.grupo)
         
         return registro
     
     @classmethod
-    def crear_nuevo_registro(cls, datos):
+    def crear_nuevo_registro(cls, datos, ultimo_registro=None, totales=None):
         """
         Crea un nuevo registro de asistencia
         
         Args:
             datos: Un diccionario con los datos de la asistencia
+            ultimo_registro: Último registro previo del mismo jugador (None si es el primero)
+            totales: Totales del libro ya bloqueados con TotalPuntos.bloquear (opcional)
             
         Returns:
             La nueva instancia de Asistencia
+
+        Raises:
+            IntegrityError: Si ya existe un registro con el mismo nickname y fecha (la
+                transacción del llamador sigue siendo utilizable)
         """
-        inicio = datetime.now()
         nickname = datos.get('nickname')
-        logger.debug(f"[INICIO] Crear nuevo registro - Nickname: {nickname}, Timestamp: {inicio.strftime('%Y-%m-%d %H:%M:%S.%f')}")
-        
-        # Buscar registros previos del mismo jugador
-        registros_previos = cls.objects.filter(nickname=nickname).order_by('-fecha')
         
-        # Crear nueva instancia
-        nueva_asistencia = cls(
-            nickname=nickname,
-            apodo=datos.get('apodo', ''),
-            puntos=datos.get('puntos', 0),
-            fecha=datos.get('fecha')
-        )
-        
-        # Si hay avatar, asignarlo
-        if 'avatar' in datos and datos['avatar']:
-            nueva_asistencia.avatar = datos['avatar']
-        
-        # Calcular puntos acumulados y asignar grupo
-        if registros_previos.exists():
-            # Si hay registros previos, obtener el último
-            ultimo_registro = registros_previos.first()
-            logger.debug(f"Encontrado registro previo para {nickname}. Último registro ID: {ultimo_registro.id}, Fecha: {ultimo_registro.fecha}")
-            
-            # Sumar puntos al acumulado anterior
-            nueva_asistencia.puntos_acumulados = ultimo_registro.puntos_acumulados + nueva_asistencia.puntos
+        with span('crear_nuevo_registro', nickname=nickname):
+            # Crear nueva instancia
+            nueva_asistencia = cls(
+                nickname=nickname,
+                apodo=datos.get('apodo', ''),
+                puntos=datos.get('puntos', 0),
+                fecha=datos.get('fecha')
+            )
+        
+            # Si hay avatar, asignarlo
+            if 'avatar' in datos and datos['avatar']:
+                nueva_asistencia.avatar = datos['avatar']
+        
+            # Los puntos acumulados salen del total del libro de puntos (una lectura), no del
+            # registro anterior; la fila del total queda bloqueada hasta el commit
+            if totales is None:
+                totales = TotalPuntos.bloquear([nickname])
+            nueva_asistencia.puntos_acumulados = totales[nickname].total + nueva_asistencia.puntos
+        
+            # Asignar grupo y heredar datos del registro anterior
+            if ultimo_registro:
+                logger.debug("Encontrado registro previo para %s. Último registro ID: %s, Fecha: %s", nickname, ultimo_registro.id, ultimo_registro.fecha)
             
-            # Usar el mismo grupo temporalmente (se actualizará después)
-            nueva_asistencia.grupo = ultimo_registro.grupo
+                # Usar el mismo grupo temporalmente (se actualizará después)
+                nueva_asistencia.grupo = ultimo_registro.grupo
             
-            # Conservar el avatar existente si no se sube uno nuevo
-            if not nueva_asistencia.avatar and ultimo_registro.avatar:
-                nueva_asistencia.avatar = ultimo_registro.avatar
+                # Conservar el avatar existente si no se sube uno nuevo
+                if not nueva_asistencia.avatar and ultimo_registro.avatar:
+                    nueva_asistencia.avatar = ultimo_registro.avatar
                 
-            # Asegurarse de mantener el mismo apodo si no se proporciona uno nuevo
-            if not nueva_asistencia.apodo and ultimo_registro.apodo:
-                nueva_asistencia.apodo = ultimo_registro.apodo
+                # Asegurarse de mantener el mismo apodo si no se proporciona uno nuevo
+                if not nueva_asistencia.apodo and ultimo_registro.apodo:
+                    nueva_asistencia.apodo = ultimo_registro.apodo
                 
-            logger.debug(f"Datos del último registro: Puntos: {ultimo_registro.puntos}, Puntos acumulados: {ultimo_registro.puntos_acumulados}, Grupo: {ultimo_registro.grupo}")
-        else:
-            # Si es el primer registro, los puntos acumulados son iguales a los puntos del día
-            nueva_asistencia.puntos_acumulados = nueva_asistencia.puntos
-            # Asignar grupo C por defecto para nuevos jugadores
-            nueva_asistencia.grupo = 'C'
-            logger.debug(f"No se encontraron registros previos para {nickname}. Primer registro.")
-        
-        # Guardar el nuevo registro
-        nueva_asistencia.save()
-        
-        fin = datetime.now()
-        duracion = (fin - inicio).total_seconds()
-        logger.debug(f"Nuevo registro creado - ID: {nueva_asistencia.id}, Puntos: {nueva_asistencia.puntos}, Puntos acumulados: {nueva_asistencia.puntos_acumulados}, Grupo: {nueva_asistencia.grupo}")
-        logger.debug(f"[FIN] Crear nuevo registro - Nickname: {nickname}, Duración: {duracion} segundos")
+                logger.debug("Datos del último registro: Puntos: %s, Puntos acumulados: %s, Grupo: %s", ultimo_registro.puntos, ultimo_registro.puntos_acumulados, ultimo_registro.grupo)
+            else:
+                # Asignar grupo C por defecto para nuevos jugadores
+                nueva_asistencia.grupo = 'C'
+                logger.debug("No se encontraron registros previos para %s. Primer registro.", nickname)
+        
+            # Guardar el nuevo registro (en un punto de guardado: si choca con el índice único
+            # solo se deshace esta inserción) y anotar sus puntos en el libro
+            nueva_asistencia._movimiento_registrado = True
+            with transaction.atomic():
+                nueva_asistencia.save()
+            MovimientoPuntos.registrar([MovimientoPuntos(
+                nickname=nickname, dia=nueva_asistencia.dia, delta=nueva_asistencia.puntos,
+                motivo=MovimientoPuntos.REGISTRO, asistencia=nueva_asistencia,
+            )], totales)
+            logger.debug("Nuevo registro creado - ID: %s, Puntos: %s, Puntos acumulados: %s, Grupo: %s", nueva_asistencia.id, nueva_asistencia.puntos, nueva_asistencia.puntos_acumulados, nueva_asistencia.grupo)
         
         return nueva_asistencia
     
+    
     @classmethod
+    @trazar('actualizar_grupos')
     def actualizar_grupos(cls):
         """
-        Actualiza los grupos de todos los usuarios basado en su posición en el ranking de puntos acumulados:
+        Recalcula desde cero la clasificación y los grupos de todos los jugadores:
         - Grupo A: Top 10
         - Grupo B: Posiciones 11-25
         - Grupo C: Posición 26 en adelante
-        
-        Dentro del mismo grupo y con mismos puntos, se prioriza el orden de llegada (registro).
-        
+
+        El día a día ya no necesita esta función: la tabla Clasificacion se mantiene
+        de forma incremental con cada registro. Se conserva como reparación completa.
+
         Returns:
-            int: Número de jugadores únicos actualizados
+            int: Número de jugadores únicos clasificados
         """
-        inicio = datetime.now()
-        logger.debug(f"[INICIO] Actualizar grupos - Timestamp: {inicio.strftime('%Y-%m-%d %H:%M:%S.%f')}")
-        
-        from django.db.models import Max, Min
-        
-        # Obtener la fecha del evento más reciente
-        ultima_fecha = cls.objects.aggregate(Max('fecha'))['fecha__max']
-        logger.debug(f"Fecha más reciente encontrada: {ultima_fecha}")
-        
-        # Obtener jugadores únicos con sus puntos acumulados máximos (último registro)
-        jugadores_unicos = cls.objects.values('nickname').annotate(
-            max_puntos=Max('puntos_acumulados')
-        )
-        logger.debug(f"Total de jugadores únicos encontrados: {len(jugadores_unicos)}")
-        
-        # Para cada jugador, obtener su último registro por fecha
-        jugadores_info = []
-        for jugador in jugadores_unicos:
-            nickname = jugador['nickname']
-            max_puntos = jugador['max_puntos']
-            
-            # Obtener el último registro del jugador
-            ultimo_registro = cls.objects.filter(nickname=nickname).order_by('-fecha').first()
-            
-            # Si hay un registro para la última fecha, obtener la hora de registro
-            registro_fecha_actual = cls.objects.filter(
-                nickname=nickname, 
-                fecha__date=ultima_fecha.date() if ultima_fecha else None
-            ).order_by('fecha').first()
-            
-            # Hora de registro para la última fecha (si existe)
-            hora_registro = registro_fecha_actual.fecha if registro_fecha_actual else None
-            
-            jugadores_info.append({
-                'nickname': nickname,
-                'puntos': max_puntos,
-                'hora_registro': hora_registro,
-                'ultimo_registro': ultimo_registro
-            })
-            
-            logger.debug(f"Jugador: {nickname}, Puntos: {max_puntos}, Hora registro: {hora_registro}")
-        
-        # Crear un diccionario para agrupar jugadores por puntos
-        jugadores_por_puntos = {}
-        for jugador in jugadores_info:
-            puntos = jugador['puntos']
-            if puntos not in jugadores_por_puntos:
-                jugadores_por_puntos[puntos] = []
-            jugadores_por_puntos[puntos].append(jugador)
-        
-        # Para cada grupo de jugadores con mismos puntos, ordenarlos por hora de registro
-        for puntos, grupo_jugadores in jugadores_por_puntos.items():
-            logger.debug(f"Ordenando grupo de jugadores con {puntos} puntos. Total jugadores: {len(grupo_jugadores)}")
-            grupo_jugadores.sort(key=lambda x: x['hora_registro'] or ultima_fecha)
-            
-            # Registrar el orden después de ordenar
-            logger.debug(f"Orden después de ordenar jugadores con {puntos} puntos:")
-            for idx, jugador in enumerate(grupo_jugadores):
-                logger.debug(f"  {idx+1}. {jugador['nickname']} - Hora registro: {jugador['hora_registro']}")
-        
-        # Crear la lista final ordenada: primero por puntos (descendente) y luego por hora de registro
-        jugadores_ordenados = []
-        for puntos in sorted(jugadores_por_puntos.keys(), reverse=True):
-            jugadores_ordenados.extend(jugadores_por_puntos[puntos])
-        
-        # Registrar el orden final
-        logger.debug("Orden final de jugadores:")
-        for idx, jugador in enumerate(jugadores_ordenados):
-            logger.debug(f"{idx+1}. {jugador['nickname']} - Puntos: {jugador['puntos']}, Hora registro: {jugador['hora_registro']}")
-        
-        # Actualizar el grupo de cada jugador según su posición
-        actualizados = 0
-        for idx, jugador in enumerate(jugadores_ordenados, 1):  # empezamos en 1 para contar desde la posición 1
-            ultimo_registro = jugador['ultimo_registro']
-            
-            # Determinar el grupo según la posición
-            if idx <= 10:
-                grupo = 'A'
-            elif idx <= 25:
-                grupo = 'B'
+        return Clasificacion.reconstruir()
+
+
+# Límites de posición de cada grupo (inclusive). El último grupo no tiene límite.
+LIMITES_GRUPO = [
+    ('A', 10),
+    ('B', 25),
+    ('C', None),
+]
+
+
+def grupo_para_posicion(posicion):
+    """Devuelve el grupo (A, B o C) que corresponde a una posición del ranking."""
+    for grupo, limite in LIMITES_GRUPO:
+        if limite is None or posicion <= limite:
+            return grupo
+
+
+def rangos_de_grupo():
+    """Genera tuplas (grupo, desde, hasta) con el rango de posiciones de cada grupo."""
+    desde = 1
+    for grupo, limite in LIMITES_GRUPO:
+        yield grupo, desde, limite
+        if limite is not None:
+            desde = limite + 1
+
+
+def calcular_clasificacion(filas, totales=None):
+    """
+    Calcula la clasificación a partir de las filas de asistencia.
+
+    Args:
+        filas: Iterable de diccionarios con 'id', 'nickname', 'fecha' y 'puntos_acumulados',
+               ordenado por (nickname, fecha)
+        totales: Diccionario nickname -> total de puntos del libro (ver TotalPuntos); los
+                 jugadores que no estén usan los puntos acumulados de su último registro
+
+    Returns:
+        Lista de diccionarios por jugador ya ordenada por posición, con las claves
+        nickname, puntos_acumulados, dia_registro, hora_registro y asistencia_id
+    """
+    jugadores = {}
+    for fila in filas:
+        dia = fila['fecha'].date()
+        jugador = jugadores.get(fila['nickname'])
+        if jugador is None or jugador['dia_registro'] != dia:
+            # Primer registro del jugador en su día más reciente (hasta ahora)
+            jugador = {
+                'nickname': fila['nickname'],
+                'dia_registro': dia,
+                'hora_registro': fila['fecha'],
+            }
+            jugadores[fila['nickname']] = jugador
+        jugador['puntos_acumulados'] = fila['puntos_acumulados']
+        jugador['asistencia_id'] = fila['id']
+
+    if totales:
+        for nickname, jugador in jugadores.items():
+            jugador['puntos_acumulados'] = totales.get(nickname, jugador['puntos_acumulados'])
+
+    return sorted(jugadores.values(), key=clave_clasificacion)
+
+
+def clave_clasificacion(jugador):
+    """
+    Clave de orden del ranking: más puntos primero; a igualdad de puntos, quien asistió
+    al día más reciente y, dentro de ese día, quien se registró antes.
+    """
+    return (
+        -jugador['puntos_acumulados'],
+        -jugador['dia_registro'].toordinal(),
+        jugador['hora_registro'],
+        jugador['nickname'],
+    )
+
+
+def clave_nickname(nickname):
+    """
+    Clave del orden alfabético de los nicknames para buscar por prefijo sin distinguir
+    mayúsculas: el nickname en minúsculas (casefold) y, para desempatar, el original.
+    """
+    return (nickname.casefold(), nickname)
+
+
+def limites_de_prefijo(prefijo):
+    """
+    Claves (en el orden de clave_nickname) entre las que están los nicknames que empiezan
+    por `prefijo` sin distinguir mayúsculas.
+
+    Returns:
+        Tupla (desde, hasta): desde incluida, hasta excluida (None = hasta el final); o
+        None si el prefijo está vacío
+    """
+    buscado = prefijo.casefold()
+    if not buscado:
+        return None
+    # El primer texto mayor que todos los que empiezan por el prefijo: el mismo prefijo
+    # con su último carácter incrementado
+    siguiente = buscado.rstrip(chr(sys.maxunicode))
+    hasta = (siguiente[:-1] + chr(ord(siguiente[-1]) + 1),) if siguiente else None
+    return (buscado,), hasta
+
+
+def _jugador_cambiado(nickname, jugador):
+    # Importación diferida: home.tabla_posiciones importa este módulo
+    from home.tabla_posiciones import jugador_cambiado
+    jugador_cambiado(nickname, jugador)
+
+
+def _tabla_reconstruida():
+    from home.tabla_posiciones import tabla_reconstruida
+    tabla_reconstruida()
+
+
+class Clasificacion(models.Model):
+    """
+    Clasificación persistida por jugador. Se actualiza de forma incremental cada vez
+    que cambia la asistencia de un jugador, en lugar de recalcular todo el ranking.
+    """
+    nickname = models.CharField(max_length=255, unique=True)
+    puntos_acumulados = models.IntegerField(default=0)
+    dia_registro = models.DateField(help_text="Día más reciente en que asistió el jugador")
+    hora_registro = models.DateTimeField(help_text="Primer registro del jugador en ese día (desempate)")
+    grupo = models.CharField(max_length=255, choices=CHOICES_GRUPO, default='C')
+    posicion = models.PositiveIntegerField(db_index=True)
+    asistencia = models.ForeignKey(
+        Asistencia, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        help_text="Último registro de asistencia del jugador"
+    )
+
+    class Meta:
+        ordering = ['posicion']
+        verbose_name = 'Clasificación'
+        verbose_name_plural = 'Clasificación'
+        indexes = [
+            models.Index(
+                fields=['-puntos_acumulados', '-dia_registro', 'hora_registro', 'nickname'],
+                name='clasificacion_orden_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.posicion}. {self.nickname} ({self.puntos_acumulados})"
+
+    @classmethod
+    @trazar('Clasificacion.reconstruir')
+    def reconstruir(cls):
+        """
+        Reconstruye la clasificación completa en una sola pasada sobre Asistencia.
+
+        Returns:
+            int: Número de jugadores clasificados
+        """
+        filas = Asistencia.objects.order_by('nickname', 'fecha').values(
+            'id', 'nickname', 'fecha', 'puntos_acumulados'
+        ).iterator()
+        ordenados = calcular_clasificacion(filas, dict(TotalPuntos.objects.values_list('nickname', 'total')))
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create([
+                cls(
+                    nickname=jugador['nickname'],
+                    puntos_acumulados=jugador['puntos_acumulados'],
+                    dia_registro=jugador['dia_registro'],
+                    hora_registro=jugador['hora_registro'],
+                    grupo=grupo_para_posicion(posicion),
+                    posicion=posicion,
+                    asistencia_id=jugador['asistencia_id'],
+                )
+                for posicion, jugador in enumerate(ordenados, 1)
+            ], batch_size=500)
+            # Replicar el grupo en el último registro de asistencia de cada jugador
+            for grupo, _, _ in rangos_de_grupo():
+                Asistencia.objects.filter(
+                    id__in=cls.objects.filter(grupo=grupo).values('asistencia_id')
+                ).exclude(grupo=grupo).update(grupo=grupo)
+            transaction.on_commit(invalidar_clasificacion)
+            # Las tablas de posiciones en memoria se recargan (ver home.tabla_posiciones)
+            transaction.on_commit(_tabla_reconstruida)
+
+        logger.debug("Clasificación reconstruida - Jugadores: %s", len(ordenados))
+
+        return len(ordenados)
+
+    @classmethod
+    @trazar('Clasificacion.actualizar_jugador')
+    def actualizar_jugador(cls, nickname):
+        """
+        Actualiza la clasificación de un solo jugador tras un cambio en su asistencia.
+
+        Solo se desplazan las posiciones entre la posición anterior y la nueva, y solo
+        se revisan los grupos de ese tramo del ranking.
+
+        Args:
+            nickname: Nickname del jugador cuya asistencia cambió
+
+        Returns:
+            La instancia de Clasificacion actualizada, o None si el jugador ya no tiene registros
+        """
+        with transaction.atomic():
+            filas = Asistencia.objects.filter(nickname=nickname).order_by('nickname', 'fecha').values(
+                'id', 'nickname', 'fecha', 'puntos_acumulados'
+            )
+            totales = dict(TotalPuntos.objects.filter(nickname=nickname).values_list('nickname', 'total'))
+            jugador = next(iter(calcular_clasificacion(filas, totales)), None)
+            actual = cls.objects.select_for_update().filter(nickname=nickname).first()
+
+            if jugador is None:
+                if actual is not None:
+                    posicion_anterior = actual.posicion
+                    actual.delete()
+                    cls.objects.filter(posicion__gt=posicion_anterior).update(posicion=F('posicion') - 1)
+                    cls._reasignar_grupos(posicion_anterior, None)
+                    transaction.on_commit(lambda: _jugador_cambiado(nickname, None))
+                    logger.debug("Jugador %s eliminado de la clasificación (Posición: %s)", nickname, posicion_anterior)
+                return None
+
+            mejores = cls.objects.filter(
+                Q(puntos_acumulados__gt=jugador['puntos_acumulados'])
+                | Q(puntos_acumulados=jugador['puntos_acumulados'], dia_registro__gt=jugador['dia_registro'])
+                | Q(puntos_acumulados=jugador['puntos_acumulados'], dia_registro=jugador['dia_registro'],
+                    hora_registro__lt=jugador['hora_registro'])
+                | Q(puntos_acumulados=jugador['puntos_acumulados'], dia_registro=jugador['dia_registro'],
+                    hora_registro=jugador['hora_registro'], nickname__lt=nickname)
+            ).exclude(nickname=nickname).count()
+            posicion = mejores + 1
+
+            if actual is None:
+                # Jugador nuevo: todos los que quedan por detrás bajan un puesto
+                cls.objects.filter(posicion__gte=posicion).update(posicion=F('posicion') + 1)
+                desde, hasta = posicion, None
+                actual = cls(nickname=nickname)
+            elif posicion < actual.posicion:
+                # Sube: los que estaban entre la nueva y la anterior posición bajan un puesto
+                cls.objects.filter(posicion__gte=posicion, posicion__lt=actual.posicion).exclude(
+                    pk=actual.pk).update(posicion=F('posicion') + 1)
+                desde, hasta = posicion, actual.posicion
+            elif posicion > actual.posicion:
+                # Baja: los que estaban entre la anterior y la nueva posición suben un puesto
+                cls.objects.filter(posicion__gt=actual.posicion, posicion__lte=posicion).exclude(
+                    pk=actual.pk).update(posicion=F('posicion') - 1)
+                desde, hasta = actual.posicion, posicion
             else:
-                grupo = 'C'
-            
-            # Actualizar el grupo si es necesario
-            if ultimo_registro and ultimo_registro.grupo != grupo:
-                grupo_anterior = ultimo_registro.grupo
-                ultimo_registro.grupo = grupo
-                ultimo_registro.save()
-                actualizados += 1
-                logger.debug(f"Actualizado grupo de {jugador['nickname']}: {grupo_anterior} -> {grupo} (Posición: {idx})")
-        
-        fin = datetime.now()
-        duracion = (fin - inicio).total_seconds()
-        logger.debug(f"[FIN] Actualizar grupos - Jugadores actualizados: {actualizados}, Duración: {duracion} segundos")
-        
-        return len(jugadores_ordenados)
+                desde, hasta = posicion, posicion
+
+            actual.puntos_acumulados = jugador['puntos_acumulados']
+            actual.dia_registro = jugador['dia_registro']
+            actual.hora_registro = jugador['hora_registro']
+            actual.asistencia_id = jugador['asistencia_id']
+            actual.posicion = posicion
+            actual.grupo = grupo_para_posicion(posicion)
+            actual.save()
+            Asistencia.objects.filter(id=actual.asistencia_id).exclude(grupo=actual.grupo).update(grupo=actual.grupo)
+
+            cls._reasignar_grupos(desde, hasta)
+            # Mover al jugador en la tabla de posiciones en memoria, sin recargarla
+            transaction.on_commit(lambda: _jugador_cambiado(nickname, jugador))
+
+        logger.debug("Clasificación de %s: Posición %s, Grupo %s, Puntos %s", nickname, posicion, actual.grupo, actual.puntos_acumulados)
+        return actual
+
+    @classmethod
+    def _reasignar_grupos(cls, desde, hasta):
+        """
+        Corrige el grupo de los jugadores entre las posiciones desde y hasta (None = sin límite)
+        cuyo grupo ya no corresponde a su posición, y lo replica en su último registro de asistencia.
+
+        Returns:
+            int: Número de jugadores que cambiaron de grupo
+        """
+        actualizados = 0
+        for grupo, inicio_grupo, fin_grupo in rangos_de_grupo():
+            inicio_tramo = max(desde, inicio_grupo)
+            limites = [x for x in (hasta, fin_grupo) if x is not None]
+            fin_tramo = min(limites) if limites else None
+            if fin_tramo is not None and inicio_tramo > fin_tramo:
+                continue
+
+            tramo = cls.objects.filter(posicion__gte=inicio_tramo)
+            if fin_tramo is not None:
+                tramo = tramo.filter(posicion__lte=fin_tramo)
+            cambios = list(tramo.exclude(grupo=grupo).values_list('id', 'asistencia_id'))
+            if not cambios:
+                continue
+
+            cls.objects.filter(id__in=[id_ for id_, _ in cambios]).update(grupo=grupo)
+            Asistencia.objects.filter(id__in=[a for _, a in cambios if a is not None]).update(grupo=grupo)
+            actualizados += len(cambios)
+            logger.debug("%s jugadores pasan al grupo %s (posiciones %s-%s)", len(cambios), grupo, inicio_tramo, fin_tramo or 'fin')
+
+        return actualizados
+
+
+class ArchivoContenido(models.Model):
+    """
+    Archivo guardado por contenido (ver home.almacenamiento). Se guarda una sola vez
+    aunque lo usen muchos registros; referencias cuenta cuántos lo usan.
+    """
+    nombre = models.CharField(max_length=255, unique=True, help_text="Ruta relativa dentro de MEDIA_ROOT")
+    sha256 = models.CharField(max_length=64)
+    tamano = models.PositiveBigIntegerField(help_text='Tamaño en bytes')
+    referencias = models.IntegerField(default=0)
+    creado = models.DateTimeField(auto_now_add=True)
+    # Una subida reciente aún no ha guardado el registro que la usa: no se borra sin
+    # referencias hasta pasados ARCHIVOS_GRACIA_SEGUNDOS (ver home.almacenamiento)
+    subido = models.DateTimeField(default=datetime.now, help_text='Última vez que se subió este contenido')
+
+    class Meta:
+        verbose_name = 'Archivo'
+        verbose_name_plural = 'Archivos'
+
+    def __str__(self):
+        return f"{self.nombre} ({self.referencias} referencias)"
+
+
+class ClasificacionPendiente(models.Model):
+    """
+    Jugadores cuya asistencia cambió y cuya clasificación aún no se ha recalculado.
+    La tarea home.tasks.recalcular_clasificacion los procesa en bloque.
+    """
+    nickname = models.CharField(max_length=255, unique=True)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Clasificación pendiente'
+        verbose_name_plural = 'Clasificaciones pendientes'
+
+    def __str__(self):
+        return self.nickname
 
 
+class MovimientoPuntos(models.Model):
+    """
+    Libro de puntos: cada suma o resta de puntos de un jugador es una fila nueva.
+
+    Las filas no se modifican nunca. Una corrección (editar o borrar un registro de
+    asistencia antiguo) es otro movimiento con la diferencia, así que no hay que
+    reescribir los puntos acumulados de los registros posteriores. El total de cada
+    jugador se mantiene en TotalPuntos con cada movimiento, y los movimientos antiguos
+    se resumen en CierrePuntos (ver CierrePuntos.compactar).
+    """
+    APERTURA = 'apertura'
+    REGISTRO = 'registro'
+    CORRECCION = 'correccion'
+    ELIMINACION = 'eliminacion'
+    IMPORTACION = 'importacion'
+    MOTIVOS = [
+        (APERTURA, 'Saldo inicial'),
+        (REGISTRO, 'Registro de asistencia'),
+        (CORRECCION, 'Corrección de un registro'),
+        (ELIMINACION, 'Registro eliminado'),
+        (IMPORTACION, 'Importación'),
+    ]
+
+    nickname = models.CharField(max_length=255)
+    dia = models.DateField(null=True, blank=True, help_text="Día de evento (Fecha) al que corresponden los puntos")
+    delta = models.IntegerField(help_text="Puntos sumados (o restados si es negativo)")
+    motivo = models.CharField(max_length=20, choices=MOTIVOS)
+    # Sin restricción de clave foránea: el movimiento conserva el id aunque el registro se borre
+    asistencia = models.ForeignKey(
+        Asistencia, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+        related_name='movimientos', help_text="Registro de asistencia que originó el movimiento"
+    )
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Movimiento de puntos'
+        verbose_name_plural = 'Movimientos de puntos'
+        indexes = [
+            models.Index(fields=['nickname', 'id'], name='movimiento_jugador_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nickname} {self.delta:+d} ({self.get_motivo_display()})"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Los movimientos de puntos no se modifican: registra un movimiento de corrección")
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def registrar(cls, movimientos, totales=None):
+        """
+        Añade movimientos al libro y suma sus puntos al total de cada jugador.
+
+        Args:
+            movimientos: Lista de instancias de MovimientoPuntos sin guardar
+            totales: Totales ya bloqueados con TotalPuntos.bloquear (si el llamador los
+                     necesitaba antes); por defecto se bloquean aquí
+
+        Returns:
+            Diccionario nickname -> TotalPuntos con el total actualizado
+        """
+        # Sin punto de guardado propio: si algo falla se deshace la transacción entera del
+        # llamador, que es lo que debe pasar con un registro cuyo movimiento no se anotó
+        with transaction.atomic(savepoint=False):
+            if totales is None:
+                totales = TotalPuntos.bloquear({movimiento.nickname for movimiento in movimientos})
+            cls.objects.bulk_create(movimientos, batch_size=500)
+            cambiados = {}
+            for movimiento in movimientos:
+                total = totales[movimiento.nickname]
+                total.total += movimiento.delta
+                cambiados[movimiento.nickname] = total
+            TotalPuntos.objects.bulk_update(cambiados.values(), ['total'], batch_size=500)
+        return totales
+
+
+class TotalPuntos(models.Model):
+    """Total de puntos de cada jugador según el libro (suma de sus movimientos)."""
+    nickname = models.CharField(max_length=255, unique=True)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Total de puntos'
+        verbose_name_plural = 'Totales de puntos'
+
+    def __str__(self):
+        return f"{self.nickname}: {self.total}"
+
+    @classmethod
+    def bloquear(cls, nicknames):
+        """
+        Bloquea (select_for_update) el total de los jugadores hasta el final de la transacción,
+        creándolo a cero si el jugador aún no tiene movimientos.
+
+        Returns:
+            Diccionario nickname -> TotalPuntos
+        """
+        nicknames = set(nicknames)
+        # ignore_conflicts: si otra petición crea el mismo total a la vez, gana una sola
+        cls.objects.bulk_create([cls(nickname=nickname) for nickname in nicknames], ignore_conflicts=True)
+        return {total.nickname: total for total in cls.objects.select_for_update().filter(nickname__in=nicknames)}
+
+    @classmethod
+    def verificar(cls):
+        """
+        Compara cada total con su cierre más los movimientos posteriores.
+
+        Returns:
+            Lista de tuplas (nickname, total guardado, total según el libro) de los que no coinciden
+        """
+        esperados = defaultdict(int)
+        for nickname, total in CierrePuntos.objects.values_list('nickname', 'total'):
+            esperados[nickname] += total
+        for fila in MovimientoPuntos.objects.values('nickname').annotate(suma=Sum('delta')):
+            esperados[fila['nickname']] += fila['suma']
+
+        diferencias = []
+        guardados = dict(cls.objects.values_list('nickname', 'total'))
+        for nickname in sorted(set(esperados) | set(guardados)):
+            guardado, esperado = guardados.get(nickname, 0), esperados.get(nickname, 0)
+            if guardado != esperado:
+                diferencias.append((nickname, guardado, esperado))
+        return diferencias
+
+
+class CierrePuntos(models.Model):
+    """
+    Resumen de los movimientos ya compactados de un jugador: su suma y el último
+    movimiento incluido. El total de un jugador es su cierre más los movimientos posteriores.
+    """
+    nickname = models.CharField(max_length=255, unique=True)
+    total = models.IntegerField(default=0)
+    hasta_movimiento = models.PositiveBigIntegerField(help_text="Id del último movimiento incluido")
+    movimientos = models.PositiveIntegerField(default=0, help_text="Movimientos resumidos en total")
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Cierre de puntos'
+        verbose_name_plural = 'Cierres de puntos'
 
+    def __str__(self):
+        return f"{self.nickname}: {self.total} (hasta el movimiento {self.hasta_movimiento})"
+
+    @classmethod
+    def compactar(cls, antes_de):
+        """
+        Resume en el cierre de cada jugador los movimientos creados antes de una fecha y los borra.
+
+        Args:
+            antes_de: Fecha y hora; se compactan los movimientos anteriores
+
+        Returns:
+            int: Número de movimientos compactados
+        """
+        with transaction.atomic():
+            hasta = MovimientoPuntos.objects.filter(creado__lt=antes_de).aggregate(hasta=Max('id'))['hasta']
+            if hasta is None:
+                return 0
+            compactables = MovimientoPuntos.objects.filter(id__lte=hasta)
+            sumas = {
+                fila['nickname']: fila
+                for fila in compactables.values('nickname').annotate(suma=Sum('delta'), cantidad=Count('id'))
+            }
+            cierres = {cierre.nickname: cierre for cierre in cls.objects.select_for_update().filter(nickname__in=sumas)}
+            # bulk_update no aplica auto_now
+            ahora = datetime.now()
+            nuevos = []
+            for nickname, fila in sumas.items():
+                cierre = cierres.get(nickname)
+                if cierre is None:
+                    cierre = cls(nickname=nickname, hasta_movimiento=hasta)
+                    nuevos.append(cierre)
+                cierre.total += fila['suma']
+                cierre.movimientos += fila['cantidad']
+                cierre.hasta_movimiento = hasta
+                cierre.actualizado = ahora
+            cls.objects.bulk_update(cierres.values(), ['total', 'movimientos', 'hasta_movimiento', 'actualizado'], batch_size=500)
+            cls.objects.bulk_create(nuevos, batch_size=500)
+            compactados, _ = compactables.delete()
 
+        logger.debug("Libro de puntos compactado - Movimientos: %s, Jugadores: %s, Hasta el movimiento: %s", compactados, len(sumas), hasta)
+        return compactados
 
 
 class Cancion(models.Model):
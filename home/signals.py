@@ -0,0 +1,94 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from home.almacenamiento import registrar_referencias
+from home.cache import invalidar_clasificacion, invalidar_jugador
+from home.fechas import invalidar_fechas
+from home.models import Asistencia, Fecha, MovimientoPuntos
+from home.tasks import programar_recalculo
+
+
+# Los receptores se ejecutan en el orden en que se registran. Los del libro de puntos van
+# primero: sin transacción (autocommit) programar_recalculo ejecuta el recálculo en el acto,
+# y la clasificación sale del total del libro, que ya debe incluir este cambio.
+
+@receiver(pre_save, sender=Asistencia)
+def recordar_puntos_anteriores(sender, instance, update_fields=None, **kwargs):
+    """Guarda los puntos que tenía el registro antes de editarlo (ver anotar_cambio_de_puntos)"""
+    if instance.pk is None or getattr(instance, '_movimiento_registrado', False):
+        return
+    if update_fields is not None and 'puntos' not in update_fields:
+        return
+    instance._puntos_anteriores = sender.objects.filter(pk=instance.pk).values_list('puntos', flat=True).first()
+
+
+@receiver(post_save, sender=Asistencia)
+def anotar_cambio_de_puntos(sender, instance, created, **kwargs):
+    """
+    Anota en el libro de puntos los cambios hechos fuera de registrar_o_actualizar
+    (admin, shell...): un registro nuevo suma sus puntos y una edición, la diferencia.
+    """
+    if instance.__dict__.pop('_movimiento_registrado', False):
+        # registrar_o_actualizar ya anotó el movimiento
+        return
+    anteriores = instance.__dict__.pop('_puntos_anteriores', None)
+    if not isinstance(instance.puntos, int):
+        return
+    if created:
+        delta, motivo = instance.puntos, MovimientoPuntos.REGISTRO
+    elif anteriores is None:
+        # Se guardaron otros campos, los puntos no cambiaron
+        return
+    else:
+        delta, motivo = instance.puntos - anteriores, MovimientoPuntos.CORRECCION
+    if delta:
+        MovimientoPuntos.registrar([MovimientoPuntos(
+            nickname=instance.nickname, dia=instance.dia, delta=delta, motivo=motivo, asistencia=instance,
+        )])
+
+
+@receiver(post_delete, sender=Asistencia)
+def anotar_eliminacion(sender, instance, **kwargs):
+    """Borrar un registro resta sus puntos con un movimiento compensatorio"""
+    if instance.puntos:
+        MovimientoPuntos.registrar([MovimientoPuntos(
+            nickname=instance.nickname, dia=instance.dia, delta=-instance.puntos,
+            motivo=MovimientoPuntos.ELIMINACION, asistencia_id=instance.pk,
+        )])
+
+
+@receiver(post_save, sender=Asistencia)
+@receiver(post_delete, sender=Asistencia)
+def actualizar_clasificacion(sender, instance, **kwargs):
+    """Programa el recálculo de la clasificación solo para el jugador cuya asistencia cambió"""
+    programar_recalculo(instance.nickname)
+
+
+@receiver(post_save, sender=Asistencia)
+@receiver(post_delete, sender=Asistencia)
+@receiver(post_save, sender=Fecha)
+@receiver(post_delete, sender=Fecha)
+def invalidar_cache_clasificacion(sender, **kwargs):
+    """Cualquier cambio de asistencias o fechas invalida la clasificación en caché"""
+    # Tras el commit, para que nadie vuelva a guardar en caché datos aún no confirmados
+    transaction.on_commit(invalidar_clasificacion)
+
+
+@receiver(post_save, sender=Asistencia)
+@receiver(post_delete, sender=Asistencia)
+def invalidar_cache_jugador(sender, instance, **kwargs):
+    """verificar_nickname guarda los datos de cada jugador en caché: borrarlos tras el cambio"""
+    nickname = instance.nickname
+    transaction.on_commit(lambda: invalidar_jugador(nickname))
+
+
+@receiver(post_save, sender=Fecha)
+@receiver(post_delete, sender=Fecha)
+def invalidar_registro_fechas(sender, **kwargs):
+    """Las vistas leen las fechas desde la caché (ver home.fechas): volver a leerlas tras el cambio"""
+    transaction.on_commit(invalidar_fechas)
+
+
+# Contar referencias a los avatares guardados por contenido
+registrar_referencias(Asistencia, 'avatar')
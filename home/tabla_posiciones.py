@@ -0,0 +1,300 @@
+"""
+Tabla de posiciones en memoria para consultar el ranking en O(log n).
+
+Cada proceso guarda la clasificación (ver home.models.Clasificacion) en una lista
+ordenada (sortedcontainers.SortedList) por clave_clasificacion: más puntos primero,
+después el día más reciente, la hora de registro y el nickname. Así, la posición de un
+jugador, una página del ranking o los jugadores de un grupo se obtienen sin recorrer
+toda la tabla ni consultar la base de datos.
+
+La tabla se carga una vez por proceso y se actualiza en el sitio cada vez que
+Clasificacion.actualizar_jugador confirma un cambio. Para que los demás procesos
+(otros workers, Celery) se enteren, cada cambio incrementa un contador de versión en la
+caché: con una caché compartida, un proceso cuya versión no coincide recarga la tabla
+desde la base de datos la próxima vez que la usa. Con una caché por proceso
+(LocMemCache) el contador solo cambia en el proceso que hizo el cambio, así que además
+cada proceso recarga su tabla cuando pasan CLASIFICACION_TABLA_TIMEOUT segundos.
+
+Si la última instantánea compartida (ver home.instantanea) está en la versión actual,
+obtener_tabla la devuelve en lugar de la tabla del proceso: se consulta desde el archivo
+mapeado en memoria, sin cargar nada en el worker. La instantánea solo se usa (y solo se
+escribe) con una caché compartida: con la caché en memoria de cada proceso, el contador
+de versión de un worker no dice nada de los cambios confirmados por los demás.
+
+Uso:
+    tabla = obtener_tabla()
+    tabla.posicion('Lobo')          # 1, 2, 3... o None
+    tabla.pagina(2, tamano=50)      # posiciones 51 a 100
+    tabla.del_grupo('A')
+    tabla.con_prefijo('lo')         # los 10 mejor clasificados cuyo nickname empieza por 'lo' (o 'Lo', 'LO'...)
+"""
+import heapq
+import logging
+import threading
+import time
+
+from django.conf import settings
+from sortedcontainers import SortedList
+
+from home.cache import cache_compartida, incrementar_contador, version_contador
+from home.instantanea import abrir_instantanea, escribir_instantanea
+from home.models import (
+    Clasificacion, clave_clasificacion, clave_nickname, grupo_para_posicion, limites_de_prefijo, rangos_de_grupo,
+)
+
+logger = logging.getLogger('asistencia_debug')
+
+# Contador de versión de la clasificación persistida (uno por cambio confirmado)
+CLAVE_VERSION_TABLA = 'clasificacion:tabla'
+
+# Datos de cada jugador que guarda la tabla
+CAMPOS_JUGADOR = ('nickname', 'puntos_acumulados', 'dia_registro', 'hora_registro', 'asistencia_id')
+
+
+class TablaPosiciones:
+    """
+    Ranking ordenado de jugadores con consultas de posición en O(log n).
+
+    Guarda la clave de orden de cada jugador en una SortedList y sus datos en un
+    diccionario por nickname. Todas las operaciones toman un cerrojo: la tabla se
+    comparte entre los hilos del proceso.
+    """
+
+    def __init__(self):
+        self.version = None
+        # Momento (time.monotonic) de la última carga desde la base de datos
+        self.cargada = None
+        self._orden = SortedList()
+        self._jugadores = {}
+        # Nicknames en orden alfabético sin distinguir mayúsculas (clave_nickname), para
+        # buscar por prefijo (ver con_prefijo)
+        self._nicknames = SortedList()
+        self._cerrojo = threading.RLock()
+
+    def __len__(self):
+        return len(self._orden)
+
+    def cargar(self, jugadores, version=None):
+        """
+        Reemplaza el contenido de la tabla.
+
+        Args:
+            jugadores: Iterable de diccionarios con CAMPOS_JUGADOR
+            version: Versión de la clasificación a la que corresponden los datos
+        """
+        datos = {jugador['nickname']: dict(jugador) for jugador in jugadores}
+        orden = SortedList(clave_clasificacion(jugador) for jugador in datos.values())
+        nicknames = SortedList(clave_nickname(nickname) for nickname in datos)
+        with self._cerrojo:
+            self._jugadores = datos
+            self._orden = orden
+            self._nicknames = nicknames
+            self.version = version
+            self.cargada = time.monotonic()
+
+    def caducada(self, segundos):
+        """Indica si la tabla se cargó hace más de `segundos` (o nunca)."""
+        return self.cargada is None or time.monotonic() - self.cargada > segundos
+
+    def actualizar(self, jugador):
+        """Inserta o mueve a un jugador según sus nuevos datos (O(log n))."""
+        with self._cerrojo:
+            self.quitar(jugador['nickname'])
+            datos = {campo: jugador[campo] for campo in CAMPOS_JUGADOR}
+            self._jugadores[datos['nickname']] = datos
+            self._orden.add(clave_clasificacion(datos))
+            self._nicknames.add(clave_nickname(datos['nickname']))
+
+    def quitar(self, nickname):
+        """Quita a un jugador de la tabla, si está."""
+        with self._cerrojo:
+            anterior = self._jugadores.pop(nickname, None)
+            if anterior is not None:
+                self._orden.remove(clave_clasificacion(anterior))
+                self._nicknames.remove(clave_nickname(nickname))
+
+    def aplicar_cambio(self, nickname, jugador, version):
+        """
+        Aplica el cambio de un jugador recién confirmado en la base de datos.
+
+        Args:
+            nickname: Jugador que cambió
+            jugador: Sus nuevos datos, o None si ya no tiene registros
+            version: Versión de la clasificación tras el cambio (None si se desconoce)
+
+        Si la tabla no estaba en la versión inmediatamente anterior se ha perdido algún
+        cambio de otro proceso: se marca para recargarla en lugar de actualizarla.
+        """
+        with self._cerrojo:
+            if self.version is None or version is None or version != self.version + 1:
+                self.version = None
+                return
+            if jugador is None:
+                self.quitar(nickname)
+            else:
+                self.actualizar(jugador)
+            self.version = version
+
+    def posicion(self, nickname):
+        """Posición (1, 2, 3...) de un jugador, o None si no está en la tabla."""
+        with self._cerrojo:
+            jugador = self._jugadores.get(nickname)
+            if jugador is None:
+                return None
+            return self._orden.index(clave_clasificacion(jugador)) + 1
+
+    def grupo(self, nickname):
+        """Grupo (A, B o C) que corresponde a la posición de un jugador, o None."""
+        posicion = self.posicion(nickname)
+        return grupo_para_posicion(posicion) if posicion is not None else None
+
+    def rango(self, desde, hasta=None):
+        """
+        Jugadores entre dos posiciones (ambas incluidas).
+
+        Args:
+            desde: Primera posición (1 es el primero)
+            hasta: Última posición, o None hasta el final
+
+        Returns:
+            Lista de diccionarios con los datos del jugador más 'posicion' y 'grupo'
+        """
+        with self._cerrojo:
+            claves = list(self._orden.islice(desde - 1, hasta))
+            filas = [self._jugadores[clave[-1]] for clave in claves]
+        return [
+            dict(jugador, posicion=posicion, grupo=grupo_para_posicion(posicion))
+            for posicion, jugador in enumerate(filas, desde)
+        ]
+
+    def pagina(self, numero, tamano=50):
+        """Página `numero` (empezando en 1) del ranking, con `tamano` jugadores por página."""
+        desde = (numero - 1) * tamano + 1
+        return self.rango(desde, desde + tamano - 1)
+
+    def del_grupo(self, grupo):
+        """Jugadores de un grupo (A, B o C) en orden de posición."""
+        for letra, desde, hasta in rangos_de_grupo():
+            if letra == grupo:
+                return self.rango(desde, hasta)
+        return []
+
+    def todos(self):
+        """Todos los jugadores en orden de posición."""
+        return self.rango(1)
+
+    def con_prefijo(self, prefijo, limite=10):
+        """
+        Jugadores cuyo nickname empieza por `prefijo` (sin distinguir mayúsculas).
+
+        Los m nicknames con el prefijo están seguidos en el orden alfabético: se cuentan
+        con dos búsquedas binarias. Calcular la posición de todos cuesta O(m log n); si m
+        es mayor que `limite`, antes se recorre el ranking desde el primer puesto, como
+        mucho esos mismos m log n pasos, y se para al encontrar `limite` jugadores (con un
+        prefijo corto y muy común se encuentran enseguida).
+
+        Args:
+            prefijo: Comienzo del nickname
+            limite: Máximo de jugadores devueltos
+
+        Returns:
+            Los `limite` mejor clasificados, en orden de posición, con 'posicion' y 'grupo'
+        """
+        limites = limites_de_prefijo(prefijo)
+        if limites is None:
+            return []
+        desde, hasta = limites
+        with self._cerrojo:
+            inicio = self._nicknames.bisect_left(desde)
+            fin = len(self._nicknames) if hasta is None else self._nicknames.bisect_left(hasta)
+            posiciones = []
+            if fin - inicio > limite:
+                presupuesto = (fin - inicio) * len(self._orden).bit_length()
+                for posicion, clave in enumerate(self._orden.islice(0, presupuesto), 1):
+                    if clave[-1].casefold().startswith(desde[0]):
+                        posiciones.append(posicion)
+                        if len(posiciones) == limite:
+                            break
+            if len(posiciones) < limite:
+                posiciones = heapq.nsmallest(limite, (
+                    self.posicion(nickname) for _, nickname in self._nicknames.islice(inicio, fin)
+                ))
+            filas = [(posicion, self._jugadores[self._orden[posicion - 1][-1]]) for posicion in posiciones]
+        return [
+            dict(jugador, posicion=posicion, grupo=grupo_para_posicion(posicion))
+            for posicion, jugador in filas
+        ]
+
+
+# Tabla del proceso actual
+tabla = TablaPosiciones()
+
+
+def ruta_instantanea():
+    """Ruta de la instantánea compartida, o None si está desactivada o la caché no es compartida."""
+    ruta = getattr(settings, 'CLASIFICACION_INSTANTANEA', None)
+    if not ruta or not cache_compartida():
+        return None
+    return ruta
+
+
+def obtener_tabla():
+    """
+    Devuelve la instantánea compartida si está al día; si no, la tabla del proceso,
+    recargándola si otro proceso cambió la clasificación (o, con una caché por proceso,
+    si se cargó hace más de CLASIFICACION_TABLA_TIMEOUT segundos).
+
+    La versión se lee antes de cargar los datos: si entre medias se confirma otro cambio,
+    la tabla queda con la versión antigua y se vuelve a cargar la próxima vez.
+    """
+    version = version_contador(CLAVE_VERSION_TABLA)
+    ruta = ruta_instantanea()
+    instantanea = abrir_instantanea(ruta) if ruta else None
+    if instantanea is not None and instantanea.version == version:
+        return instantanea
+    caducada = not cache_compartida() and tabla.caducada(getattr(settings, 'CLASIFICACION_TABLA_TIMEOUT', 30))
+    if tabla.version != version or caducada:
+        tabla.cargar(Clasificacion.objects.values(*CAMPOS_JUGADOR), version)
+        logger.debug("Tabla de posiciones cargada - Jugadores: %s, Versión: %s", len(tabla), version)
+    return tabla
+
+
+def jugador_cambiado(nickname, jugador):
+    """
+    Registra el cambio confirmado de un jugador (llamar tras el commit).
+
+    Args:
+        nickname: Jugador que cambió
+        jugador: Sus nuevos datos (ver CAMPOS_JUGADOR), o None si salió de la clasificación
+    """
+    tabla.aplicar_cambio(nickname, jugador, incrementar_contador(CLAVE_VERSION_TABLA))
+
+
+def tabla_reconstruida():
+    """Registra que la clasificación se reconstruyó entera (llamar tras el commit)."""
+    incrementar_contador(CLAVE_VERSION_TABLA)
+    tabla.version = None
+    publicar_instantanea()
+
+
+def publicar_instantanea():
+    """
+    Escribe la instantánea compartida con la clasificación confirmada (llamar tras el commit).
+
+    Returns:
+        Número de jugadores publicados, o None si la instantánea está desactivada
+    """
+    ruta = ruta_instantanea()
+    if not ruta:
+        return None
+    # Igual que en obtener_tabla: la versión se lee antes que los datos
+    version = version_contador(CLAVE_VERSION_TABLA)
+    jugadores = list(Clasificacion.objects.order_by('posicion').values(*CAMPOS_JUGADOR, 'grupo'))
+    try:
+        tamano = escribir_instantanea(str(ruta), jugadores, version)
+    except OSError:
+        # Sin instantánea los workers siguen usando su tabla en memoria
+        logger.exception("No se pudo escribir la instantánea de la clasificación en %s", ruta)
+        return None
+    logger.debug("Instantánea publicada - Jugadores: %s, Bytes: %s, Versión: %s", len(jugadores), tamano, version)
+    return len(jugadores)
@@ -0,0 +1,92 @@
+"""
+Recálculo diferido de la clasificación.
+
+Cada cambio de asistencia marca al jugador como pendiente y programa una tarea con
+un pequeño retraso (CLASIFICACION_DEBOUNCE_SEGUNDOS). Mientras esa tarea espera, los
+siguientes cambios no programan otra: una ráfaga de registros se resuelve con un solo
+recálculo. El aviso de "recálculo en espera" se guarda en la caché, así que solo agrupa
+cambios si la caché es compartida (ver home.cache.cache_compartida); con la caché en
+memoria de cada proceso se programa una tarea por cambio, y las que llegan cuando otra
+ya vació la lista de pendientes terminan sin hacer nada.
+
+Sin broker de Celery (CELERY_TASK_ALWAYS_EAGER) no hay retraso: la tarea se ejecuta al
+confirmar la transacción, dentro de la misma petición que registró la asistencia. En
+ese modo no se escribe la instantánea compartida de la clasificación (solo hay un
+proceso que la use, y su tabla en memoria ya se actualiza en el sitio).
+"""
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from home.almacenamiento import almacenamiento_por_contenido
+from home.cache import cache_compartida, invalidar_clasificacion
+from home.miniaturas import generar_variantes
+from home.tabla_posiciones import publicar_instantanea
+from home.trazas import trazar
+from home.models import Clasificacion, ClasificacionPendiente
+
+logger = logging.getLogger('asistencia_debug')
+
+CLAVE_PROGRAMADA = 'clasificacion:recalculo_programado'
+
+# A partir de cuántos jugadores pendientes sale más barato reconstruir todo
+UMBRAL_RECONSTRUIR = 50
+
+
+def programar_recalculo(nickname):
+    """Marca al jugador como pendiente y programa el recálculo si no hay uno en espera."""
+    ClasificacionPendiente.objects.bulk_create(
+        [ClasificacionPendiente(nickname=nickname)], ignore_conflicts=True
+    )
+    transaction.on_commit(_encolar_recalculo)
+
+
+def _encolar_recalculo():
+    espera = getattr(settings, 'CLASIFICACION_DEBOUNCE_SEGUNDOS', 5)
+    # cache.add solo tiene éxito si no hay otro recálculo en espera (y solo lo saben los
+    # demás procesos si la caché es compartida: si no, se programa siempre)
+    if not cache_compartida() or cache.add(CLAVE_PROGRAMADA, True, timeout=espera + 60):
+        recalcular_clasificacion.apply_async(countdown=espera)
+
+
+@shared_task
+@trazar('recalcular_clasificacion')
+def recalcular_clasificacion():
+    """
+    Recalcula la clasificación de todos los jugadores pendientes.
+
+    Returns:
+        int: Número de jugadores recalculados
+    """
+    # Los cambios que lleguen a partir de aquí programarán un nuevo recálculo
+    cache.delete(CLAVE_PROGRAMADA)
+
+    with transaction.atomic():
+        pendientes = list(ClasificacionPendiente.objects.select_for_update().values_list('nickname', flat=True))
+        if not pendientes:
+            return 0
+        ClasificacionPendiente.objects.filter(nickname__in=pendientes).delete()
+
+        if len(pendientes) >= UMBRAL_RECONSTRUIR:
+            Clasificacion.reconstruir()
+        else:
+            for nickname in pendientes:
+                Clasificacion.actualizar_jugador(nickname)
+            transaction.on_commit(invalidar_clasificacion)
+            # Una sola instantánea compartida por recálculo (reconstruir ya publica la suya);
+            # sin broker el recálculo va dentro de la petición y no se escribe
+            if not recalcular_clasificacion.app.conf.task_always_eager:
+                transaction.on_commit(publicar_instantanea)
+
+    logger.debug("Clasificación recalculada para %s jugadores pendientes", len(pendientes))
+    return len(pendientes)
+
+
+@shared_task
+@trazar('generar_miniaturas')
+def generar_miniaturas(nombre, recortar=True):
+    """Genera de antemano todas las miniaturas de una imagen recién subida."""
+    generar_variantes(almacenamiento_por_contenido, nombre, recortar)
@@ -0,0 +1,24 @@
+from django import template
+
+from home.miniaturas import formato_original, generar_variante
+
+register = template.Library()
+
+
+@register.simple_tag
+def miniatura(archivo, tamano=128, formato='webp', recortar=True):
+    """
+    URL de una miniatura de la imagen (se genera la primera vez que se pide).
+
+    Uso: {% miniatura asistencia.avatar 64 %} para WebP, o
+         {% miniatura asistencia.avatar 64 'original' %} para el formato del original.
+    Si la imagen no se puede procesar devuelve la URL del original.
+    """
+    if not archivo:
+        return ''
+    if formato == 'original':
+        formato = formato_original(archivo.name)
+    variante = generar_variante(archivo.storage, archivo.name, int(tamano), formato, recortar)
+    if variante is None:
+        return archivo.url
+    return archivo.storage.url(variante)
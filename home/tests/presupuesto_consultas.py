@@ -0,0 +1,159 @@
+"""
+Pruebas de presupuesto de consultas por vista.
+
+PresupuestoConsultasMixin recorre todas las rutas de una app (según el URLconf del
+proyecto) con datos sintéticos a dos tamaños (ver home.datos_prueba) y falla si:
+    - una vista hace más consultas con los datos grandes que con los pequeños
+      (el número de consultas crece con los datos: típico N+1), o
+    - una vista supera el presupuesto de consultas declarado para ella.
+
+Es código de pruebas (no se importa desde la aplicación). Uso en las pruebas de una app:
+
+    from home.tests.presupuesto_consultas import PresupuestoConsultasMixin
+
+    class PresupuestoConsultasHomeTests(PresupuestoConsultasMixin, TestCase):
+        app = 'home'
+        presupuestos = {'puntos_generales': 4}
+        parametros = {'verificar_nickname': {'nickname': 'Lobo00001'}}
+        omitidas = {'puntos_torneo': "falta la plantilla puntos_torneo.html"}
+
+Las rutas nuevas se miden solas con presupuesto_por_defecto; las que no se puedan
+medir se declaran en omitidas con el motivo.
+"""
+import re
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+
+from home.datos_prueba import nickname_de, sembrar_datos
+
+# Datos pequeños; los grandes multiplican por FACTOR_GRANDE jugadores, fechas y usuarios
+TAMANO_PEQUENO = {'jugadores': 20, 'fechas': 5, 'usuarios': 10}
+FACTOR_GRANDE = 10
+
+
+def _primera_fecha():
+    from home.models import Fecha
+    return Fecha.objects.order_by('pk').values_list('pk', flat=True).first()
+
+
+# Parámetros de ruta (<int:fecha_id>, <str:username>...) y cómo obtener un valor válido
+VALORES_DE_RUTA = {
+    'fecha_id': _primera_fecha,
+    'username': lambda: nickname_de(1).lower(),
+}
+
+PATRON_PARAMETRO = re.compile(r'<(?:\w+:)?(\w+)>')
+
+
+def rutas_de_app(app, resolver=None, prefijo=''):
+    """
+    Rutas del proyecto cuya vista pertenece a una app.
+
+    Args:
+        app: Nombre de la app (paquete), ej: 'home'
+        resolver: Resolver desde el que se recorre (por defecto el del proyecto)
+        prefijo: Prefijo acumulado de los include() recorridos
+
+    Returns:
+        Lista de tuplas (nombre de la ruta, patrón completo, ej: 'admin/fechas/editar/<int:fecha_id>/')
+    """
+    resolver = resolver or get_resolver()
+    rutas = []
+    for patron in resolver.url_patterns:
+        if isinstance(patron, URLResolver):
+            rutas.extend(rutas_de_app(app, patron, prefijo + str(patron.pattern)))
+        elif patron.callback.__module__.split('.')[0] == app:
+            completo = prefijo + str(patron.pattern)
+            rutas.append((patron.name or completo, completo))
+    return rutas
+
+
+def construir_url(patron, valores):
+    """URL absoluta de un patrón sustituyendo sus parámetros por los valores dados."""
+    return '/' + PATRON_PARAMETRO.sub(lambda m: str(valores[m.group(1)]), patron)
+
+
+class PresupuestoConsultasMixin:
+    """
+    Mixin para TestCase que comprueba el número de consultas de todas las vistas de una app.
+
+    Atributos:
+        app: Nombre de la app cuyas rutas se recorren
+        presupuestos: Máximo de consultas por nombre de ruta
+        presupuesto_por_defecto: Máximo para las rutas sin presupuesto declarado
+        parametros: Parámetros GET por nombre de ruta (para ejercitar la vista con datos)
+        omitidas: Rutas que no se miden, con el motivo
+    """
+    app = None
+    presupuestos = {}
+    presupuesto_por_defecto = 5
+    parametros = {}
+    omitidas = {}
+
+    def medir_rutas(self, escala=1):
+        """
+        Siembra datos a la escala dada, pide cada ruta como staff y cuenta sus consultas.
+
+        Los datos se deshacen al terminar (savepoint), así se pueden medir varias escalas
+        en la misma prueba.
+
+        Returns:
+            Diccionario nombre de ruta -> número de consultas
+        """
+        from users.models import CreateUser
+
+        conteos = {}
+        with transaction.atomic():
+            sembrar_datos(
+                jugadores=TAMANO_PEQUENO['jugadores'] * escala,
+                fechas=TAMANO_PEQUENO['fechas'] * escala,
+                usuarios=TAMANO_PEQUENO['usuarios'] * escala,
+            )
+            staff = CreateUser.objects.create_superuser(
+                username='presupuesto', email='presupuesto@wolves.test', password='presupuesto'
+            )
+            cliente = Client()
+            for nombre, patron in rutas_de_app(self.app):
+                if nombre in self.omitidas:
+                    continue
+                valores = {clave: VALORES_DE_RUTA[clave]() for clave in PATRON_PARAMETRO.findall(patron)}
+                url = construir_url(patron, valores)
+                # Sesión nueva y caché vacía: se cuentan las consultas reales de la vista
+                cliente.force_login(staff)
+                cache.clear()
+                with CaptureQueriesContext(connection) as consultas:
+                    respuesta = cliente.get(url, self.parametros.get(nombre, {}))
+                self.assertLess(respuesta.status_code, 500, f"{url} respondió {respuesta.status_code}")
+                conteos[nombre] = len(consultas)
+            transaction.set_rollback(True)
+        cache.clear()
+        return conteos
+
+    def test_consultas_no_crecen_con_los_datos(self):
+        self.assertTrue(rutas_de_app(self.app), f"No se encontraron rutas de la app {self.app}")
+        pequeno = self.medir_rutas(1)
+        grande = self.medir_rutas(FACTOR_GRANDE)
+
+        for nombre, consultas in pequeno.items():
+            with self.subTest(ruta=nombre):
+                self.assertLessEqual(
+                    grande[nombre], consultas,
+                    f"{nombre}: {consultas} consultas con datos pequeños y {grande[nombre]} con "
+                    f"{FACTOR_GRANDE}x más datos (el número de consultas crece con los datos)",
+                )
+                presupuesto = self.presupuestos.get(nombre, self.presupuesto_por_defecto)
+                self.assertLessEqual(
+                    max(consultas, grande[nombre]), presupuesto,
+                    f"{nombre}: {max(consultas, grande[nombre])} consultas, presupuesto {presupuesto}",
+                )
+
+    def test_presupuestos_declarados_existen(self):
+        # Un presupuesto u omisión de una ruta que ya no existe suele ser un nombre mal escrito
+        nombres = {nombre for nombre, _ in rutas_de_app(self.app)}
+        for nombre in [*self.presupuestos, *self.parametros, *self.omitidas]:
+            with self.subTest(ruta=nombre):
+                self.assertIn(nombre, nombres)
@@ -0,0 +1,88 @@
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from home.almacenamiento import almacenamiento_por_contenido, borrar_sin_referencias
+from home.models import ArchivoContenido, Asistencia
+
+
+@override_settings(CLASIFICACION_INSTANTANEA=None, ARCHIVOS_GRACIA_SEGUNDOS=0)
+class AlmacenamientoPorContenidoTests(TestCase):
+
+    def setUp(self):
+        temporal = tempfile.TemporaryDirectory()
+        self.addCleanup(temporal.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=temporal.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        miniaturas = mock.patch('home.tasks.generar_miniaturas.delay')
+        miniaturas.start()
+        self.addCleanup(miniaturas.stop)
+
+    def registro(self, nickname, contenido, dia=5):
+        registro = Asistencia(nickname=nickname, puntos=1, puntos_acumulados=1, grupo='C', fecha=datetime(2026, 1, dia, 10, 0))
+        registro.avatar = ContentFile(contenido, name='foto.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            registro.save()
+        return registro
+
+    def referencias(self, nombre):
+        return ArchivoContenido.objects.values_list('referencias', flat=True).filter(nombre=nombre).first()
+
+    def test_el_mismo_contenido_se_guarda_una_vez(self):
+        lobo = self.registro('Lobo', b'imagen')
+        loba = self.registro('Loba', b'imagen')
+
+        self.assertEqual(lobo.avatar.name, loba.avatar.name)
+        self.assertTrue(lobo.avatar.name.startswith('avatars/'))
+        self.assertEqual(self.referencias(lobo.avatar.name), 2)
+        self.assertEqual(ArchivoContenido.objects.count(), 1)
+
+    def test_reemplazar_y_borrar_cuentan_referencias(self):
+        lobo = self.registro('Lobo', b'imagen')
+        loba = self.registro('Loba', b'imagen')
+        anterior = lobo.avatar.name
+
+        lobo.avatar = ContentFile(b'otra', name='otra.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            lobo.save()
+        self.assertEqual((self.referencias(anterior), self.referencias(lobo.avatar.name)), (1, 1))
+
+        # Sin referencias se borran la fila y el archivo
+        with self.captureOnCommitCallbacks(execute=True):
+            loba.delete()
+        self.assertIsNone(self.referencias(anterior))
+        self.assertFalse(almacenamiento_por_contenido.exists(anterior))
+        self.assertTrue(almacenamiento_por_contenido.exists(lobo.avatar.name))
+
+    @override_settings(ARCHIVOS_GRACIA_SEGUNDOS=600)
+    def test_una_subida_reciente_no_se_borra(self):
+        lobo = self.registro('Lobo', b'imagen')
+        nombre = lobo.avatar.name
+        ArchivoContenido.objects.update(subido=datetime.now() - timedelta(hours=1))
+        # Otro proceso sube el mismo contenido mientras este borra su última referencia
+        with self.captureOnCommitCallbacks(execute=True):
+            lobo.delete()
+            self.assertEqual(almacenamiento_por_contenido.save('avatars/foto.png', ContentFile(b'imagen')), nombre)
+        self.assertTrue(almacenamiento_por_contenido.exists(nombre))
+
+        # Si el registro que la iba a usar nunca se guarda, limpiar_archivos la borra más tarde
+        self.assertEqual(borrar_sin_referencias(), 0)
+        ArchivoContenido.objects.update(subido=datetime.now() - timedelta(hours=1))
+        self.assertEqual(borrar_sin_referencias(), 1)
+        self.assertFalse(almacenamiento_por_contenido.exists(nombre))
+
+    def test_subir_sin_fila_vuelve_a_escribir_el_archivo(self):
+        nombre = almacenamiento_por_contenido.save('avatars/foto.png', ContentFile(b'imagen'))
+        # Un borrado quitó la fila y va a quitar el archivo: la subida no debe confiar en él
+        ArchivoContenido.objects.filter(nombre=nombre).delete()
+        with open(almacenamiento_por_contenido.path(nombre), 'wb') as archivo:
+            archivo.write(b'a medias')
+
+        self.assertEqual(almacenamiento_por_contenido.save('avatars/foto.png', ContentFile(b'imagen')), nombre)
+        with almacenamiento_por_contenido.open(nombre) as archivo:
+            self.assertEqual(archivo.read(), b'imagen')
+        self.assertEqual(self.referencias(nombre), 0)
@@ -0,0 +1,84 @@
+from datetime import date, datetime
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from home.cache import obtener_clasificacion
+from home.models import Asistencia, Fecha
+from home.views import renderizar_grupos
+
+
+@override_settings(CLASIFICACION_INSTANTANEA=None, CLASIFICACION_CACHE_TIMEOUT=3600, CLASIFICACION_CACHE_TIMEOUT_PROCESO=30)
+class ClasificacionEnCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fecha = Fecha.objects.create(nombre='Día 1', fecha=date(2026, 1, 5), activa=True)
+        Asistencia.registrar_o_actualizar({'nickname': 'Lobo', 'puntos': 5, 'fecha': datetime(2026, 1, 5, 10, 0)})
+
+    def pagina(self, **parametros):
+        return self.client.get(reverse('puntos_generales'), parametros).content.decode()
+
+    def test_un_registro_cambia_cada_pagina_en_cache(self):
+        for parametros in ({}, {'fecha_id': self.fecha.pk}, {'fecha': '2026-01-05'}):
+            with self.subTest(**parametros):
+                self.assertNotIn('Zorro', self.pagina(**parametros))
+        with self.captureOnCommitCallbacks(execute=True):
+            Asistencia.registrar_o_actualizar({'nickname': 'Zorro', 'puntos': 3, 'fecha': datetime(2026, 1, 5, 11, 0)})
+
+        for parametros in ({}, {'fecha_id': self.fecha.pk}, {'fecha': '2026-01-05'}):
+            with self.subTest(**parametros):
+                self.assertIn('Zorro', self.pagina(**parametros))
+
+    def guardar(self, compartida):
+        with mock.patch('home.cache.cache') as cache, \
+                mock.patch('home.cache.cache_compartida', return_value=compartida):
+            cache.get.return_value = None
+            obtener_clasificacion('ultima', dict)
+        return cache.set.call_args
+
+    def test_con_cache_local_caduca_pronto(self):
+        self.assertEqual(self.guardar(compartida=False), mock.call(mock.ANY, {}, 30))
+
+    def test_con_cache_compartida_dura_mas(self):
+        self.assertEqual(self.guardar(compartida=True), mock.call(mock.ANY, {}, 3600))
+
+
+class FragmentosPorGrupoTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    @staticmethod
+    def datos(puntos_de_c):
+        def fila(nickname, puntos, grupo):
+            return SimpleNamespace(nickname=nickname, apodo='', puntos=puntos, puntos_acumulados=puntos, grupo=grupo, avatar=None)
+        return {
+            'grupos_ordenados': ['A', 'B', 'C'],
+            'asistencias_por_grupo': {
+                'A': [fila('Lobo', 9, 'A')],
+                'B': [fila('Loba', 6, 'B')],
+                'C': [fila('Zorro', puntos_de_c, 'C')],
+            },
+        }
+
+    def renderizar(self, datos):
+        with mock.patch('home.views.render_to_string', wraps=render_to_string) as renderizar:
+            renderizadas = renderizar_grupos('ultima', datos)
+        return renderizadas, [llamada.args[1]['grupo'] for llamada in renderizar.call_args_list]
+
+    def test_un_cambio_en_c_solo_vuelve_a_renderizar_c(self):
+        antes, grupos = self.renderizar(self.datos(puntos_de_c=2))
+        self.assertEqual(grupos, ['A', 'B', 'C'])
+
+        despues, grupos = self.renderizar(self.datos(puntos_de_c=3))
+        self.assertEqual(grupos, ['C'])
+        for grupo in ('A', 'B'):
+            self.assertEqual(despues[grupo], antes[grupo])
+        self.assertNotEqual(despues['C'][0], antes['C'][0])
+        self.assertIn('>3<', despues['C'][1])
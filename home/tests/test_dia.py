@@ -0,0 +1,64 @@
+from datetime import date, datetime
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from home.models import Asistencia, Fecha
+from home.views import calcular_puntos_generales
+
+
+@override_settings(CLASIFICACION_INSTANTANEA=None)
+class DiaRegistroTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fecha = Fecha.objects.create(nombre='Día 1', fecha=date(2026, 1, 5), activa=True)
+        # Cerca de medianoche: el día sale de la fecha y hora, no de la hora del servidor
+        cls.tarde = Asistencia.registrar_o_actualizar({'nickname': 'Lobo', 'puntos': 5, 'fecha': datetime(2026, 1, 5, 23, 30)})
+        Asistencia.registrar_o_actualizar({'nickname': 'Loba', 'puntos': 3, 'fecha': datetime(2026, 1, 6, 0, 10)})
+
+    def test_save_calcula_el_dia(self):
+        self.assertEqual(self.tarde.dia, date(2026, 1, 5))
+
+        self.tarde.fecha = datetime(2026, 1, 4, 9, 0)
+        self.tarde.save(update_fields=['fecha'])
+        self.assertEqual(Asistencia.objects.get(pk=self.tarde.pk).dia, date(2026, 1, 4))
+
+    def nicknames(self, fecha_id=None, fecha=None):
+        datos = calcular_puntos_generales(fecha_id, fecha)
+        return [a.nickname for grupo in datos['grupos_ordenados'] for a in datos['asistencias_por_grupo'][grupo]]
+
+    def test_filtro_por_fecha_de_evento(self):
+        self.assertEqual(self.nicknames(fecha_id=str(self.fecha.pk)), ['Lobo'])
+        self.assertEqual(self.nicknames(fecha_id='999'), [])
+
+    def test_filtro_por_dia(self):
+        self.assertEqual(self.nicknames(fecha='2026-01-06'), ['Loba'])
+        self.assertEqual(self.nicknames(fecha='2026-01-07'), [])
+        self.assertEqual(self.nicknames(fecha='no-es-fecha'), [])
+
+
+class RellenarDiaMigracionTests(TransactionTestCase):
+    antes = [('home', '0017_clasificacionpendiente')]
+    despues = [('home', '0018_asistencia_dia')]
+
+    def tearDown(self):
+        MigrationExecutor(connection).migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_rellena_el_dia_de_los_registros_existentes(self):
+        ejecutor = MigrationExecutor(connection)
+        ejecutor.migrate(self.antes)
+        apps = ejecutor.loader.project_state(self.antes).apps
+        Asistencia = apps.get_model('home', 'Asistencia')
+        Asistencia.objects.create(nickname='Lobo', puntos=5, puntos_acumulados=5, grupo='C', fecha=datetime(2026, 1, 5, 23, 30))
+        Asistencia.objects.create(nickname='Loba', puntos=3, puntos_acumulados=3, grupo='C', fecha=datetime(2026, 1, 6, 0, 10))
+
+        ejecutor = MigrationExecutor(connection)
+        ejecutor.migrate(self.despues)
+        apps = ejecutor.loader.project_state(self.despues).apps
+
+        self.assertEqual(
+            dict(apps.get_model('home', 'Asistencia').objects.values_list('nickname', 'dia')),
+            {'Lobo': date(2026, 1, 5), 'Loba': date(2026, 1, 6)},
+        )
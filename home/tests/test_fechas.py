@@ -0,0 +1,38 @@
+from datetime import date
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from home.fechas import CLAVE_FECHAS, invalidar_fechas, registro_fechas
+from home.models import Fecha
+
+
+@override_settings(FECHAS_CACHE_TIMEOUT=30)
+class RegistroFechasTests(TestCase):
+
+    def setUp(self):
+        invalidar_fechas()
+        Fecha.objects.create(nombre='Día 1', fecha=date(2026, 1, 5), activa=False)
+        Fecha.objects.create(nombre='Día 2', fecha=date(2026, 1, 6), activa=True)
+
+    def guardar_registro(self, compartida):
+        with mock.patch('home.fechas.cache') as cache, \
+                mock.patch('home.fechas.cache_compartida', return_value=compartida):
+            cache.get.return_value = None
+            registro = registro_fechas()
+        return registro, cache.set.call_args
+
+    def test_indices(self):
+        registro = registro_fechas()
+
+        self.assertEqual([fecha.nombre for fecha in registro.activas], ['Día 2'])
+        self.assertEqual(registro.ultima_activa.nombre, 'Día 2')
+        self.assertEqual(registro.por_dia[date(2026, 1, 5)].nombre, 'Día 1')
+
+    def test_con_cache_local_caduca(self):
+        _, guardado = self.guardar_registro(compartida=False)
+        self.assertEqual(guardado, mock.call(CLAVE_FECHAS, mock.ANY, timeout=30))
+
+    def test_con_cache_compartida_no_caduca(self):
+        _, guardado = self.guardar_registro(compartida=True)
+        self.assertEqual(guardado, mock.call(CLAVE_FECHAS, mock.ANY, timeout=None))
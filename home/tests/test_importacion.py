@@ -0,0 +1,105 @@
+from datetime import date, datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+
+from home.cache import clave_jugador
+from home.importacion import importar_asistencias
+from home.models import Asistencia, MovimientoPuntos, TotalPuntos
+
+FILAS = [
+    (2, {'nickname': 'Lobo', 'apodo': '', 'puntos': '5', 'fecha': '2026-01-05T10:00'}),
+    (3, {'nickname': 'Loba', 'apodo': '', 'puntos': '3', 'fecha': '2026-01-05T11:00'}),
+]
+
+
+@override_settings(CLASIFICACION_INSTANTANEA=None)
+class ImportarAsistenciasTests(TestCase):
+
+    def test_dry_run_no_escribe_ni_bloquea(self):
+        select_for_update = QuerySet.select_for_update
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True,
+                               side_effect=select_for_update) as bloqueo:
+            resultado = importar_asistencias(FILAS, dry_run=True)
+
+        self.assertEqual(resultado['creados'], 2)
+        self.assertFalse(Asistencia.objects.exists())
+        bloqueo.assert_not_called()
+
+    def test_invalida_la_cache_de_los_jugadores_tras_el_commit(self):
+        claves = [clave_jugador(nickname, date.today()) for nickname in ('Lobo', 'Loba')]
+        for clave in claves:
+            cache.set(clave, {'antiguo': True})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resultado = importar_asistencias(FILAS)
+            # Antes del commit nadie debe ver la caché vacía y volver a llenarla con datos viejos
+            self.assertIsNotNone(cache.get(claves[0]))
+
+        self.assertEqual(resultado['creados'], 2)
+        self.assertEqual([cache.get(clave) for clave in claves], [None, None])
+
+
+@override_settings(CLASIFICACION_INSTANTANEA=None)
+class AplicarImportacionTests(TestCase):
+
+    def setUp(self):
+        for dia, puntos in ((5, 5), (7, 2)):
+            Asistencia.registrar_o_actualizar({'nickname': 'Lobo', 'puntos': puntos, 'fecha': datetime(2026, 1, dia, 10, 0)})
+
+    def importar(self, *filas):
+        return importar_asistencias([
+            (linea, {'nickname': nickname, 'apodo': '', 'puntos': str(puntos), 'fecha': fecha})
+            for linea, (nickname, puntos, fecha) in enumerate(filas, 2)
+        ])
+
+    def registros(self):
+        return list(Asistencia.objects.filter(nickname='Lobo').order_by('fecha').values_list('dia__day', 'puntos', 'puntos_acumulados'))
+
+    def test_suma_al_registro_de_la_misma_fecha(self):
+        resultado = self.importar(('Lobo', 3, '2026-01-05T10:00'))
+
+        self.assertEqual((resultado['creados'], resultado['actualizados']), (0, 2))
+        self.assertEqual(self.registros(), [(5, 8, 8), (7, 2, 10)])
+
+    def test_recalcula_los_acumulados_de_los_registros_posteriores(self):
+        resultado = self.importar(('Lobo', 4, '2026-01-06T10:00'), ('Lobo', 1, '2026-01-04T10:00'))
+
+        self.assertEqual(resultado['creados'], 2)
+        # El registro anterior a todos los existentes también desplaza sus acumulados
+        self.assertEqual(self.registros(), [(4, 1, 1), (5, 5, 6), (6, 4, 10), (7, 2, 12)])
+
+    def test_anota_los_puntos_en_el_libro(self):
+        self.importar(('Lobo', 4, '2026-01-06T10:00'), ('Lobo', 3, '2026-01-05T10:00'), ('Loba', 6, '2026-01-06T11:00'))
+
+        self.assertEqual(TotalPuntos.objects.get(nickname='Lobo').total, 14)
+        self.assertEqual(TotalPuntos.objects.get(nickname='Loba').total, 6)
+        self.assertEqual(TotalPuntos.verificar(), [])
+
+    def test_sin_claves_devueltas_por_bulk_create(self):
+        # Como en MySQL: bulk_create deja los registros nuevos sin clave primaria
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert',
+                               new_callable=mock.PropertyMock, return_value=False):
+            self.importar(('Lobo', 4, '2026-01-06T10:00'), ('Loba', 6, '2026-01-06T11:00'))
+
+        movimientos = MovimientoPuntos.objects.filter(motivo=MovimientoPuntos.IMPORTACION)
+        self.assertEqual(
+            {(m.nickname, m.asistencia_id) for m in movimientos},
+            {(r.nickname, r.pk) for r in Asistencia.objects.filter(dia=date(2026, 1, 6))},
+        )
+
+    def test_informa_los_errores_de_cada_linea(self):
+        resultado = importar_asistencias([
+            (2, {'nickname': 'Lobo', 'apodo': '', 'puntos': 'muchos', 'fecha': '2026-01-06T10:00'}),
+            (3, {'__error__': 'JSON inválido'}),
+            (4, {'nickname': 'Loba', 'apodo': '', 'puntos': '6', 'fecha': '2026-01-06T11:00'}),
+        ])
+
+        self.assertEqual(resultado['validas'], 1)
+        self.assertEqual([error['linea'] for error in resultado['errores']], [2, 3])
+        self.assertIn('puntos', resultado['errores'][0]['errores'])
+        self.assertEqual(resultado['errores'][1]['errores']['__all__'][0]['message'], 'JSON inválido')
+        self.assertTrue(Asistencia.objects.filter(nickname='Loba').exists())
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from home.models import Asistencia, CierrePuntos, Clasificacion, MovimientoPuntos, TotalPuntos
+from wolves.celery import app as celery_app
+
+
+def registrar(nickname, puntos, fecha):
+    return Asistencia.registrar_o_actualizar({'nickname': nickname, 'puntos': puntos, 'fecha': fecha})
+
+
+class LibroPuntosTests(TestCase):
+
+    def setUp(self):
+        self.registro = registrar('Lobo', 5, datetime(2026, 1, 5, 10, 0))
+        registrar('Lobo', 3, datetime(2026, 1, 6, 10, 0))
+
+    def movimientos(self):
+        return list(MovimientoPuntos.objects.order_by('id').values_list('motivo', 'delta'))
+
+    def test_editar_fuera_de_registrar_anota_la_diferencia(self):
+        self.registro.puntos = 9
+        self.registro.save()
+
+        self.assertEqual(self.movimientos()[-1], (MovimientoPuntos.CORRECCION, 4))
+        self.assertEqual(TotalPuntos.objects.get(nickname='Lobo').total, 12)
+        self.assertEqual(TotalPuntos.verificar(), [])
+
+    def test_guardar_otros_campos_no_anota_nada(self):
+        self.registro.apodo = 'Alfa'
+        self.registro.save(update_fields=['apodo'])
+
+        self.assertEqual(len(self.movimientos()), 2)
+
+    def test_borrar_resta_sus_puntos(self):
+        self.registro.delete()
+
+        self.assertEqual(self.movimientos()[-1], (MovimientoPuntos.ELIMINACION, -5))
+        self.assertEqual(TotalPuntos.objects.get(nickname='Lobo').total, 3)
+        self.assertEqual(TotalPuntos.verificar(), [])
+
+    def test_los_movimientos_no_se_modifican(self):
+        movimiento = MovimientoPuntos.objects.first()
+        movimiento.delta = 100
+        with self.assertRaises(ValueError):
+            movimiento.save()
+
+    def test_compactar_resume_en_el_cierre(self):
+        compactados = CierrePuntos.compactar(datetime.now() + timedelta(seconds=1))
+
+        self.assertEqual(compactados, 2)
+        self.assertFalse(MovimientoPuntos.objects.exists())
+        cierre = CierrePuntos.objects.get(nickname='Lobo')
+        self.assertEqual((cierre.total, cierre.movimientos), (8, 2))
+
+        # Los movimientos posteriores se suman al cierre
+        registrar('Lobo', 2, datetime(2026, 1, 7, 10, 0))
+        self.assertEqual(TotalPuntos.objects.get(nickname='Lobo').total, 10)
+        self.assertEqual(TotalPuntos.verificar(), [])
+
+    def test_verificar_detecta_totales_descuadrados(self):
+        TotalPuntos.objects.filter(nickname='Lobo').update(total=1)
+
+        self.assertEqual(TotalPuntos.verificar(), [('Lobo', 1, 8)])
+
+
+@override_settings(CLASIFICACION_DEBOUNCE_SEGUNDOS=0)
+class ClasificacionEnAutocommitTests(TransactionTestCase):
+    """
+    Fuera de una transacción el recálculo se ejecuta en cuanto se guarda el registro: la
+    clasificación debe salir del libro ya actualizado con ese mismo cambio.
+    """
+
+    def setUp(self):
+        eager_anterior = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', eager_anterior)
+
+    def puntos_en_clasificacion(self, nickname):
+        return Clasificacion.objects.values_list('puntos_acumulados', flat=True).get(nickname=nickname)
+
+    def test_editar_un_registro(self):
+        registro = registrar('Lobo', 5, datetime(2026, 1, 5, 10, 0))
+        self.assertEqual(self.puntos_en_clasificacion('Lobo'), 5)
+
+        registro.puntos = 9
+        registro.save()
+        self.assertEqual(self.puntos_en_clasificacion('Lobo'), 9)
+
+    def test_crear_y_borrar_un_registro(self):
+        registrar('Lobo', 5, datetime(2026, 1, 5, 10, 0))
+        registro = Asistencia(nickname='Lobo', puntos=4, puntos_acumulados=9, grupo='C', fecha=datetime(2026, 1, 6, 10, 0))
+        registro.save()
+        self.assertEqual(self.puntos_en_clasificacion('Lobo'), 9)
+
+        registro.delete()
+        self.assertEqual(self.puntos_en_clasificacion('Lobo'), 5)
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from home.logs import ColaHandler, proceso_vivo
+
+
+class BorrarLogsAntiguosTests(SimpleTestCase):
+
+    def setUp(self):
+        temporal = tempfile.TemporaryDirectory()
+        self.addCleanup(temporal.cleanup)
+        self.directorio = temporal.name
+        self.archivo = os.path.join(self.directorio, 'asistencia_debug.log')
+        # Procesos vivos en cada prueba (por pid)
+        self.vivos = set()
+        vivo = mock.patch('home.logs.proceso_vivo', side_effect=lambda pid: pid in self.vivos)
+        vivo.start()
+        self.addCleanup(vivo.stop)
+
+    def crear(self, nombre, tamano, hace_segundos):
+        ruta = os.path.join(self.directorio, nombre)
+        with open(ruta, 'wb') as f:
+            f.write(b'x' * tamano)
+        momento = time.time() - hace_segundos
+        os.utime(ruta, (momento, momento))
+        return ruta
+
+    def restantes(self):
+        return sorted(os.listdir(self.directorio))
+
+    def test_borra_los_de_procesos_sin_escribir_en_retencion_dias(self):
+        self.crear('asistencia_debug.100.log', 10, hace_segundos=8 * 86400)
+        self.crear('asistencia_debug.100.log.1', 10, hace_segundos=8 * 86400)
+        self.crear('asistencia_debug.200.log', 10, hace_segundos=60)
+
+        ColaHandler(self.archivo, retencion_dias=7, max_total_bytes=None)._borrar_antiguos()
+
+        self.assertEqual(self.restantes(), ['asistencia_debug.200.log'])
+
+    def test_tamano_maximo_entre_todos_los_procesos(self):
+        for numero in range(5):
+            # El proceso 0 es el más reciente
+            self.crear(f'asistencia_debug.{numero}.log', 100, hace_segundos=60 * (numero + 1))
+        self.crear('otro.log', 1000, hace_segundos=60 * 10)
+
+        ColaHandler(self.archivo, retencion_dias=7, max_total_bytes=250)._borrar_antiguos()
+
+        self.assertEqual(self.restantes(), ['asistencia_debug.0.log', 'asistencia_debug.1.log', 'otro.log'])
+
+    def test_no_borra_el_archivo_abierto_de_un_proceso_vivo(self):
+        self.vivos = {100}
+        self.crear('asistencia_debug.100.log', 100, hace_segundos=8 * 86400)
+        self.crear('asistencia_debug.100.log.1', 100, hace_segundos=9 * 86400)
+        self.crear('asistencia_debug.200.log', 100, hace_segundos=60)
+
+        ColaHandler(self.archivo, retencion_dias=7, max_total_bytes=150)._borrar_antiguos()
+
+        # El rotado del proceso vivo ya está cerrado y sí se borra
+        self.assertEqual(self.restantes(), ['asistencia_debug.100.log', 'asistencia_debug.200.log'])
+
+    def test_proceso_vivo(self):
+        # proceso_vivo se importó antes de sustituirlo en home.logs
+        self.assertTrue(proceso_vivo(os.getpid()))
+        self.assertFalse(proceso_vivo(0))
@@ -0,0 +1,73 @@
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase
+from PIL import Image
+
+from home.miniaturas import (
+    clave_fallo, formato_original, generar_variante, nombre_variante, tamano_disponible,
+)
+from home.templatetags.miniaturas import miniatura
+
+
+class MiniaturasTests(SimpleTestCase):
+
+    def setUp(self):
+        temporal = tempfile.TemporaryDirectory()
+        self.addCleanup(temporal.cleanup)
+        self.almacenamiento = FileSystemStorage(location=temporal.name, base_url='/media/')
+        self.addCleanup(cache.clear)
+
+    def guardar_imagen(self, nombre, tamano=(300, 200)):
+        with self.almacenamiento.open(nombre, 'wb') as archivo:
+            Image.new('RGBA', tamano, (255, 0, 0, 128)).save(archivo, 'PNG')
+        return nombre
+
+    def archivo(self, nombre):
+        return SimpleNamespace(name=nombre, storage=self.almacenamiento, url=self.almacenamiento.url(nombre))
+
+    def test_nombres_y_tamanos(self):
+        self.assertEqual(nombre_variante('avatars/cb/cb1a.jpg', 128, 'webp'), 'avatars/cb/cb1a.128.webp')
+        self.assertEqual([tamano_disponible(t) for t in (10, 64, 100, 1000)], [64, 64, 128, 256])
+        self.assertEqual((formato_original('a.PNG'), formato_original('a.jpeg')), ('png', 'jpg'))
+
+    def test_formatos_de_salida(self):
+        nombre = self.guardar_imagen('foto.png')
+        for formato, formato_pil, modos in (('webp', 'WEBP', ('RGBA',)), ('jpg', 'JPEG', ('RGB',)), ('png', 'PNG', ('RGBA',))):
+            with self.subTest(formato=formato):
+                variante = generar_variante(self.almacenamiento, nombre, 100, formato)
+                self.assertEqual(variante, f'foto.128.{formato}')
+                with Image.open(self.almacenamiento.path(variante)) as imagen:
+                    self.assertEqual(imagen.format, formato_pil)
+                    self.assertIn(imagen.mode, modos)
+
+    def test_recortar_o_conservar_la_proporcion(self):
+        nombre = self.guardar_imagen('banner.png')
+        with Image.open(self.almacenamiento.path(generar_variante(self.almacenamiento, nombre, 128, 'png'))) as imagen:
+            self.assertEqual(imagen.size, (128, 128))
+        # Las variantes de cada modo se guardan con el mismo nombre: usar otro original
+        nombre = self.guardar_imagen('banner2.png')
+        with Image.open(self.almacenamiento.path(generar_variante(self.almacenamiento, nombre, 128, 'png', recortar=False))) as imagen:
+            self.assertEqual(imagen.size, (128, 85))
+
+    def test_la_etiqueta_usa_la_variante_o_el_original(self):
+        nombre = self.guardar_imagen('foto.png')
+        self.assertEqual(miniatura(self.archivo(nombre), 64), '/media/foto.64.webp')
+        self.assertEqual(miniatura(self.archivo(nombre), 64, 'original'), '/media/foto.64.png')
+        self.assertEqual(miniatura(None), '')
+
+        with self.almacenamiento.open('rota.png', 'wb') as archivo:
+            archivo.write(b'no es una imagen')
+        self.assertEqual(miniatura(self.archivo('rota.png'), 64), '/media/rota.png')
+        self.assertEqual(miniatura(self.archivo('falta.png'), 64), '/media/falta.png')
+
+    def test_el_fallo_se_recuerda(self):
+        with mock.patch('home.miniaturas.Image.open', side_effect=Image.DecompressionBombError('enorme')) as abrir:
+            self.assertEqual(miniatura(self.archivo('enorme.png'), 64), '/media/enorme.png')
+            self.assertEqual(miniatura(self.archivo('enorme.png'), 64), '/media/enorme.png')
+
+        self.assertEqual(abrir.call_count, 1)
+        self.assertTrue(cache.get(clave_fallo('enorme.64.webp')))
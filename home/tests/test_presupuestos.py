@@ -0,0 +1,23 @@
+from django.test import TestCase
+
+from home.tests.presupuesto_consultas import PresupuestoConsultasMixin
+
+
+class PresupuestoConsultasHomeTests(PresupuestoConsultasMixin, TestCase):
+    app = 'home'
+    presupuestos = {
+        'index': 3,
+        # Con la caché vacía se cuenta también la carga de la tabla de posiciones en memoria
+        'puntos_generales': 5,
+        'registrar_asistencia': 3,
+        # Una consulta para los datos del jugador más la carga de la tabla de posiciones
+        'verificar_nickname': 4,
+        'editar_fecha': 3,
+    }
+    parametros = {
+        'verificar_nickname': {'nickname': 'Lobo00001'},
+    }
+    omitidas = {
+        'puntos_torneo': "falta la plantilla puntos_torneo.html",
+        'admin_fechas': "admin_fechas.html usa la URL 'eliminar_fecha', que no existe",
+    }
@@ -0,0 +1,28 @@
+from datetime import date, datetime
+
+from django.test import TestCase, override_settings
+
+from home.models import Asistencia, Clasificacion, Fecha
+from home.views import calcular_puntos_generales
+
+
+@override_settings(CLASIFICACION_INSTANTANEA=None)
+class OrdenPuntosGeneralesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fecha = Fecha.objects.create(nombre='Día 1', fecha=date(2026, 1, 5), activa=True)
+        # Lobo y Zorro empatan a puntos: va antes el que se registró primero
+        for nickname, puntos, hora in [('Lobo', 5, 10), ('Loba', 8, 11), ('Zorro', 5, 9)]:
+            Asistencia.registrar_o_actualizar({'nickname': nickname, 'puntos': puntos, 'fecha': datetime(2026, 1, 5, hora)})
+        Clasificacion.reconstruir()
+
+    def nicknames(self, fecha_id=None, fecha=None):
+        datos = calcular_puntos_generales(fecha_id, fecha)
+        return [a.nickname for grupo in datos['grupos_ordenados'] for a in datos['asistencias_por_grupo'][grupo]]
+
+    def test_por_puntos_y_hora_de_registro(self):
+        esperado = ['Loba', 'Zorro', 'Lobo']
+        self.assertEqual(self.nicknames(), esperado)
+        self.assertEqual(self.nicknames(fecha_id=str(self.fecha.pk)), esperado)
+        self.assertEqual(self.nicknames(fecha='2026-01-05'), esperado)
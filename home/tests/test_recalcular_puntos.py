@@ -0,0 +1,41 @@
+from datetime import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from home.models import Asistencia
+
+
+class RecalcularPuntosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for nickname in ('Loba', 'Lobo', 'Zorro'):
+            for dia in (5, 6, 7):
+                Asistencia.registrar_o_actualizar({'nickname': nickname, 'puntos': dia, 'fecha': datetime(2026, 1, dia, 10, 0)})
+        Asistencia.objects.filter(nickname='Lobo').update(puntos_acumulados=0)
+        Asistencia.objects.filter(nickname='Zorro', dia__day=7).update(puntos_acumulados=99)
+
+    def ejecutar(self, *argumentos):
+        salida = StringIO()
+        call_command('recalcular_puntos', *argumentos, stdout=salida)
+        return salida.getvalue()
+
+    def acumulados(self, nickname):
+        return list(Asistencia.objects.filter(nickname=nickname).order_by('fecha', 'id').values_list('puntos_acumulados', flat=True))
+
+    def test_check_no_escribe(self):
+        salida = self.ejecutar('--check', '--lote', '2')
+
+        self.assertIn('9 registros de 3 jugadores, 4 con puntos acumulados incorrectos', salida)
+        self.assertEqual(self.acumulados('Lobo'), [0, 0, 0])
+
+    def test_corrige_por_lotes_sin_saltarse_filas(self):
+        # Lotes de 2 filas: los cortes caen dentro de los jugadores
+        salida = self.ejecutar('--lote', '2')
+
+        self.assertIn('9 registros de 3 jugadores, 4 con puntos acumulados corregidos', salida)
+        self.assertEqual(self.acumulados('Lobo'), [5, 11, 18])
+        self.assertEqual(self.acumulados('Zorro'), [5, 11, 18])
+        self.assertIn(' 0 con puntos acumulados incorrectos', self.ejecutar('--check'))
@@ -0,0 +1,83 @@
+from datetime import datetime
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from home.forms import AsistenciaForm
+from home.models import Asistencia, MovimientoPuntos, TotalPuntos
+
+FECHA = datetime(2026, 1, 5, 10, 0)
+
+
+def consultas_de_datos(capturadas):
+    """Consultas capturadas sin contar las de control de transacciones."""
+    return [
+        consulta['sql'] for consulta in capturadas
+        if not consulta['sql'].startswith(('BEGIN', 'COMMIT', 'SAVEPOINT', 'RELEASE SAVEPOINT'))
+    ]
+
+
+@override_settings(CLASIFICACION_INSTANTANEA=None)
+class RegistrarOActualizarTests(TestCase):
+
+    def registrar(self, puntos, fecha=FECHA, **datos):
+        return Asistencia.registrar_o_actualizar({'nickname': 'Lobo', 'puntos': puntos, 'fecha': fecha, **datos})
+
+    def test_mismo_nickname_y_fecha_suma_los_puntos(self):
+        self.registrar(5)
+        registro = self.registrar(3)
+
+        self.assertEqual((registro.puntos, registro.puntos_acumulados), (8, 8))
+        self.assertEqual(
+            list(Asistencia.objects.values_list('puntos', 'puntos_acumulados')), [(8, 8)]
+        )
+        self.assertEqual(TotalPuntos.objects.get(nickname='Lobo').total, 8)
+        self.assertEqual(
+            list(MovimientoPuntos.objects.order_by('id').values_list('delta', flat=True)), [5, 3]
+        )
+
+    def test_registro_nuevo_hereda_apodo_y_acumula(self):
+        self.registrar(5, fecha=datetime(2026, 1, 4, 10, 0), apodo='Alfa')
+        registro = self.registrar(3, apodo='')
+
+        self.assertEqual(registro.apodo, 'Alfa')
+        self.assertEqual(registro.puntos_acumulados, 8)
+        self.assertEqual(Asistencia.objects.count(), 2)
+
+    def test_registro_concurrente_suma_sobre_el_existente(self):
+        # Otro proceso inserta el mismo nickname y fecha entre la lectura y la inserción
+        crear = Asistencia.crear_nuevo_registro
+
+        def crear_tras_insercion_ajena(datos, *args, **kwargs):
+            Asistencia.objects.bulk_create([Asistencia(
+                nickname='Lobo', puntos=4, puntos_acumulados=4, grupo='C', fecha=FECHA, dia=FECHA.date(),
+            )])
+            return crear(datos, *args, **kwargs)
+
+        with mock.patch.object(Asistencia, 'crear_nuevo_registro', side_effect=crear_tras_insercion_ajena):
+            registro = self.registrar(3)
+
+        self.assertEqual((registro.puntos, registro.puntos_acumulados), (7, 7))
+        self.assertEqual(list(Asistencia.objects.values_list('puntos', flat=True)), [7])
+        self.assertEqual(list(MovimientoPuntos.objects.values_list('delta', flat=True)), [3])
+
+    def test_escritura_limitada_al_registro_y_al_libro(self):
+        self.registrar(5)
+        with CaptureQueriesContext(connection) as capturadas:
+            self.registrar(3)
+        # Bloqueo del total (2), lectura del registro, UPDATE, jugador pendiente y libro (2)
+        self.assertEqual(len(consultas_de_datos(capturadas.captured_queries)), 7)
+
+        with CaptureQueriesContext(connection) as capturadas:
+            self.registrar(2, fecha=datetime(2026, 1, 6, 10, 0))
+        self.assertEqual(len(consultas_de_datos(capturadas.captured_queries)), 7)
+
+
+class AsistenciaFormTests(TestCase):
+
+    def test_nickname_y_fecha_repetidos_son_validos(self):
+        Asistencia.registrar_o_actualizar({'nickname': 'Lobo', 'puntos': 5, 'fecha': FECHA})
+        form = AsistenciaForm({'nickname': 'Lobo', 'apodo': '', 'puntos': 3, 'fecha': '2026-01-05T10:00'})
+        self.assertTrue(form.is_valid(), form.errors)
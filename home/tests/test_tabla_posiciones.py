@@ -0,0 +1,136 @@
+import os
+import random
+import tempfile
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from django.core.cache import cache
+
+from home.instantanea import Instantanea, abrir_instantanea, escribir_instantanea
+from home.models import Asistencia, Clasificacion, clave_clasificacion, grupo_para_posicion
+from home.tabla_posiciones import CLAVE_VERSION_TABLA, TablaPosiciones, obtener_tabla, publicar_instantanea, tabla
+
+
+class InstantaneaCompartidaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for hora, (nickname, puntos) in enumerate([('Lobo', 5), ('Loba', 8)]):
+            Asistencia.registrar_o_actualizar({'nickname': nickname, 'puntos': puntos, 'fecha': datetime(2026, 1, 5, 10 + hora)})
+        Clasificacion.reconstruir()
+
+    def setUp(self):
+        temporal = tempfile.TemporaryDirectory()
+        self.addCleanup(temporal.cleanup)
+        self.ruta = os.path.join(temporal.name, 'clasificacion.bin')
+        tabla.version = None
+
+    def test_sin_cache_compartida_no_se_escribe_ni_se_usa(self):
+        # La caché de las pruebas es la memoria local del proceso
+        with override_settings(CLASIFICACION_INSTANTANEA=self.ruta):
+            self.assertIsNone(publicar_instantanea())
+            self.assertIs(obtener_tabla(), tabla)
+        self.assertFalse(os.path.exists(self.ruta))
+
+    def test_con_cache_compartida_se_publica_y_se_lee(self):
+        with override_settings(CLASIFICACION_INSTANTANEA=self.ruta), \
+                mock.patch('home.tabla_posiciones.cache_compartida', return_value=True):
+            self.assertEqual(publicar_instantanea(), 2)
+            instantanea = obtener_tabla()
+
+        self.assertIsInstance(instantanea, Instantanea)
+        self.assertEqual(instantanea.posicion('Loba'), 1)
+
+
+class OtroProcesoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Asistencia.registrar_o_actualizar({'nickname': 'Lobo', 'puntos': 5, 'fecha': datetime(2026, 1, 5, 10)})
+        Clasificacion.reconstruir()
+
+    def setUp(self):
+        tabla.version = None
+        # La tabla de otro worker: solo ve los cambios que se hacen en su proceso
+        self.otra = TablaPosiciones()
+
+    def obtener_en_el_otro_proceso(self):
+        with mock.patch('home.tabla_posiciones.tabla', self.otra):
+            return obtener_tabla()
+
+    def escribir_en_este_proceso(self):
+        # Con LocMemCache el contador de versión del otro proceso no se entera del cambio
+        version = self.otra.version
+        with self.captureOnCommitCallbacks(execute=True):
+            Asistencia.registrar_o_actualizar({'nickname': 'Zorro', 'puntos': 9, 'fecha': datetime(2026, 1, 5, 11)})
+        cache.set(CLAVE_VERSION_TABLA, version, None)
+
+    def test_recarga_al_caducar_con_cache_por_proceso(self):
+        self.assertIsNone(self.obtener_en_el_otro_proceso().posicion('Zorro'))
+        self.escribir_en_este_proceso()
+        self.assertIsNone(self.obtener_en_el_otro_proceso().posicion('Zorro'))
+
+        self.otra.cargada -= 31
+        self.assertEqual(self.obtener_en_el_otro_proceso().posicion('Zorro'), 1)
+
+    def test_con_cache_compartida_solo_manda_la_version(self):
+        self.obtener_en_el_otro_proceso()
+        self.escribir_en_este_proceso()
+        self.otra.cargada -= 31
+        with mock.patch('home.tabla_posiciones.cache_compartida', return_value=True):
+            self.assertIsNone(self.obtener_en_el_otro_proceso().posicion('Zorro'))
+
+
+class ConPrefijoTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = random.Random(7)
+        nombres = [f'Lobo{numero:03d}' for numero in range(150)] + [f'lOBA{numero:03d}' for numero in range(150)]
+        nombres += ['Zorro', 'zorrillo', 'Ñandú', 'ñu']
+        jugadores = [{
+            'nickname': nombre,
+            'puntos_acumulados': rng.randrange(1000),
+            'dia_registro': date(2026, 1, 5),
+            'hora_registro': datetime(2026, 1, 5, 10, 0) + timedelta(seconds=rng.randrange(3600)),
+            'asistencia_id': numero + 1,
+        } for numero, nombre in enumerate(nombres)]
+        cls.ranking = sorted(jugadores, key=clave_clasificacion)
+
+        cls.tabla = TablaPosiciones()
+        cls.tabla.cargar(jugadores, version=1)
+
+        cls.temporal = tempfile.TemporaryDirectory()
+        ruta = os.path.join(cls.temporal.name, 'clasificacion.bin')
+        escribir_instantanea(ruta, [
+            dict(jugador, grupo=grupo_para_posicion(posicion)) for posicion, jugador in enumerate(cls.ranking, 1)
+        ], version=1)
+        cls.instantanea = abrir_instantanea(ruta)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temporal.cleanup()
+        super().tearDownClass()
+
+    def esperado(self, prefijo, limite):
+        return [
+            jugador['nickname'] for jugador in self.ranking
+            if jugador['nickname'].casefold().startswith(prefijo.casefold())
+        ][:limite]
+
+    def test_sin_distinguir_mayusculas(self):
+        # 'lo' y 'LOB' tienen muchos candidatos (se recorre el ranking); el resto, pocos
+        for prefijo in ('lo', 'LOB', 'loba1', 'Lobo14', 'zorr', 'ZORRO', 'ñ', 'Ña', 'x'):
+            for limite in (1, 10, 400):
+                esperado = self.esperado(prefijo, limite)
+                with self.subTest(prefijo=prefijo, limite=limite):
+                    self.assertEqual([fila['nickname'] for fila in self.tabla.con_prefijo(prefijo, limite)], esperado)
+                    self.assertEqual([fila['nickname'] for fila in self.instantanea.con_prefijo(prefijo, limite)], esperado)
+
+    def test_posicion_exacta_sigue_distinguiendo_mayusculas(self):
+        self.assertEqual(self.instantanea.posicion('Zorro'), self.tabla.posicion('Zorro'))
+        self.assertIsNone(self.instantanea.posicion('zorro'))
+        self.assertEqual(self.tabla.con_prefijo(''), [])
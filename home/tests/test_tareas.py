@@ -0,0 +1,45 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from home.models import ClasificacionPendiente
+from home.tasks import CLAVE_PROGRAMADA, programar_recalculo, recalcular_clasificacion
+from wolves.celery import app as celery_app
+
+
+@override_settings(CLASIFICACION_INSTANTANEA=None, CLASIFICACION_DEBOUNCE_SEGUNDOS=5)
+class ProgramarRecalculoTests(TestCase):
+
+    def setUp(self):
+        cache.delete(CLAVE_PROGRAMADA)
+
+    def programar(self, *nicknames):
+        with mock.patch.object(recalcular_clasificacion, 'apply_async') as encolar:
+            with self.captureOnCommitCallbacks(execute=True):
+                for nickname in nicknames:
+                    programar_recalculo(nickname)
+        return encolar
+
+    def test_sin_cache_compartida_se_programa_en_cada_cambio(self):
+        # La caché de las pruebas es la memoria local del proceso
+        encolar = self.programar('Lobo', 'Loba')
+        self.assertEqual(encolar.call_count, 2)
+        self.assertEqual(ClasificacionPendiente.objects.count(), 2)
+
+    def test_con_cache_compartida_se_agrupan_los_cambios(self):
+        with mock.patch('home.tasks.cache_compartida', return_value=True):
+            encolar = self.programar('Lobo', 'Loba')
+        encolar.assert_called_once_with(countdown=5)
+
+    def test_sin_broker_no_se_escribe_la_instantanea(self):
+        ClasificacionPendiente.objects.create(nickname='Lobo')
+        eager_anterior = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+        try:
+            with mock.patch('home.tasks.publicar_instantanea') as publicar, \
+                    self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(recalcular_clasificacion(), 1)
+        finally:
+            celery_app.conf.task_always_eager = eager_anterior
+        publicar.assert_not_called()
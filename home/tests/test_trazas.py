@@ -0,0 +1,101 @@
+import logging
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from home.models import Fecha
+from home.trazas import Span, resumen_por_span, server_timing, span, span_actual, trazar, trazas_recientes
+from users.models import CreateUser
+
+
+class SpansTests(TestCase):
+
+    def test_sin_traza_ni_log_debug_no_hace_nada(self):
+        registro = logging.getLogger('asistencia_debug')
+        self.addCleanup(registro.setLevel, registro.level)
+        registro.setLevel(logging.INFO)
+        with span('suelto') as actual:
+            self.assertIsNone(actual)
+
+    def test_anidados_y_consultas(self):
+        with self.assertLogs('asistencia_debug', 'DEBUG') as registros:
+            with span('raiz') as raiz:
+                Fecha.objects.count()
+                with span('hijo', nickname='Lobo') as hijo:
+                    self.assertIs(span_actual(), hijo)
+                    Fecha.objects.count()
+                    Fecha.objects.exists()
+                self.assertIs(span_actual(), raiz)
+
+        self.assertIsNone(span_actual())
+        self.assertEqual([s.nombre for s in raiz.hijos], ['hijo'])
+        # Los números del padre incluyen los de sus hijos
+        self.assertEqual((hijo.consultas, raiz.consultas), (2, 3))
+        self.assertGreaterEqual(raiz.duracion, hijo.duracion)
+        self.assertIn('DEBUG:asistencia_debug:[INICIO] hijo - nickname: Lobo', registros.output)
+
+    def test_el_error_queda_en_el_span(self):
+        with self.assertLogs('asistencia_debug', 'DEBUG'):
+            with self.assertRaises(ValueError):
+                with span('raiz') as raiz:
+                    with span('falla'):
+                        raise ValueError('mal')
+
+        self.assertEqual((raiz.error, raiz.hijos[0].error), ('ValueError', 'ValueError'))
+        self.assertIsNotNone(raiz.hijos[0].duracion)
+
+    def test_decorador(self):
+        @trazar()
+        def contar():
+            return span_actual().nombre
+
+        with self.assertLogs('asistencia_debug', 'DEBUG'):
+            with span('raiz'):
+                self.assertTrue(contar().endswith('contar'))
+
+    def test_server_timing_y_resumen(self):
+        raiz = Span('GET /')
+        Span('consulta lenta', padre=raiz).cerrar()
+        raiz.cerrar()
+
+        cabecera = server_timing(raiz)
+        self.assertTrue(cabecera.startswith('db;dur=0.00;desc="0 consultas", 1-GET__;dur='))
+        self.assertIn('2-consulta_lenta;dur=', cabecera)
+        resumen = resumen_por_span([raiz.a_diccionario(), raiz.a_diccionario()])
+        self.assertEqual({fila['nombre']: fila['veces'] for fila in resumen}, {'GET /': 2, 'consulta lenta': 2})
+
+
+class TrazasMiddlewareTests(TestCase):
+
+    def setUp(self):
+        trazas_recientes.clear()
+        self.addCleanup(trazas_recientes.clear)
+
+    def entrar_como_staff(self):
+        staff = CreateUser.objects.create_user(
+            username='staff', password='x', nickname='Staff', pais='', ciudad='', estado_cpl='', modo_de_juego='',
+            is_staff=True,
+        )
+        self.client.force_login(staff)
+
+    def test_server_timing_solo_en_debug_o_para_staff(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('about')))
+        with override_settings(DEBUG=True):
+            self.assertIn('Server-Timing', self.client.get(reverse('about')))
+
+        self.entrar_como_staff()
+        self.assertIn('Server-Timing', self.client.get(reverse('about')))
+
+    def test_guarda_las_trazas_menos_las_de_ver_trazas(self):
+        self.entrar_como_staff()
+        self.client.get(reverse('about'))
+        respuesta = self.client.get(reverse('ver_trazas'))
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([traza['nombre'] for traza in trazas_recientes], ['GET /about/'])
+        self.assertEqual(respuesta.context['trazas'][0]['nombre'], 'GET /about/')
+
+    @override_settings(TRAZAS_ACTIVAS=False)
+    def test_desactivadas(self):
+        self.client.get(reverse('about'))
+        self.assertEqual(len(trazas_recientes), 0)
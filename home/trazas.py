@@ -0,0 +1,246 @@
+"""
+Trazas (spans) para medir qué parte de una petición es lenta.
+
+Cada span mide un bloque de código: tiempo total, número de consultas a la base de
+datos y tiempo dentro de ellas. Los spans se anidan (un span abierto dentro de otro
+queda como hijo) y los números de cada span incluyen los de sus hijos.
+
+Uso:
+    with span('crear_nuevo_registro', nickname=nickname):
+        ...
+
+    @trazar()
+    def reconstruir(cls):
+        ...
+
+TrazasMiddleware abre un span raíz por petición, lo guarda en request.traza, añade la
+cabecera Server-Timing (visible en las herramientas de desarrollo del navegador) y
+conserva las últimas trazas del proceso para la vista ver_trazas.
+
+Los spans también escriben las líneas [INICIO]/[FIN] en el log 'asistencia_debug'.
+Fuera de una petición y con el log por encima de DEBUG, un span no hace nada.
+"""
+import contextvars
+import functools
+import logging
+import re
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.urls import reverse
+
+logger = logging.getLogger('asistencia_debug')
+
+# Span abierto en el hilo/contexto actual
+_span_actual = contextvars.ContextVar('span_actual', default=None)
+
+# Últimas trazas de peticiones de este proceso (más reciente al final)
+trazas_recientes = deque(maxlen=getattr(settings, 'TRAZAS_GUARDADAS', 100))
+
+
+class Span:
+    """Un bloque de código medido, con sus spans hijos."""
+
+    def __init__(self, nombre, datos=None, padre=None):
+        self.nombre = nombre
+        self.datos = datos or {}
+        self.padre = padre
+        self.hijos = []
+        self.inicio = time.perf_counter()
+        self.duracion = None
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.error = None
+        if padre is not None:
+            padre.hijos.append(self)
+
+    def cerrar(self):
+        self.duracion = time.perf_counter() - self.inicio
+
+    def descripcion(self):
+        """Datos del span como texto, ej: "nickname: Lobo, fecha: 2025-07-04"."""
+        return ', '.join(f"{clave}: {valor}" for clave, valor in self.datos.items())
+
+    def a_diccionario(self):
+        """Representación del span y sus hijos (para guardarla y mostrarla en la vista)."""
+        return {
+            'nombre': self.nombre,
+            'datos': self.descripcion(),
+            'ms': round((self.duracion or 0) * 1000, 2),
+            'consultas': self.consultas,
+            'ms_db': round(self.tiempo_db * 1000, 2),
+            'error': self.error,
+            'hijos': [hijo.a_diccionario() for hijo in self.hijos],
+        }
+
+
+def span_actual():
+    """Span abierto en el contexto actual, o None."""
+    return _span_actual.get()
+
+
+def _contar_consulta(execute, sql, params, many, context):
+    """execute_wrapper: suma la consulta y su tiempo al span actual y a todos sus padres."""
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracion = time.perf_counter() - inicio
+        actual = _span_actual.get()
+        while actual is not None:
+            actual.consultas += 1
+            actual.tiempo_db += duracion
+            actual = actual.padre
+
+
+@contextmanager
+def span(nombre, **datos):
+    """
+    Mide el bloque de código como un span hijo del span actual.
+
+    Args:
+        nombre: Nombre del span (ej: el nombre de la función)
+        **datos: Valores que identifican la operación (ej: nickname), se muestran
+                 en la vista de trazas y en el log
+
+    Yields:
+        El Span, o None si no hay traza activa ni log DEBUG
+    """
+    padre = _span_actual.get()
+    if padre is None and not logger.isEnabledFor(logging.DEBUG):
+        yield None
+        return
+
+    actual = Span(nombre, datos, padre)
+    token = _span_actual.set(actual)
+    with ExitStack() as contadores:
+        if padre is None:
+            # Span raíz: contar las consultas de todas las conexiones mientras esté abierto
+            for alias in connections:
+                contadores.enter_context(connections[alias].execute_wrapper(_contar_consulta))
+        logger.debug("[INICIO] %s - %s", nombre, actual.descripcion())
+        try:
+            yield actual
+        except BaseException as e:
+            actual.error = type(e).__name__
+            raise
+        finally:
+            actual.cerrar()
+            _span_actual.reset(token)
+            logger.debug(
+                "[FIN] %s - %s, Duración: %.4f segundos, Consultas: %s (%.4f segundos)",
+                nombre, actual.descripcion(), actual.duracion, actual.consultas, actual.tiempo_db,
+            )
+
+
+def trazar(nombre=None):
+    """
+    Decorador: ejecuta la función dentro de un span.
+
+    Args:
+        nombre: Nombre del span; por defecto el nombre calificado de la función
+    """
+    def decorador(funcion):
+        etiqueta = nombre or funcion.__qualname__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with span(etiqueta):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def server_timing(raiz, maximo=30):
+    """
+    Valor de la cabecera Server-Timing con los spans de una traza.
+
+    Cada span aparece como "<n>-<nombre>;dur=<ms>;desc=<consultas>", en el orden en que
+    se abrieron, más una entrada "db" con el total de la base de datos.
+    """
+    entradas = [f'db;dur={raiz.tiempo_db * 1000:.2f};desc="{raiz.consultas} consultas"']
+    pendientes = [raiz]
+    while pendientes and len(entradas) < maximo:
+        actual = pendientes.pop()
+        token = re.sub(r'[^A-Za-z0-9_.-]', '_', actual.nombre)
+        entradas.append(
+            f'{len(entradas)}-{token};dur={(actual.duracion or 0) * 1000:.2f};desc="{actual.consultas} consultas"'
+        )
+        pendientes.extend(reversed(actual.hijos))
+    return ', '.join(entradas)
+
+
+def resumen_por_span(trazas):
+    """
+    Agrega las trazas por nombre de span.
+
+    Args:
+        trazas: Lista de diccionarios de Span.a_diccionario
+
+    Returns:
+        Lista de diccionarios (nombre, veces, ms_medio, ms_max, consultas_medias, ms_db_medio)
+        ordenada por tiempo total descendente
+    """
+    acumulado = {}
+    pendientes = list(trazas)
+    while pendientes:
+        actual = pendientes.pop()
+        fila = acumulado.setdefault(actual['nombre'], {'veces': 0, 'ms': 0.0, 'ms_max': 0.0, 'consultas': 0, 'ms_db': 0.0})
+        fila['veces'] += 1
+        fila['ms'] += actual['ms']
+        fila['ms_max'] = max(fila['ms_max'], actual['ms'])
+        fila['consultas'] += actual['consultas']
+        fila['ms_db'] += actual['ms_db']
+        pendientes.extend(actual['hijos'])
+
+    resumen = [
+        {
+            'nombre': nombre,
+            'veces': fila['veces'],
+            'ms_total': round(fila['ms'], 2),
+            'ms_medio': round(fila['ms'] / fila['veces'], 2),
+            'ms_max': fila['ms_max'],
+            'consultas_medias': round(fila['consultas'] / fila['veces'], 1),
+            'ms_db_medio': round(fila['ms_db'] / fila['veces'], 2),
+        }
+        for nombre, fila in acumulado.items()
+    ]
+    return sorted(resumen, key=lambda fila: fila['ms_total'], reverse=True)
+
+
+class TrazasMiddleware:
+    """
+    Abre un span raíz por petición (request.traza) y publica su desglose.
+
+    La cabecera Server-Timing solo se envía en DEBUG o a usuarios staff, para no mostrar
+    detalles internos al público.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'TRAZAS_ACTIVAS', True):
+            return self.get_response(request)
+
+        with ExitStack() as pila:
+            raiz = Span(f"{request.method} {request.path}")
+            request.traza = raiz
+            token = _span_actual.set(raiz)
+            pila.callback(_span_actual.reset, token)
+            for alias in connections:
+                pila.enter_context(connections[alias].execute_wrapper(_contar_consulta))
+            try:
+                response = self.get_response(request)
+            finally:
+                raiz.cerrar()
+
+        usuario = getattr(request, 'user', None)
+        if settings.DEBUG or (usuario is not None and usuario.is_staff):
+            response['Server-Timing'] = server_timing(raiz)
+        if request.path != reverse('ver_trazas'):
+            trazas_recientes.append(raiz.a_diccionario())
+        return response
@@ -27,7 +27,14 @@ urlpatterns = [
     path('admin/fechas/crear/', views.crear_fecha, name='crear_fecha'),
     path('admin/fechas/editar/<int:fecha_id>/', views.editar_fecha, name='editar_fecha'),
     
+    # URL para importar asistencias en bloque
+    path('admin/asistencias/importar/', views.importar_asistencias, name='importar_asistencias'),
+    
     # URL para ver logs de depuración
     path('admin/debug-logs/', views.ver_debug_logs, name='ver_debug_logs'),
+    
+    # URL para ver el desglose de tiempos de las últimas peticiones
+    path('admin/trazas/', views.ver_trazas, name='ver_trazas'),
+    
     path('canciones/', views.canciones, name='canciones'),
 ]
\ No newline at end of file
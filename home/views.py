@@ -1,17 +1,33 @@
 from django.shortcuts import render, get_object_or_404
 from users.models import CreateUser
 from home.models import Asistencia, Fecha
-from home.forms import AsistenciaForm, FechaForm
+from home.forms import AsistenciaForm, FechaForm, ImportarAsistenciasForm
+from home.importacion import importar_asistencias as aplicar_importacion, leer_filas
+from home.cache import (
+    clave_fragmento, guardar_fragmentos, obtener_clasificacion, obtener_fragmentos, obtener_jugador,
+)
+from home.fechas import registro_fechas
+from home.tabla_posiciones import obtener_tabla
+from home.trazas import resumen_por_span, span, trazar, trazas_recientes
+from home.logs import archivos_de_log, buscar_entradas, cumple_filtros, lineas_desde, parsear_linea
+from django.conf import settings
 from django.shortcuts import redirect
 from django.db.models import Count, Max
 from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 from django.contrib.auth.decorators import login_required, user_passes_test
 import logging
-from datetime import datetime
+import os
+import re
+from datetime import date, datetime
 
 # Configurar el logger para depuración
 logger = logging.getLogger('asistencia_debug')
 
+# Sugerencias que devuelve verificar_nickname en modo prefijo
+MAX_CANDIDATOS = 10
+
 
 def gerson(request):
     return render(request,'gerson.html')
@@ -20,7 +36,7 @@ def gerson(request):
 def home(request):
 
      # Obtener todos los usuarios activos (puedes ajustar el filtro según necesites)
-    usuarios = CreateUser.objects.filter(is_active=True)
+    usuarios = CreateUser.objects.filter(is_active=True).select_related('perfil')
     
     context = {
         'usuarios': usuarios,
@@ -68,78 +84,168 @@ def actualizar_grupos():
 
 def verificar_nickname(request):
     """
-    Verifica si un nickname existe y retorna la información del usuario
+    Verifica si un nickname existe y retorna la información del usuario.
+
+    Con ?prefijo= retorna en su lugar los jugadores mejor clasificados cuyo nickname
+    empieza por ese texto sin distinguir mayúsculas (sugerencias mientras el staff
+    escribe), leídos de la tabla de posiciones en memoria sin consultar la base de datos.
     """
+    if request.method == "GET" and request.GET.get('prefijo', '').strip():
+        candidatos = obtener_tabla().con_prefijo(request.GET['prefijo'].strip(), MAX_CANDIDATOS)
+        return JsonResponse({'candidatos': [
+            {campo: jugador[campo] for campo in ('nickname', 'puntos_acumulados', 'posicion', 'grupo')}
+            for jugador in candidatos
+        ]})
+
     if request.method == "GET" and 'nickname' in request.GET:
         nickname = request.GET['nickname']
         try:
-            # Buscar el último registro del usuario con ese nickname
-            usuario = Asistencia.objects.filter(nickname=nickname).order_by('-fecha').first()
-            if usuario:
-                # Obtener el total de registros para este nickname
-                total_registros = Asistencia.objects.filter(nickname=nickname).count()
-                
-                # Obtener la fecha actual para verificar si ya hay registro hoy
-                from datetime import date
-                hoy = date.today()
-                registro_hoy = Asistencia.objects.filter(nickname=nickname, fecha=hoy).exists()
-                
-                # Si el usuario existe, retornar sus datos
-                return JsonResponse({
-                    'existe': True,
-                    'apodo': usuario.apodo,
-                    'grupo': usuario.grupo,
-                    'puntos_dia': usuario.puntos,
-                    'puntos_acumulados': usuario.puntos_acumulados,
-                    'total_registros': total_registros,
-                    'registro_hoy': registro_hoy,
-                    'avatar_url': usuario.avatar.url if usuario.avatar else None
-                })
+            # Datos del último registro en caché (se borran cuando el jugador registra asistencia)
+            hoy = date.today()
+            datos = obtener_jugador(nickname, hoy, lambda: datos_de_jugador(nickname, hoy))
+            if datos['existe']:
+                # Posición y grupo desde la tabla de posiciones en memoria (O(log n)), siempre al día
+                tabla = obtener_tabla()
+                return JsonResponse(dict(
+                    datos,
+                    grupo=tabla.grupo(nickname) or datos['grupo'],
+                    posicion=tabla.posicion(nickname),
+                ))
         except Exception as e:
-            print(f"Error verificando nickname: {e}")
+            logger.error("Error verificando nickname %s: %s", nickname, e)
         
     # Si no existe o hay error, retornar que no existe
     return JsonResponse({'existe': False})
 
 
+def datos_de_jugador(nickname, hoy):
+    """
+    Datos del último registro de un jugador para verificar_nickname (una sola consulta).
+
+    Returns:
+        Diccionario con 'existe' y, si existe, los datos de su último registro
+    """
+    usuario = Asistencia.objects.resumen_jugador(nickname, hoy)
+    if usuario is None:
+        return {'existe': False}
+    return {
+        'existe': True,
+        'apodo': usuario.apodo,
+        'grupo': usuario.grupo,
+        'puntos_dia': usuario.puntos,
+        'puntos_acumulados': usuario.puntos_acumulados,
+        'total_registros': usuario.total_registros,
+        'registro_hoy': usuario.registros_dia > 0,
+        'avatar_url': usuario.avatar.url if usuario.avatar else None
+    }
+
+
 def puntos_generales(request):
-    # Actualizar grupos antes de mostrar la página
-    actualizar_grupos()
-    
-    # Obtener todas las fechas para el selector
-    todas_fechas = Fecha.objects.filter(activa=True).order_by('-fecha')
-    
     # Obtener parámetros de fecha del request
     fecha_id = request.GET.get('fecha_id')
     fecha_personalizada = request.GET.get('fecha')
+    
+    # La clasificación se sirve desde caché; solo se recalcula tras un cambio de asistencias o fechas
+    if fecha_id:
+        clave = f"fecha_id:{fecha_id}" if fecha_id.isdigit() else "fecha_id:invalida"
+    elif fecha_personalizada:
+        clave = f"fecha:{fecha_personalizada}" if re.fullmatch(r'\d{4}-\d{2}-\d{2}', fecha_personalizada) else "fecha:invalida"
+    else:
+        clave = "ultima"
+    # La caché guarda solo las fechas y las claves de las tablas de cada grupo, ya renderizadas
+    clasificacion = obtener_clasificacion(
+        clave, lambda: resumir_puntos_generales(clave, calcular_puntos_generales(fecha_id, fecha_personalizada))
+    )
+    
+    tablas = obtener_fragmentos(clasificacion['fragmentos'].values())
+    tablas_grupos = [tablas.get(c) for c in clasificacion['fragmentos'].values()]
+    if None in tablas_grupos:
+        # Alguna tabla salió de la caché antes que la clasificación: renderizarlas de nuevo
+        renderizadas = renderizar_grupos(clave, calcular_puntos_generales(fecha_id, fecha_personalizada))
+        tablas_grupos = [html for _, html in renderizadas.values()]
+    
+    context = dict(
+        clasificacion,
+        tablas_grupos=[mark_safe(html) for html in tablas_grupos],
+        fecha_personalizada=fecha_personalizada,
+    )
+    return render(request, 'puntos_generales.html', context)
+
+
+def renderizar_grupos(vista, datos):
+    """
+    Tabla HTML de cada grupo: desde la caché si su contenido no cambió; si no, se
+    renderiza y se guarda.
+
+    Args:
+        vista: Clave de la vista de clasificación (ver puntos_generales)
+        datos: Resultado de calcular_puntos_generales
+
+    Returns:
+        Diccionario grupo -> (clave del fragmento, HTML), en el orden de los grupos
+    """
+    claves = {}
+    for grupo in datos['grupos_ordenados']:
+        # Todo lo que se ve en la tabla: si nada cambia, la clave (y el HTML) es la misma
+        contenido = [
+            (a.nickname, a.apodo, a.puntos, a.puntos_acumulados, a.grupo, a.avatar.name if a.avatar else '')
+            for a in datos['asistencias_por_grupo'][grupo]
+        ]
+        claves[grupo] = clave_fragmento(vista, grupo, contenido)
+
+    en_cache = obtener_fragmentos(claves.values())
+    nuevas = {}
+    renderizadas = {}
+    for grupo, clave in claves.items():
+        html = en_cache.get(clave)
+        if html is None:
+            html = nuevas[clave] = render_to_string('tabla_grupo.html', {
+                'grupo': grupo, 'asistencias': datos['asistencias_por_grupo'][grupo],
+            })
+        renderizadas[grupo] = (clave, html)
+    guardar_fragmentos(nuevas)
+    logger.debug("Tablas de grupos para %s - Renderizadas: %s, Desde caché: %s", vista, len(nuevas), len(claves) - len(nuevas))
+    return renderizadas
+
+
+def resumir_puntos_generales(vista, datos):
+    """
+    Lo que puntos_generales guarda en caché por versión de la clasificación: las fechas y
+    la clave del fragmento de cada grupo (los registros no, ya están en el HTML).
+    """
+    renderizadas = renderizar_grupos(vista, datos)
+    return {
+        'todas_fechas': datos['todas_fechas'],
+        'fecha_seleccionada': datos['fecha_seleccionada'],
+        'grupos_ordenados': datos['grupos_ordenados'],
+        'fragmentos': {grupo: clave for grupo, (clave, _) in renderizadas.items()},
+    }
+
+
+def calcular_puntos_generales(fecha_id, fecha_personalizada):
+    """
+    Calcula la clasificación que muestra puntos_generales: asistencias ordenadas,
+    agrupadas por grupo (A, B, C) y las fechas disponibles para el selector.
+    """
+    # Los grupos se mantienen al día con cada registro (ver Clasificacion), no hace falta recalcularlos aquí
+    
+    # Obtener todas las fechas para el selector (registro de fechas en caché)
+    fechas = registro_fechas()
+    todas_fechas = fechas.activas
+    
     fecha_seleccionada = None
       
     # Filtrar asistencias según los parámetros recibidos
     if fecha_id:
         # Si se proporciona un ID de fecha específico
         try:
-            fecha_seleccionada = Fecha.objects.get(id=fecha_id)
-            # Obtener asistencias para esa fecha
-            asistencias_lista = list(Asistencia.objects.filter(fecha=fecha_seleccionada.fecha))
-            
-            # Agrupar por puntos acumulados
-            asistencias_por_puntos = {}
-            for asistencia in asistencias_lista:
-                puntos = asistencia.puntos_acumulados
-                if puntos not in asistencias_por_puntos:
-                    asistencias_por_puntos[puntos] = []
-                asistencias_por_puntos[puntos].append(asistencia)
-            
-            # Para cada grupo de puntos, ordenar por hora de registro
-            for puntos, grupo in asistencias_por_puntos.items():
-                grupo.sort(key=lambda x: x.fecha)  # Ordenar por hora de registro ascendente
-            
-            # Crear lista final ordenada
-            asistencias = []
-            for puntos in sorted(asistencias_por_puntos.keys(), reverse=True):
-                asistencias.extend(asistencias_por_puntos[puntos])
+            fecha_seleccionada = fechas.por_id.get(int(fecha_id))
+            if fecha_seleccionada is None:
+                raise Fecha.DoesNotExist
+            # Asistencias de esa fecha, ya ordenadas por puntos acumulados y hora de registro
+            asistencias = list(Asistencia.objects.filter(dia=fecha_seleccionada.fecha).por_puntos())
             
-        except Fecha.DoesNotExist:
+        except (Fecha.DoesNotExist, ValueError):
             asistencias = []
     elif fecha_personalizada:
         # Si se proporciona una fecha personalizada
@@ -149,89 +255,34 @@ def puntos_generales(request):
             fecha_dt = datetime.strptime(fecha_personalizada, '%Y-%m-%d').date()
             
             # Buscar si existe un evento en esta fecha
-            fecha_evento = Fecha.objects.filter(fecha=fecha_dt).first()
+            fecha_evento = fechas.por_dia.get(fecha_dt)
             
             if fecha_evento:
                 fecha_seleccionada = fecha_evento
-                # Obtener asistencias para esa fecha
-                asistencias_lista = list(Asistencia.objects.filter(fecha=fecha_dt))
+                # Asistencias de esa fecha, ya ordenadas por puntos acumulados y hora de registro
+                asistencias = list(Asistencia.objects.filter(dia=fecha_dt).por_puntos())
             else:
                 # Si no hay evento en esa fecha, buscar por la fecha de asistencia
-                asistencias_lista = list(Asistencia.objects.filter(fecha=fecha_dt))
+                asistencias = list(Asistencia.objects.filter(dia=fecha_dt).por_puntos())
                 # Crear un objeto temporal para mostrar la fecha seleccionada en la plantilla
                 from types import SimpleNamespace
                 fecha_seleccionada = SimpleNamespace(nombre=f"Asistencias del día", fecha=fecha_dt)
             
-            # Agrupar por puntos acumulados
-            asistencias_por_puntos = {}
-            for asistencia in asistencias_lista:
-                puntos = asistencia.puntos_acumulados
-                if puntos not in asistencias_por_puntos:
-                    asistencias_por_puntos[puntos] = []
-                asistencias_por_puntos[puntos].append(asistencia)
-            
-            # Para cada grupo de puntos, ordenar por hora de registro
-            for puntos, grupo in asistencias_por_puntos.items():
-                grupo.sort(key=lambda x: x.fecha)  # Ordenar por hora de registro ascendente
-            
-            # Crear lista final ordenada
-            asistencias = []
-            for puntos in sorted(asistencias_por_puntos.keys(), reverse=True):
-                asistencias.extend(asistencias_por_puntos[puntos])
-            
         except (ValueError, TypeError):
             # Error al convertir la fecha
             asistencias = []
     else:
-        # Si no hay filtro de fecha, mostrar el último registro de cada jugador
-        nicknames = Asistencia.objects.values_list('nickname', flat=True).distinct()
-        
-        # Obtener la fecha del evento más reciente
-        ultima_fecha_evento = Fecha.objects.filter(activa=True).order_by('-fecha').first()
-        
-        if ultima_fecha_evento:
-            # Obtener los registros de la última fecha activa
-            asistencias_ultima_fecha = list(Asistencia.objects.filter(
-                fecha=ultima_fecha_evento.fecha
-            ).order_by('fecha'))  # Orden ascendente por hora de registro
-            
-            # Crear un diccionario para mapear nicknames a su hora de registro en la última fecha
-            hora_registro_por_nickname = {a.nickname: a.fecha for a in asistencias_ultima_fecha}
-            
-            # Obtener el último registro de cada jugador
-            asistencias = []
-            for nickname in nicknames:
-                ultimo_registro = Asistencia.objects.filter(nickname=nickname).order_by('-fecha').first()
-                if ultimo_registro:
-                    asistencias.append(ultimo_registro)
-            
-            # Agrupar jugadores por puntos acumulados
-            jugadores_por_puntos = {}
-            for asistencia in asistencias:
-                puntos = asistencia.puntos_acumulados
-                if puntos not in jugadores_por_puntos:
-                    jugadores_por_puntos[puntos] = []
-                jugadores_por_puntos[puntos].append(asistencia)
-            
-            # Para cada grupo de jugadores con mismos puntos, ordenarlos por hora de registro
-            from datetime import datetime
-            for puntos, grupo_asistencias in jugadores_por_puntos.items():
-                grupo_asistencias.sort(key=lambda x: hora_registro_por_nickname.get(x.nickname, datetime.max))
-            
-            # Crear la lista final ordenada: primero por puntos (descendente) y luego por hora de registro
-            asistencias = []
-            for puntos in sorted(jugadores_por_puntos.keys(), reverse=True):
-                asistencias.extend(jugadores_por_puntos[puntos])
-        else:
-            # Si no hay fechas activas, ordenar solo por puntos
-            asistencias = []
-            for nickname in nicknames:
-                ultimo_registro = Asistencia.objects.filter(nickname=nickname).order_by('-fecha').first()
-                if ultimo_registro:
-                    asistencias.append(ultimo_registro)
-            
-            # Ordenar por puntos acumulados y puntos del día
-            asistencias.sort(key=lambda x: (-x.puntos_acumulados, -x.puntos))
+        # Si no hay filtro de fecha, mostrar el último registro de cada jugador en el
+        # orden de la tabla de posiciones en memoria (una sola consulta por clave primaria)
+        jugadores = obtener_tabla().todos()
+        registros = Asistencia.objects.in_bulk([j['asistencia_id'] for j in jugadores if j['asistencia_id']])
+        asistencias = []
+        for jugador in jugadores:
+            asistencia = registros.get(jugador['asistencia_id'])
+            if asistencia is not None:
+                asistencia.posicion = jugador['posicion']
+                asistencia.grupo = jugador['grupo']
+                asistencias.append(asistencia)
     
     # Agrupar asistencias por grupo
     asistencias_por_grupo = {}
@@ -244,34 +295,32 @@ def puntos_generales(request):
     # Ordenar los grupos alfabéticamente (A, B, C)
     grupos_ordenados = sorted(asistencias_por_grupo.keys())
     
-    context = {
+    return {
         'asistencias': asistencias,
         'asistencias_por_grupo': asistencias_por_grupo,
         'grupos_ordenados': grupos_ordenados,
         'todas_fechas': todas_fechas,
         'fecha_seleccionada': fecha_seleccionada,
-        'fecha_personalizada': fecha_personalizada,
     }
-    return render(request, 'puntos_generales.html', context)
 
 
 
+@trazar('vista registrar_asistencia')
 def registrar_asistencia(request):
     """
     Vista para registrar una nueva asistencia o actualizar una existente.
     Utiliza los métodos del modelo para la lógica de negocio.
     """
-    inicio = datetime.now()
-    logger.debug(f"[INICIO] Vista registrar_asistencia - Método: {request.method}, Timestamp: {inicio.strftime('%Y-%m-%d %H:%M:%S.%f')}")
-    
-    # Obtener todas las fechas activas para el formulario
-    fechas_activas = Fecha.objects.filter(activa=True).order_by('-fecha')
-    logger.debug(f"Fechas activas encontradas: {fechas_activas.count()}")
+    # Obtener todas las fechas activas para el formulario (registro de fechas en caché)
+    fechas_activas = registro_fechas().activas
+    logger.debug("Fechas activas encontradas: %s", len(fechas_activas))
     
     if request.method == 'POST':
-        logger.debug(f"Procesando formulario POST - Datos: {request.POST}")
+        logger.debug("Procesando formulario POST - Datos: %s", request.POST)
         form = AsistenciaForm(request.POST, request.FILES)
-        if form.is_valid():
+        with span('validar formulario'):
+            valido = form.is_valid()
+        if valido:
             logger.debug("Formulario válido, preparando datos para registro/actualización")
             # Preparar los datos para el registro/actualización
             datos = {
@@ -282,34 +331,22 @@ def registrar_asistencia(request):
                 'avatar': form.cleaned_data['avatar'],
             }
             
-            logger.debug(f"Datos preparados: Nickname: {datos['nickname']}, Puntos: {datos['puntos']}, Fecha: {datos['fecha']}")
+            logger.debug("Datos preparados: Nickname: %s, Puntos: %s, Fecha: %s", datos['nickname'], datos['puntos'], datos['fecha'])
             
             # Usar el método del modelo para registrar o actualizar
             asistencia = Asistencia.registrar_o_actualizar(datos)
             
-            logger.debug(f"Asistencia registrada/actualizada con ID: {asistencia.id}")
-            
-            # Actualizar los grupos de todos los jugadores
-            logger.debug("Iniciando actualización de grupos")
-            jugadores_actualizados = actualizar_grupos()
-            logger.debug(f"Grupos actualizados para {jugadores_actualizados} jugadores")
-            
-            fin = datetime.now()
-            duracion = (fin - inicio).total_seconds()
-            logger.debug(f"[FIN] Vista registrar_asistencia - Redirigiendo a puntos_generales, Duración total: {duracion} segundos")
+            # La clasificación y los grupos del jugador se actualizan de forma incremental al guardar
+            logger.debug("Asistencia registrada/actualizada con ID: %s", asistencia.id)
             
             return redirect('puntos_generales')
         else:
-            logger.error(f"Formulario inválido. Errores: {form.errors}")
+            logger.error("Formulario inválido. Errores: %s", form.errors)
             print(form.errors)  # Imprime los errores para depuración
     else:
         logger.debug("Método GET, mostrando formulario vacío")
         form = AsistenciaForm()
     
-    fin = datetime.now()
-    duracion = (fin - inicio).total_seconds()
-    logger.debug(f"[FIN] Vista registrar_asistencia - Renderizando formulario, Duración total: {duracion} segundos")
-    
     return render(request, 'registrar_asistencia.html', {'form': form, 'fechas_activas': fechas_activas})
 
 def puntos_torneo(request):
@@ -373,52 +410,122 @@ def editar_fecha(request, fecha_id):
     }
     return render(request, 'form_fecha.html', context)
 
+@login_required
+@user_passes_test(es_staff)
+def importar_asistencias(request):
+    """Vista para importar asistencias en bloque desde un archivo CSV o JSONL"""
+    resultado = None
+    if request.method == 'POST':
+        form = ImportarAsistenciasForm(request.POST, request.FILES)
+        if form.is_valid():
+            filas = leer_filas(form.cleaned_data['archivo'])
+            resultado = aplicar_importacion(filas, dry_run=form.cleaned_data['dry_run'])
+            resultado['dry_run'] = form.cleaned_data['dry_run']
+    else:
+        form = ImportarAsistenciasForm()
+    
+    context = {
+        'form': form,
+        'resultado': resultado,
+    }
+    return render(request, 'importar_asistencias.html', context)
+
+# Entradas del log por página en ver_debug_logs
+ENTRADAS_POR_PAGINA = 500
+
+
+def _entero_o_none(valor):
+    return int(valor) if valor and valor.isdigit() else None
+
+
 @login_required
 @user_passes_test(es_staff)
 def ver_debug_logs(request):
-    """Vista para ver los logs de depuración de asistencias"""
+    """
+    Vista para ver los logs de depuración de asistencias.
+
+    Lee el archivo desde el final por bloques (la memoria depende del tamaño de la
+    página, no del archivo). Parámetros GET:
+        archivo: Nombre del archivo de log (hay uno por proceso); por defecto el más reciente
+        nivel, tipo, nickname: Filtros (ver home.logs.cumple_filtros)
+        antes: Posición en bytes donde termina la página (para ver entradas más antiguas)
+        seguir: Posición en bytes; devuelve en JSON las entradas escritas desde ahí
+    """
     try:
-        import os
-        log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
-        log_file = os.path.join(log_dir, 'asistencia_debug.log')
-        
-        # Verificar si el archivo existe
-        if not os.path.exists(log_file):
+        log_file = os.path.join(settings.LOGS_DIR, 'asistencia_debug.log')
+        archivos = archivos_de_log(log_file, rotados=True)
+
+        # Verificar si existe algún archivo (hay uno por proceso)
+        if not archivos:
             return render(request, 'error.html', {'error': 'El archivo de logs no existe'})
-        
-        # Leer las últimas 500 líneas del archivo (para no sobrecargar la página)
-        with open(log_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            log_entries = lines[-500:]  # Últimas 500 líneas
-        
-        # Procesar las entradas para mostrarlas mejor
-        formatted_entries = []
-        for entry in log_entries:
-            parts = entry.strip().split(' - ', 2)
-            if len(parts) >= 3:
-                timestamp = parts[0]
-                level = parts[1]
-                message = parts[2]
-                
-                formatted_entries.append({
-                    'timestamp': timestamp,
-                    'level': level,
-                    'message': message,
-                    'is_start': '[INICIO]' in message,
-                    'is_end': '[FIN]' in message,
-                    'is_error': level == 'ERROR'
-                })
-        
+
+        # Solo se aceptan archivos de la lista (nunca una ruta que venga de la petición)
+        nombres = {os.path.basename(archivo): archivo for archivo in archivos}
+        nombre = request.GET.get('archivo')
+        if nombre not in nombres:
+            nombre = os.path.basename(archivos[0])
+        archivo = nombres[nombre]
+
+        filtros = {
+            'nivel': request.GET.get('nivel') or None,
+            'tipo': request.GET.get('tipo') or None,
+            'texto': request.GET.get('nickname', '').strip() or None,
+        }
+
+        seguir = _entero_o_none(request.GET.get('seguir'))
+        if seguir is not None:
+            # Seguir el log en vivo: entradas nuevas desde la última posición vista
+            lineas, offset = lineas_desde(archivo, seguir)
+            entradas = [
+                entrada for entrada in (parsear_linea(linea, posicion) for posicion, linea in lineas)
+                if entrada is not None and cumple_filtros(entrada, **filtros)
+            ]
+            return JsonResponse({'entradas': entradas, 'offset': offset})
+
+        antes = _entero_o_none(request.GET.get('antes'))
+        # Tamaño antes de leer: lo que se escriba después lo recoge el modo seguir
+        offset_final = os.path.getsize(archivo)
+        entradas, anterior = buscar_entradas(
+            archivo, antes=offset_final if antes is None else antes, limite=ENTRADAS_POR_PAGINA, **filtros
+        )
+
         context = {
-            'log_entries': formatted_entries,
-            'total_entries': len(formatted_entries),
-            'log_file': log_file
+            'log_entries': entradas,
+            'total_entries': len(entradas),
+            'log_file': archivo,
+            'archivos': list(nombres),
+            'archivo_seleccionado': nombre,
+            'niveles': ['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+            'filtros': {'nivel': filtros['nivel'] or '', 'tipo': filtros['tipo'] or '', 'nickname': filtros['texto'] or ''},
+            'pagina_anterior': anterior,
+            'es_ultima_pagina': antes is None,
+            'offset_final': offset_final,
         }
         return render(request, 'debug_logs.html', context)
     except Exception as e:
         return render(request, 'error.html', {'error': f'Error al leer logs: {str(e)}'})
 
 
+@login_required
+@user_passes_test(es_staff)
+def ver_trazas(request):
+    """
+    Vista para ver el desglose de tiempos de las últimas peticiones de este proceso.
+
+    Muestra cada petición con sus spans anidados (tiempo, consultas y tiempo de base de
+    datos) y un resumen por span para ver qué parte es más lenta. Con ?ruta= se filtran
+    las peticiones cuyo nombre contiene el texto (ej: ?ruta=/registrar).
+    """
+    ruta = request.GET.get('ruta', '').strip()
+    trazas = [traza for traza in reversed(trazas_recientes) if ruta in traza['nombre']]
+    context = {
+        'trazas': trazas,
+        'resumen': resumen_por_span(trazas),
+        'ruta': ruta,
+    }
+    return render(request, 'trazas.html', context)
+
+
 def canciones(request):
     from home.models import Cancion
     
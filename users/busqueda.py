@@ -0,0 +1,131 @@
+"""
+Búsqueda de jugadores por trigramas.
+
+Cada nickname, username y nombre se normaliza (sin tildes, en minúsculas, espacios
+simples) y se parte en trigramas: grupos de 3 caracteres seguidos, con un espacio de
+relleno a cada lado para que los nombres cortos y los finales de nombre también tengan
+trigramas. Se guardan en la tabla TrigramaUsuario, indexada por trigrama.
+
+Buscar un texto es buscar sus trigramas en ese índice: el coste depende de cuántos
+usuarios comparten esos trigramas, no del total de usuarios. Los resultados se ordenan
+por relevancia (cuántos trigramas del texto tiene el usuario), y basta con tener una
+parte de ellos (UMBRAL_COINCIDENCIA), así que una letra cambiada no deja fuera al
+jugador. Los textos de menos de 3 caracteres buscan los trigramas que empiezan por ellos.
+
+El índice se mantiene con la señal post_save de CreateUser (ver users.signals); las
+altas masivas con bulk_create deben llamar a indexar_usuarios.
+"""
+import math
+import re
+import unicodedata
+
+from django.db.models import Count, Value
+
+TAMANO_TRIGRAMA = 3
+
+# Fracción mínima de los trigramas del texto que debe tener un usuario para aparecer
+UMBRAL_COINCIDENCIA = 0.5
+
+# Campos de CreateUser que se indexan
+CAMPOS_BUSQUEDA = ('nickname', 'username', 'first_name')
+
+
+def normalizar(texto):
+    """Texto sin tildes ni mayúsculas y con los espacios reducidos a uno."""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_tildes = ''.join(caracter for caracter in descompuesto if not unicodedata.combining(caracter))
+    return re.sub(r'\s+', ' ', sin_tildes.casefold()).strip()
+
+
+def trigramas(texto, rellenar=True):
+    """
+    Trigramas de un texto ya normalizado.
+
+    Args:
+        texto: Texto normalizado (ver normalizar)
+        rellenar: Añadir un espacio a cada lado (para indexar nombres, no para buscar)
+
+    Returns:
+        Conjunto de trigramas
+    """
+    if rellenar:
+        texto = f' {texto} '
+    return {texto[inicio:inicio + TAMANO_TRIGRAMA] for inicio in range(len(texto) - TAMANO_TRIGRAMA + 1)}
+
+
+def trigramas_de_usuario(usuario):
+    """Trigramas de todos los nombres buscables de un usuario."""
+    resultado = set()
+    for campo in CAMPOS_BUSQUEDA:
+        nombre = normalizar(getattr(usuario, campo))
+        if nombre:
+            resultado |= trigramas(nombre)
+    return resultado
+
+
+def reindexar_usuario(usuario):
+    """
+    Actualiza los trigramas de un usuario, escribiendo solo los que cambian.
+
+    Returns:
+        Tupla (trigramas añadidos, trigramas quitados)
+    """
+    from users.models import TrigramaUsuario
+
+    nuevos = trigramas_de_usuario(usuario)
+    actuales = set(usuario.trigramas.values_list('trigrama', flat=True))
+    quitados = actuales - nuevos
+    anadidos = nuevos - actuales
+    if quitados:
+        usuario.trigramas.filter(trigrama__in=quitados).delete()
+    if anadidos:
+        TrigramaUsuario.objects.bulk_create(
+            [TrigramaUsuario(usuario=usuario, trigrama=trigrama) for trigrama in anadidos],
+            ignore_conflicts=True,
+        )
+    return len(anadidos), len(quitados)
+
+
+def indexar_usuarios(usuarios, lote=1000):
+    """
+    Indexa usuarios nuevos (sin trigramas todavía) en bloque.
+
+    Returns:
+        Número de trigramas creados
+    """
+    from users.models import TrigramaUsuario
+
+    filas = [
+        TrigramaUsuario(usuario_id=usuario.pk, trigrama=trigrama)
+        for usuario in usuarios
+        for trigrama in trigramas_de_usuario(usuario)
+    ]
+    TrigramaUsuario.objects.bulk_create(filas, batch_size=lote, ignore_conflicts=True)
+    return len(filas)
+
+
+def buscar_jugadores(jugadores, texto):
+    """
+    Filtra usuarios por un texto de búsqueda y anota su relevancia.
+
+    Args:
+        jugadores: QuerySet de CreateUser (con los demás filtros ya aplicados)
+        texto: Lo que escribió el usuario
+
+    Returns:
+        QuerySet con 'relevancia' (trigramas del texto que tiene cada usuario); sin
+        ordenar, para que la vista decida el desempate. Si el texto queda vacío al
+        normalizarlo no se filtra y la relevancia es 0.
+    """
+    consulta = normalizar(texto)
+    if not consulta:
+        return jugadores.annotate(relevancia=Value(0))
+    if len(consulta) < TAMANO_TRIGRAMA:
+        jugadores = jugadores.filter(trigramas__trigrama__startswith=consulta)
+        minimo = 1
+    else:
+        buscados = trigramas(consulta, rellenar=False)
+        jugadores = jugadores.filter(trigramas__trigrama__in=buscados)
+        minimo = max(1, math.ceil(len(buscados) * UMBRAL_COINCIDENCIA))
+    # El filtro anterior limita el conteo a los trigramas buscados
+    return jugadores.annotate(relevancia=Count('trigramas')).filter(relevancia__gte=minimo)
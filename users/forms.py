@@ -272,6 +272,7 @@ class UserForm(forms.ModelForm):
                     user=user,
                     defaults={
                         'nickname': user.nickname,
+                        'nickname_orden': user.nickname or '',
                         'nivel': 1,
                         'puntos_exp': 0,
                         'puntos_honor': 0,
@@ -0,0 +1,203 @@
+"""
+Índice en memoria de los nicknames y usernames de los usuarios activos.
+
+autocomplete_nicknames busca el texto escrito dentro del nickname o del username
+(sin distinguir mayúsculas). En lugar de un icontains por tecla (recorre toda la tabla),
+cada proceso guarda todos los sufijos de cada nombre en una lista ordenada
+(sortedcontainers.SortedList): los nombres que contienen un texto son los que tienen
+un sufijo que empieza por él, y esos sufijos están seguidos en la lista, así que se
+encuentran con una búsqueda binaria.
+
+El índice se carga la primera vez que se usa y se actualiza en el sitio con las señales
+post_save/post_delete de CreateUser (ver users.signals). Como la tabla de posiciones
+(home.tabla_posiciones), cada cambio incrementa un contador de versión en la caché: con
+una caché compartida, un proceso cuya versión no coincide vuelve a cargar el índice desde
+la base de datos la próxima vez que lo usa. Con una caché por proceso (LocMemCache) el
+contador solo cambia en el proceso que hizo el cambio, así que además cada proceso
+recarga su índice cuando pasan NICKNAMES_INDICE_TIMEOUT segundos. Solo al cargarlo
+consulta la búsqueda la base de datos.
+
+Uso:
+    obtener_indice().buscar('lob')  # [(id, nickname, username), ...] hasta 10
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from sortedcontainers import SortedList
+
+from home.cache import cache_compartida, incrementar_contador, version_contador
+from users.models import CreateUser
+
+logger = logging.getLogger(__name__)
+
+# Contador de versión de los usuarios indexados (uno por cambio confirmado)
+CLAVE_VERSION_NICKNAMES = 'usuarios:nicknames'
+
+# Campos de CreateUser que cambian el índice
+CAMPOS_INDICE = {'nickname', 'username', 'is_active'}
+
+
+def _nombres(nickname, username):
+    """Nombres buscables de un usuario, en minúsculas."""
+    return {nombre.casefold() for nombre in (nickname, username) if nombre}
+
+
+class IndiceNicknames:
+    """
+    Sufijos de los nombres de los usuarios activos, ordenados para buscar por subcadena.
+
+    Guarda una tupla (sufijo, id) por cada sufijo de cada nombre y los datos de cada
+    usuario en un diccionario por id. Todas las operaciones toman un cerrojo: el índice
+    se comparte entre los hilos del proceso.
+    """
+
+    def __init__(self):
+        self.version = None
+        # Momento (time.monotonic) de la última carga desde la base de datos
+        self.cargado = None
+        self._sufijos = SortedList()
+        self._usuarios = {}
+        self._cerrojo = threading.RLock()
+
+    def __len__(self):
+        return len(self._usuarios)
+
+    @staticmethod
+    def _sufijos_de(usuario_id, nombres):
+        return {(nombre[inicio:], usuario_id) for nombre in nombres for inicio in range(len(nombre))}
+
+    def cargar(self, usuarios, version=None):
+        """
+        Reemplaza el contenido del índice.
+
+        Args:
+            usuarios: Iterable de tuplas (id, nickname, username)
+            version: Versión de los usuarios a la que corresponden los datos
+        """
+        datos = {}
+        sufijos = []
+        for usuario_id, nickname, username in usuarios:
+            nombres = _nombres(nickname, username)
+            datos[usuario_id] = (nickname, username, nombres)
+            sufijos.extend(self._sufijos_de(usuario_id, nombres))
+        orden = SortedList(sufijos)
+        with self._cerrojo:
+            self._usuarios = datos
+            self._sufijos = orden
+            self.version = version
+            self.cargado = time.monotonic()
+
+    def caducado(self, segundos):
+        """Indica si el índice se cargó hace más de `segundos` (o nunca)."""
+        return self.cargado is None or time.monotonic() - self.cargado > segundos
+
+    def actualizar(self, usuario_id, nickname, username):
+        """Añade a un usuario o cambia sus nombres."""
+        with self._cerrojo:
+            self.quitar(usuario_id)
+            nombres = _nombres(nickname, username)
+            self._usuarios[usuario_id] = (nickname, username, nombres)
+            self._sufijos.update(self._sufijos_de(usuario_id, nombres))
+
+    def quitar(self, usuario_id):
+        """Quita a un usuario del índice, si está."""
+        with self._cerrojo:
+            anterior = self._usuarios.pop(usuario_id, None)
+            if anterior is not None:
+                for sufijo in self._sufijos_de(usuario_id, anterior[2]):
+                    self._sufijos.remove(sufijo)
+
+    def aplicar_cambio(self, usuario_id, usuario, version):
+        """
+        Aplica el cambio de un usuario recién confirmado en la base de datos.
+
+        Args:
+            usuario_id: Usuario que cambió
+            usuario: Tupla (nickname, username), o None si se borró o ya no está activo
+            version: Versión de los usuarios tras el cambio (None si se desconoce)
+
+        Si el índice no estaba en la versión inmediatamente anterior se ha perdido algún
+        cambio de otro proceso: se marca para recargarlo en lugar de actualizarlo.
+        """
+        with self._cerrojo:
+            if self.version is None or version is None or version != self.version + 1:
+                self.version = None
+                return
+            if usuario is None:
+                self.quitar(usuario_id)
+            else:
+                self.actualizar(usuario_id, *usuario)
+            self.version = version
+
+    def buscar(self, termino, limite=10):
+        """
+        Usuarios cuyo nickname o username contiene `termino` (sin distinguir mayúsculas).
+
+        Args:
+            termino: Texto buscado
+            limite: Máximo de usuarios devueltos
+
+        Returns:
+            Lista de tuplas (id, nickname, username): primero los nombres que empiezan por
+            el término y después los que solo lo contienen, cada grupo en orden alfabético
+        """
+        termino = termino.casefold()
+        if not termino:
+            return []
+        with self._cerrojo:
+            # Prioridad 0 si el sufijo es el nombre completo (empieza por el término), 1 si no
+            prioridades = {}
+            for sufijo, usuario_id in self._sufijos.irange((termino,)):
+                if not sufijo.startswith(termino):
+                    break
+                prioridad = 0 if sufijo in self._usuarios[usuario_id][2] else 1
+                prioridades[usuario_id] = min(prioridad, prioridades.get(usuario_id, 1))
+            encontrados = [(usuario_id, *self._usuarios[usuario_id][:2]) for usuario_id in prioridades]
+
+        encontrados.sort(key=lambda usuario: (
+            prioridades[usuario[0]], (usuario[1] or usuario[2]).casefold(), usuario[0],
+        ))
+        return encontrados[:limite]
+
+
+# Índice del proceso actual
+indice = IndiceNicknames()
+
+
+def obtener_indice():
+    """
+    Devuelve el índice del proceso, cargándolo si aún no se cargó o si otro proceso
+    cambió algún usuario (o, con una caché por proceso, si se cargó hace más de
+    NICKNAMES_INDICE_TIMEOUT segundos).
+
+    La versión se lee antes de cargar los datos: si entre medias se confirma otro cambio,
+    el índice queda con la versión antigua y se vuelve a cargar la próxima vez.
+    """
+    version = version_contador(CLAVE_VERSION_NICKNAMES)
+    caducado = not cache_compartida() and indice.caducado(getattr(settings, 'NICKNAMES_INDICE_TIMEOUT', 30))
+    if indice.version != version or caducado:
+        indice.cargar(
+            CreateUser.objects.filter(is_active=True).values_list('id', 'nickname', 'username'),
+            version,
+        )
+        logger.debug("Índice de nicknames cargado - Usuarios: %s, Versión: %s", len(indice), version)
+    return indice
+
+
+def usuario_cambiado(usuario_id, usuario):
+    """
+    Registra el cambio confirmado de un usuario (llamar tras el commit).
+
+    Args:
+        usuario_id: Usuario que cambió
+        usuario: Tupla (nickname, username), o None si se borró o ya no está activo
+    """
+    indice.aplicar_cambio(usuario_id, usuario, incrementar_contador(CLAVE_VERSION_NICKNAMES))
+
+
+def invalidar_indice():
+    """Marca el índice para recargarlo en todos los procesos (tras cambios masivos sin señales)."""
+    incrementar_contador(CLAVE_VERSION_NICKNAMES)
+    indice.version = None
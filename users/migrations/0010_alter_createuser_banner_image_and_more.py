@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 13:59
+
+import home.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_create_lider'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='createuser',
+            name='banner_image',
+            field=models.ImageField(blank=True, null=True, storage=home.almacenamiento.AlmacenamientoPorContenido(), upload_to='banner_images/'),
+        ),
+        migrations.AlterField(
+            model_name='createuser',
+            name='profile_image',
+            field=models.ImageField(blank=True, null=True, storage=home.almacenamiento.AlmacenamientoPorContenido(), upload_to='profile_images/'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2 on 2026-10-18 14:31
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Copia de users.busqueda al crear esta migración: la migración no debe cambiar si después
+# cambia la forma de indexar (un cambio así se aplica con su propia migración)
+CAMPOS_BUSQUEDA = ('nickname', 'username', 'first_name')
+
+# Usuarios leídos y trigramas escritos por lote
+LOTE = 1000
+
+
+def normalizar(texto):
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_tildes = ''.join(caracter for caracter in descompuesto if not unicodedata.combining(caracter))
+    return re.sub(r'\s+', ' ', sin_tildes.casefold()).strip()
+
+
+def trigramas_de_usuario(usuario):
+    resultado = set()
+    for campo in CAMPOS_BUSQUEDA:
+        nombre = normalizar(getattr(usuario, campo))
+        if nombre:
+            texto = f' {nombre} '
+            resultado |= {texto[inicio:inicio + 3] for inicio in range(len(texto) - 2)}
+    return resultado
+
+
+def indexar_usuarios(apps, schema_editor):
+    """Trigramas de búsqueda de los usuarios que ya existen, por lotes de usuarios."""
+    CreateUser = apps.get_model('users', 'CreateUser')
+    TrigramaUsuario = apps.get_model('users', 'TrigramaUsuario')
+
+    ultimo = 0
+    while True:
+        usuarios = list(CreateUser.objects.filter(pk__gt=ultimo).order_by('pk').only(*CAMPOS_BUSQUEDA)[:LOTE])
+        if not usuarios:
+            return
+        TrigramaUsuario.objects.bulk_create([
+            TrigramaUsuario(usuario_id=usuario.pk, trigrama=trigrama)
+            for usuario in usuarios
+            for trigrama in trigramas_de_usuario(usuario)
+        ], batch_size=LOTE)
+        ultimo = usuarios[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_alter_createuser_banner_image_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrigramaUsuario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigrama', models.CharField(max_length=3)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigramas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trigrama de usuario',
+                'verbose_name_plural': 'Trigramas de usuario',
+                'constraints': [models.UniqueConstraint(fields=('trigrama', 'usuario'), name='trigrama_usuario_unico')],
+            },
+        ),
+        migrations.RunPython(indexar_usuarios, migrations.RunPython.noop),
+    ]
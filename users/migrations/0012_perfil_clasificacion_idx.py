@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_indice_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='perfil',
+            index=models.Index(fields=['-nivel', '-puntos_exp'], name='perfil_clasificacion_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 14:59
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def copiar_nicknames(apps, schema_editor):
+    """Copia el nickname de cada usuario a su perfil, en una sola sentencia UPDATE."""
+    CreateUser = apps.get_model('users', 'CreateUser')
+    Perfil = apps.get_model('users', 'Perfil')
+
+    nickname = CreateUser.objects.filter(pk=OuterRef('user_id')).values('nickname')[:1]
+    Perfil.objects.update(nickname_orden=Coalesce(Subquery(nickname), Value('')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_perfil_clasificacion_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='perfil',
+            name='perfil_clasificacion_idx',
+        ),
+        migrations.AddField(
+            model_name='perfil',
+            name='nickname_orden',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(copiar_nicknames, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='perfil',
+            index=models.Index(fields=['-nivel', '-puntos_exp', 'nickname_orden', 'user'], name='perfil_clasificacion_idx'),
+        ),
+    ]
@@ -1,8 +1,11 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 import math
+from bisect import bisect_right
+
+from home.almacenamiento import almacenamiento_por_contenido
 
 # Definición de rangos del clan
 RANKS = [
@@ -42,6 +45,43 @@ SPECIALTIES = [
 ]
 
 
+def xp_para_nivel(nivel):
+    """XP necesaria para pasar de `nivel` al siguiente (cada nivel requiere un 20% más)."""
+    return int(100 * math.pow(1.2, nivel))
+
+
+def _curva_xp(limite=2 ** 63):
+    """
+    XP acumulada por nivel: el elemento n es la XP necesaria para ir del nivel 0 al n.
+
+    Llega hasta superar `limite` (más XP de la que cabe en la base de datos).
+    """
+    acumulada = [0]
+    while acumulada[-1] <= limite:
+        acumulada.append(acumulada[-1] + xp_para_nivel(len(acumulada) - 1))
+    return acumulada
+
+
+# Curva de experiencia precalculada (ver Perfil.add_exp)
+XP_ACUMULADA = _curva_xp()
+
+
+def _curva_hasta(nivel, xp):
+    """
+    Curva de experiencia que llega al menos al nivel `nivel` y a `xp` XP por encima de él.
+
+    Casi siempre es XP_ACUMULADA; solo para niveles fuera de ella (puestos a mano en el
+    admin, por ejemplo) se calcula una copia más larga, sin cambiar la precalculada.
+    """
+    curva = XP_ACUMULADA
+    if nivel < len(curva) and curva[nivel] + xp < curva[-1]:
+        return curva
+    curva = list(curva)
+    while len(curva) <= nivel or curva[-1] <= curva[nivel] + xp:
+        curva.append(curva[-1] + xp_para_nivel(len(curva) - 1))
+    return curva
+
+
 class Create_Lider(models.Model):
     nombre = models.CharField(max_length=100)
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True)
@@ -89,8 +129,8 @@ class CreateUser(AbstractUser):
     is_subleader = models.BooleanField(default=False)
     
     # Nuevos campos
-    profile_image = models.ImageField(upload_to='profile_images/', blank=True, null=True)
-    banner_image = models.ImageField(upload_to='banner_images/', blank=True, null=True)
+    profile_image = models.ImageField(upload_to='profile_images/', storage=almacenamiento_por_contenido, blank=True, null=True)
+    banner_image = models.ImageField(upload_to='banner_images/', storage=almacenamiento_por_contenido, blank=True, null=True)
     bio = models.TextField(blank=True, null=True, help_text="Cuéntanos sobre ti")
     discord_id = models.CharField(max_length=100, blank=True, null=True)
     twitch_username = models.CharField(max_length=100, blank=True, null=True)
@@ -120,6 +160,7 @@ class CreateUser(AbstractUser):
             Perfil.objects.create(
                 user=self,
                 nickname=self.nickname,
+                nickname_orden=self.nickname or '',
                 nivel=1,
                 puntos_exp=0,
                 puntos_honor=0,
@@ -129,6 +170,9 @@ class CreateUser(AbstractUser):
 class Perfil(models.Model):
     user = models.OneToOneField(CreateUser, on_delete=models.CASCADE, related_name='perfil')
     nickname = models.CharField(max_length=100, null=True)
+    # Copia de user.nickname sin nulos para ordenar el directorio de jugadores con el
+    # índice de Perfil, sin unir con la tabla de usuarios (ver users.signals)
+    nickname_orden = models.CharField(max_length=100, default='', editable=False)
     
     # Sistema de niveles y puntos
     nivel = models.PositiveIntegerField(default=1)
@@ -162,65 +206,104 @@ class Perfil(models.Model):
     class Meta:
         verbose_name = 'Perfil'
         verbose_name_plural = 'Perfiles'
+        indexes = [
+            # Orden completo del directorio de jugadores (users.views.jugadores): la
+            # paginación por cursor empieza a leer aquí en el punto de la página pedida
+            models.Index(fields=['-nivel', '-puntos_exp', 'nickname_orden', 'user'], name='perfil_clasificacion_idx'),
+        ]
 
     def __str__(self):
         return self.nickname if self.nickname else "Perfil sin nickname"
     
     def add_exp(self, amount):
-        """Añadir experiencia y subir de nivel si es necesario"""
+        """
+        Añadir experiencia y subir de nivel si es necesario.
+
+        Los niveles ganados se calculan de una vez con una búsqueda binaria en la curva
+        de experiencia (XP_ACUMULADA), así que una gran cantidad de XP cuesta lo mismo
+        que un solo nivel: una escritura del perfil y, si sube de nivel, un bulk_create
+        con todas las notificaciones.
+        """
         self.puntos_exp += amount
+        campos = ['puntos_exp']
         
         # Verificar si debe subir de nivel
-        while self.puntos_exp >= self.xp_siguiente_nivel:
-            self.nivel_up()
+        if self.puntos_exp >= self.xp_siguiente_nivel:
+            nivel_inicial = self.nivel
             
-        self.save()
-    
-    def nivel_up(self):
-        """Subir de nivel al perfil del usuario"""
-        self.nivel += 1
-        self.puntos_exp -= self.xp_siguiente_nivel
-        
-        # La fórmula hace que cada nivel requiera más XP (curva de dificultad)
-        self.xp_siguiente_nivel = int(100 * math.pow(1.2, self.nivel))
+            # El primer nivel usa la XP guardada en el perfil (puede no seguir la curva)
+            self.puntos_exp -= self.xp_siguiente_nivel
+            self.nivel += 1
+            
+            # Los siguientes siguen la curva: último nivel cuya XP acumulada alcanza
+            curva = _curva_hasta(self.nivel, self.puntos_exp)
+            base = curva[self.nivel]
+            nivel_final = bisect_right(curva, base + self.puntos_exp) - 1
+            self.puntos_exp -= curva[nivel_final] - base
+            self.nivel = nivel_final
+            self.xp_siguiente_nivel = xp_para_nivel(self.nivel)
+            
+            # Notificar al usuario cada nivel alcanzado y cada ascenso de rango, en el
+            # mismo orden en que se irían alcanzando subiendo de uno en uno
+            notificaciones = []
+            for nivel in range(nivel_inicial + 1, self.nivel + 1):
+                notificaciones.append(Notificacion(
+                    user=self.user,
+                    tipo='LEVEL_UP',
+                    mensaje=f'¡Felicidades! Has alcanzado el nivel {nivel}.'
+                ))
+                ascenso = self.check_rank_promotion(nivel)
+                if ascenso is not None:
+                    notificaciones.append(ascenso)
+            campos += ['nivel', 'xp_siguiente_nivel', 'rango', 'fecha_ultimo_ascenso']
+            
+            # Notificaciones y perfil en la misma transacción
+            with transaction.atomic():
+                Notificacion.objects.bulk_create(notificaciones)
+                self.save(update_fields=campos)
+        else:
+            self.save(update_fields=campos)
         
-        # Notificar al usuario y otorgar recompensas por subir de nivel
-        Notificacion.objects.create(
-            user=self.user,
-            tipo='LEVEL_UP',
-            mensaje=f'¡Felicidades! Has alcanzado el nivel {self.nivel}.'
-        )
+    def check_rank_promotion(self, nivel=None):
+        """
+        Verificar si el usuario merece una promoción de rango según su nivel.
+
+        Args:
+            nivel: Nivel con el que comprobarlo (por defecto, el del perfil)
+
+        Returns:
+            La Notificacion de ascenso (sin guardar) si cambió de rango, o None
+        """
+        rango_anterior = self.rango
         
-        # Actualizar rango si corresponde
-        self.check_rank_promotion()
+        if nivel is None:
+            nivel = self.nivel
         
-    def check_rank_promotion(self):
-        print(f"Nivel actual: {self.nivel}, Rango actual: {self.rango}")
-        """Verificar si el usuario merece una promoción de rango"""
         # Lógica de promoción basada en nivel
-        if self.nivel >= 50 and self.rango != 'LEGEND':
+        if nivel >= 50 and self.rango != 'LEGEND':
             self.rango = 'LEGEND'
             self.fecha_ultimo_ascenso = timezone.now()
-        elif self.nivel >= 40 and self.rango != 'MASTER' and self.rango != 'LEGEND':
+        elif nivel >= 40 and self.rango != 'MASTER' and self.rango != 'LEGEND':
             self.rango = 'MASTER'
             self.fecha_ultimo_ascenso = timezone.now()
-        elif self.nivel >= 30 and self.rango not in ['ELITE', 'MASTER', 'LEGEND']:
+        elif nivel >= 30 and self.rango not in ['ELITE', 'MASTER', 'LEGEND']:
             self.rango = 'ELITE'
             self.fecha_ultimo_ascenso = timezone.now()
-        elif self.nivel >= 20 and self.rango not in ['VETERAN', 'ELITE', 'MASTER', 'LEGEND']:
+        elif nivel >= 20 and self.rango not in ['VETERAN', 'ELITE', 'MASTER', 'LEGEND']:
             self.rango = 'VETERAN'
             self.fecha_ultimo_ascenso = timezone.now()
-        elif self.nivel >= 10 and self.rango == 'Recluta':
+        elif nivel >= 10 and self.rango == 'Recluta':
             self.rango = 'Miembro'
             self.fecha_ultimo_ascenso = timezone.now()
             
-        # Notificar si hubo promoción
-        if self.fecha_ultimo_ascenso and self.fecha_ultimo_ascenso.date() == timezone.now().date():
-            Notificacion.objects.create(
-                user=self.user,
-                tipo='RANK_UP',
-                mensaje=f'¡Felicidades! Has sido promovido al rango de {self.get_rango_display()}.'
-            )
+        # Notificar solo si hubo promoción
+        if self.rango == rango_anterior:
+            return None
+        return Notificacion(
+            user=self.user,
+            tipo='RANK_UP',
+            mensaje=f'¡Felicidades! Has sido promovido al rango de {self.get_rango_display()}.'
+        )
             
     def get_progress_percent(self):
         """Obtener el porcentaje de progreso hacia el siguiente nivel"""
@@ -392,8 +475,22 @@ class PerfilJuego(models.Model):
         super().save(*args, **kwargs)
 
 
+class TrigramaUsuario(models.Model):
+    """
+    Índice de búsqueda de jugadores (ver users.busqueda): una fila por cada trigrama
+    (3 caracteres seguidos, sin tildes ni mayúsculas) del nickname, username o nombre
+    de un usuario.
+    """
+    usuario = models.ForeignKey(CreateUser, on_delete=models.CASCADE, related_name='trigramas')
+    trigrama = models.CharField(max_length=3)
 
+    class Meta:
+        verbose_name = 'Trigrama de usuario'
+        verbose_name_plural = 'Trigramas de usuario'
+        constraints = [
+            # Empieza por el trigrama: la búsqueda lee solo el índice
+            models.UniqueConstraint(fields=['trigrama', 'usuario'], name='trigrama_usuario_unico'),
+        ]
 
-
-
-
+    def __str__(self):
+        return f"{self.trigrama!r} ({self.usuario_id})"
@@ -0,0 +1,181 @@
+"""
+Paginación por cursor (keyset) para listados ordenados.
+
+Paginator pagina con OFFSET: para mostrar la página 500 la base de datos lee y descarta
+las 499 anteriores, y además cuenta todas las filas en cada petición. Aquí cada página
+se pide "a partir de" la última fila de la anterior: el filtro sobre las columnas del
+orden deja que la base de datos empiece a leer directamente en el punto correcto de su
+índice, así que una página profunda cuesta lo mismo que la primera y no hace falta
+contar nada.
+
+El cursor viaja en la URL firmado (django.core.signing) con los valores de orden de la
+fila de referencia, la dirección y el número de página que se mostrará. Un cursor
+alterado o de otra versión simplemente lleva a la primera página.
+
+Un campo de orden puede ser nulo (ej: las columnas de una relación que le falta a
+alguna fila): los nulos van siempre al final, en cualquiera de los dos sentidos.
+
+Uso:
+    orden = [('perfil__nivel', True), ('perfil__puntos_exp', True), ('id', False)]
+    pagina = paginar(queryset, orden, request.GET.get('cursor'), tamano=12)
+    pagina.siguiente  # cursor de la página siguiente (o None)
+"""
+from functools import reduce
+from operator import or_
+
+from django.core import signing
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import F, Q
+
+SAL_CURSOR = 'users.paginacion'
+
+
+class PaginaCursor:
+    """
+    Una página de resultados con los cursores de las páginas vecinas.
+
+    Ofrece los mismos nombres que django.core.paginator.Page que usan las plantillas
+    (has_next, has_previous, has_other_pages, number, start_index, end_index) y se
+    puede recorrer con un for.
+    """
+
+    def __init__(self, object_list, numero, tamano, anterior=None, siguiente=None):
+        self.object_list = object_list
+        self.number = numero
+        self.tamano = tamano
+        self.anterior = anterior
+        self.siguiente = siguiente
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.siguiente is not None
+
+    def has_previous(self):
+        return self.anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.tamano + 1
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1 if self.object_list else 0
+
+
+def crear_cursor(direccion, valores, numero):
+    """Cursor firmado para la URL: dirección ('despues' o 'antes'), valores de orden y página."""
+    return signing.dumps({'d': direccion, 'v': valores, 'p': numero}, salt=SAL_CURSOR, compress=True)
+
+
+def leer_cursor(cursor, campos):
+    """
+    Datos de un cursor de la URL.
+
+    Returns:
+        Diccionario con 'd', 'v' y 'p', o None si no hay cursor o no es válido
+    """
+    if not cursor:
+        return None
+    try:
+        datos = signing.loads(cursor, salt=SAL_CURSOR)
+    except signing.BadSignature:
+        return None
+    if datos.get('d') not in ('despues', 'antes') or len(datos.get('v') or ()) != campos:
+        return None
+    return datos
+
+
+def _valor(objeto, campo):
+    """
+    Valor de un campo de orden de una fila, siguiendo relaciones ('perfil__nivel').
+
+    Si falta la relación (un usuario sin perfil) el valor es None, como en la consulta.
+    """
+    for parte in campo.split('__'):
+        try:
+            objeto = getattr(objeto, parte)
+        except ObjectDoesNotExist:
+            return None
+        if objeto is None:
+            return None
+    return objeto
+
+
+def _condicion(orden, valores, hacia_atras):
+    """
+    Filas que van después (o antes, si hacia_atras) de la fila con esos valores de orden.
+
+    Para el orden (a desc, b asc) y la fila (x, y) hacia delante: a < x, o a = x y b > y.
+    Los nulos van al final: hacia delante, después de x también va a nulo; si la fila de
+    referencia tiene a nulo, hacia delante solo quedan sus empates y hacia atrás van
+    todas las filas con a no nulo.
+    """
+    partes = []
+    iguales = Q()
+    for (campo, descendente), valor in zip(orden, valores):
+        if valor is None:
+            if hacia_atras:
+                partes.append(iguales & Q(**{f'{campo}__isnull': False}))
+            iguales &= Q(**{f'{campo}__isnull': True})
+            continue
+        lookup = 'gt' if descendente == hacia_atras else 'lt'
+        siguientes = Q(**{f'{campo}__{lookup}': valor})
+        if not hacia_atras:
+            siguientes |= Q(**{f'{campo}__isnull': True})
+        partes.append(iguales & siguientes)
+        iguales &= Q(**{campo: valor})
+    return reduce(or_, partes)
+
+
+def paginar(queryset, orden, cursor=None, tamano=12):
+    """
+    Página de un QuerySet a partir de un cursor.
+
+    Args:
+        queryset: Filas a paginar (sin ordenar)
+        orden: Lista de (campo, descendente); el último debe ser único y no nulo (ej: 'id')
+        cursor: Cursor de la URL, o None para la primera página
+        tamano: Filas por página
+
+    Returns:
+        PaginaCursor
+    """
+    datos = leer_cursor(cursor, len(orden))
+    hacia_atras = datos is not None and datos['d'] == 'antes'
+    numero = datos['p'] if datos is not None else 1
+
+    if datos is not None:
+        queryset = queryset.filter(_condicion(orden, datos['v'], hacia_atras))
+    # Hacia atrás se lee en orden inverso desde la fila de referencia (con los nulos primero)
+    nulos = {'nulls_first': True} if hacia_atras else {'nulls_last': True}
+    queryset = queryset.order_by(*[
+        F(campo).desc(**nulos) if descendente != hacia_atras else F(campo).asc(**nulos)
+        for campo, descendente in orden
+    ])
+    # Una fila de más indica si hay otra página en esa dirección
+    filas = list(queryset[:tamano + 1])
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+
+    if hacia_atras:
+        filas.reverse()
+        hay_anterior, hay_siguiente = hay_mas, True
+        if not hay_mas:
+            numero = 1
+    else:
+        hay_anterior, hay_siguiente = datos is not None, hay_mas
+
+    def cursor_de(direccion, fila, pagina):
+        return crear_cursor(direccion, [_valor(fila, campo) for campo, _ in orden], pagina)
+
+    anterior = cursor_de('antes', filas[0], numero - 1) if hay_anterior and filas else None
+    siguiente = cursor_de('despues', filas[-1], numero + 1) if hay_siguiente and filas else None
+    return PaginaCursor(filas, numero, tamano, anterior, siguiente)
@@ -0,0 +1,48 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from home.almacenamiento import registrar_referencias
+from users.busqueda import CAMPOS_BUSQUEDA, reindexar_usuario
+from users.indice_nicknames import CAMPOS_INDICE, usuario_cambiado
+from users.models import CreateUser, Perfil
+
+
+@receiver(post_save, sender=CreateUser)
+def indexar_usuario(sender, instance, update_fields=None, **kwargs):
+    """Actualiza el índice de autocompletado con los nombres del usuario guardado"""
+    if update_fields is not None and not CAMPOS_INDICE & set(update_fields):
+        # Guardados parciales que no tocan los nombres (last_login al iniciar sesión...)
+        return
+    usuario_id = instance.pk
+    usuario = (instance.nickname, instance.username) if instance.is_active else None
+    transaction.on_commit(lambda: usuario_cambiado(usuario_id, usuario))
+
+
+@receiver(post_save, sender=CreateUser)
+def indexar_busqueda_usuario(sender, instance, update_fields=None, **kwargs):
+    """Actualiza los trigramas de búsqueda del usuario (ver users.busqueda); se borran en cascada"""
+    if update_fields is not None and not set(CAMPOS_BUSQUEDA) & set(update_fields):
+        return
+    reindexar_usuario(instance)
+
+
+@receiver(post_save, sender=CreateUser)
+def copiar_nickname_al_perfil(sender, instance, created, update_fields=None, **kwargs):
+    """Copia el nickname a Perfil.nickname_orden, la columna por la que se ordena el directorio"""
+    if created or (update_fields is not None and 'nickname' not in update_fields):
+        # El perfil nuevo ya se crea con el nickname (CreateUser.save)
+        return
+    nickname = instance.nickname or ''
+    Perfil.objects.filter(user=instance).exclude(nickname_orden=nickname).update(nickname_orden=nickname)
+
+
+@receiver(post_delete, sender=CreateUser)
+def desindexar_usuario(sender, instance, **kwargs):
+    """Quita del índice de autocompletado al usuario borrado"""
+    usuario_id = instance.pk
+    transaction.on_commit(lambda: usuario_cambiado(usuario_id, None))
+
+
+# Contar referencias a las imágenes de perfil guardadas por contenido
+registrar_referencias(CreateUser, 'profile_image', 'banner_image')
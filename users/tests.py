@@ -1,3 +1,351 @@
-from django.test import TestCase
+import math
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from home.tests.presupuesto_consultas import PresupuestoConsultasMixin
+from users.busqueda import buscar_jugadores, normalizar, trigramas
+from users.indice_nicknames import CLAVE_VERSION_NICKNAMES, IndiceNicknames, obtener_indice
+from users.paginacion import crear_cursor, leer_cursor, paginar
+from users.models import XP_ACUMULADA, CreateUser, Notificacion, Perfil, _curva_hasta, _curva_xp
+
+
+class PresupuestoConsultasUsersTests(PresupuestoConsultasMixin, TestCase):
+    app = 'users'
+    presupuestos = {
+        'perfil_usuario': 5,
+        # Página, estadísticas y número de resultados de la búsqueda (las dos últimas en caché)
+        'jugadores': 5,
+        'eliminar_jugador': 5,
+        # Con la caché vacía se cuenta la carga del índice de nicknames en memoria
+        'autocomplete_nicknames': 3,
+    }
+    parametros = {
+        'autocomplete_nicknames': {'term': 'lobo'},
+        'jugadores': {'search': 'lobo'},
+    }
+    omitidas = {
+        'detalle_jugador': "perfil_usuario no recibe el parámetro username de la ruta",
+        'recuperar_contrasena': "la plantilla usa la URL 'login', que no existe",
+    }
+
+
+class IndiceNicknamesTests(SimpleTestCase):
+
+    def setUp(self):
+        self.indice = IndiceNicknames()
+        self.indice.cargar([
+            (1, 'Lobo', 'u1'),
+            (2, 'Alobo', 'u2'),
+            (3, None, 'lobera'),
+            (4, 'Zlob', 'u4'),
+            (5, 'nada', 'u5'),
+        ], version=5)
+
+    def ids(self, termino, limite=10):
+        return [usuario_id for usuario_id, _, _ in self.indice.buscar(termino, limite)]
+
+    def test_buscar_primero_los_que_empiezan_por_el_termino(self):
+        # Cada grupo en orden alfabético del nickname (o del username si no tiene)
+        self.assertEqual(self.ids('LOB'), [3, 1, 2, 4])
+        self.assertEqual(self.ids('lob', limite=3), [3, 1, 2])
+        self.assertEqual(self.ids(''), [])
+
+    def test_aplicar_cambio_en_la_version_siguiente(self):
+        self.indice.aplicar_cambio(5, ('Lobezno', 'u5'), version=6)
+
+        self.assertEqual(self.indice.version, 6)
+        self.assertEqual(self.ids('lobez'), [5])
+
+        self.indice.aplicar_cambio(1, None, version=7)
+        self.assertEqual(self.ids('lobo'), [2])
+
+    def test_un_cambio_perdido_obliga_a_recargar(self):
+        self.indice.aplicar_cambio(5, ('Lobezno', 'u5'), version=7)
+
+        self.assertIsNone(self.indice.version)
+        self.assertEqual(self.ids('lobez'), [])
+
+        # Sin versión conocida tampoco se aplica nada hasta recargar
+        self.indice.aplicar_cambio(5, ('Lobezno', 'u5'), version=8)
+        self.assertIsNone(self.indice.version)
+
+
+class IndexarUsuarioTests(TestCase):
+
+    def setUp(self):
+        self.usuario = CreateUser.objects.create_user(
+            username='lobo', password='x', nickname='Lobo', pais='', ciudad='', estado_cpl='', modo_de_juego='',
+        )
+
+    def guardar(self, **kwargs):
+        with mock.patch('users.signals.usuario_cambiado') as cambiado, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.usuario.save(**kwargs)
+        return cambiado
+
+    def test_guardado_parcial_sin_nombres_no_toca_el_indice(self):
+        self.guardar(update_fields=['last_login']).assert_not_called()
+
+    def test_cambio_de_nickname(self):
+        self.usuario.nickname = 'Lobezno'
+        cambiado = self.guardar(update_fields=['nickname'])
+        cambiado.assert_called_once_with(self.usuario.pk, ('Lobezno', 'lobo'))
+
+    def test_usuario_desactivado_sale_del_indice(self):
+        self.usuario.is_active = False
+        self.guardar().assert_called_once_with(self.usuario.pk, None)
+
+
+class IndiceOtroProcesoTests(TestCase):
+
+    def setUp(self):
+        # El índice de otro worker: solo ve los cambios que se hacen en su proceso
+        self.otro = IndiceNicknames()
+
+    def buscar_en_el_otro_proceso(self, termino):
+        with mock.patch('users.indice_nicknames.indice', self.otro):
+            return [usuario_id for usuario_id, _, _ in obtener_indice().buscar(termino)]
+
+    def test_recarga_al_caducar_con_cache_por_proceso(self):
+        self.assertEqual(self.buscar_en_el_otro_proceso('Zorro'), [])
+        version = self.otro.version
+        with self.captureOnCommitCallbacks(execute=True):
+            usuario = CreateUser.objects.create_user(
+                username='zorro', password='x', nickname='Zorro', pais='', ciudad='', estado_cpl='', modo_de_juego='',
+            )
+        # Con LocMemCache el contador de versión del otro proceso no se entera del alta
+        cache.set(CLAVE_VERSION_NICKNAMES, version, None)
+        self.assertEqual(self.buscar_en_el_otro_proceso('Zorro'), [])
+
+        self.otro.cargado -= 31
+        self.assertEqual(self.buscar_en_el_otro_proceso('Zorro'), [usuario.pk])
+
+
+class BusquedaJugadoresTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for nickname in ('Lobo', 'Lobezno', 'Ñandú', 'Zorro'):
+            CreateUser.objects.create_user(
+                username=nickname.casefold(), password='x', nickname=nickname,
+                pais='', ciudad='', estado_cpl='', modo_de_juego='',
+            )
+
+    def buscar(self, texto):
+        return dict(buscar_jugadores(CreateUser.objects.all(), texto).values_list('nickname', 'relevancia'))
+
+    def test_normalizar(self):
+        self.assertEqual(normalizar('  Ñandú \t Lobo '), 'nandu lobo')
+        self.assertEqual(normalizar(None), '')
+
+    def test_trigramas(self):
+        self.assertEqual(trigramas('lobo'), {' lo', 'lob', 'obo', 'bo '})
+        self.assertEqual(trigramas('lobo', rellenar=False), {'lob', 'obo'})
+
+    def test_sin_distinguir_tildes(self):
+        self.assertEqual(set(self.buscar('nandu')), {'Ñandú'})
+        self.assertEqual(set(self.buscar('ÑANDÚ')), {'Ñandú'})
+
+    def test_una_letra_cambiada_sigue_encontrando(self):
+        self.assertIn('Zorro', self.buscar('zorra'))
+
+    def test_ordena_por_relevancia(self):
+        # 'lobo' tiene 2 trigramas; Lobezno solo comparte 'lob'
+        resultados = self.buscar('lobo')
+
+        self.assertGreater(resultados['Lobo'], resultados['Lobezno'])
+        self.assertNotIn('Zorro', resultados)
+
+    def test_menos_de_tres_caracteres_busca_por_prefijo_de_trigrama(self):
+        self.assertEqual(set(self.buscar('lo')), {'Lobo', 'Lobezno'})
+        # Un solo carácter encuentra cualquier trigrama que empiece por él
+        self.assertEqual(set(self.buscar('z')), {'Zorro', 'Lobezno'})
+
+    def test_texto_vacio_no_filtra(self):
+        self.assertEqual(self.buscar('   '), {'Lobo': 0, 'Lobezno': 0, 'Ñandú': 0, 'Zorro': 0})
+
+
+class PaginacionCursorTests(TestCase):
+    orden = [
+        ('perfil__nivel', True), ('perfil__puntos_exp', True),
+        ('perfil__nickname_orden', False), ('id', False),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        # Niveles y puntos repetidos: el nickname y el usuario deciden muchos empates
+        for numero in range(11):
+            usuario = CreateUser.objects.create_user(
+                username=f'jugador{numero}', password='x', nickname=f'Lobo{numero % 4}',
+                pais='', ciudad='', estado_cpl='', modo_de_juego='',
+            )
+            Perfil.objects.filter(user=usuario).update(nivel=numero % 3, puntos_exp=numero % 2)
+
+    def setUp(self):
+        self.jugadores = CreateUser.objects.select_related('perfil')
+        self.esperado = self.ordenados()
+
+    def ordenados(self):
+        def clave(usuario):
+            if not hasattr(usuario, 'perfil'):
+                # Sin perfil van al final, por id
+                return (1, 0, 0, '', usuario.pk)
+            perfil = usuario.perfil
+            return (0, -perfil.nivel, -perfil.puntos_exp, perfil.nickname_orden, usuario.pk)
+        return [usuario.pk for usuario in sorted(self.jugadores.all(), key=clave)]
+
+    def pagina(self, cursor=None):
+        return paginar(self.jugadores, self.orden, cursor, tamano=3)
+
+    def recorrer(self):
+        paginas = [self.pagina()]
+        while paginas[-1].has_next():
+            paginas.append(self.pagina(paginas[-1].siguiente))
+        return paginas
+
+    def volver(self, paginas):
+        # Volver desde la última página repite las mismas páginas
+        pagina = paginas[-1]
+        for anterior in reversed(paginas[:-1]):
+            pagina = self.pagina(pagina.anterior)
+            self.assertEqual([usuario.pk for usuario in pagina], [usuario.pk for usuario in anterior])
+            self.assertEqual(pagina.number, anterior.number)
+        self.assertFalse(pagina.has_previous())
+
+    def test_cursor_firmado(self):
+        cursor = crear_cursor('despues', [2, 1, 'Lobo1', 7], 3)
+
+        self.assertEqual(leer_cursor(cursor, 4), {'d': 'despues', 'v': [2, 1, 'Lobo1', 7], 'p': 3})
+        self.assertIsNone(leer_cursor(cursor, 3))
+        self.assertIsNone(leer_cursor(cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B'), 4))
+        self.assertIsNone(leer_cursor('', 4))
+
+    def test_recorrer_hacia_delante_y_hacia_atras(self):
+        paginas = self.recorrer()
+
+        self.assertEqual([usuario.pk for pagina in paginas for usuario in pagina], self.esperado)
+        self.assertEqual([pagina.number for pagina in paginas], [1, 2, 3, 4])
+        self.assertEqual((paginas[-1].start_index(), paginas[-1].end_index()), (10, 11))
+        self.assertFalse(paginas[0].has_previous())
+        self.volver(paginas)
+
+    def test_usuarios_sin_perfil_van_al_final(self):
+        # Tres sin perfil: uno cierra una página y los otros dos quedan en la siguiente
+        sin_perfil = list(CreateUser.objects.order_by('-pk').values_list('pk', flat=True)[:3])
+        Perfil.objects.filter(user_id__in=sin_perfil).delete()
+        esperado = self.ordenados()
+        self.assertEqual(esperado[-3:], sorted(sin_perfil))
+
+        paginas = self.recorrer()
+
+        self.assertEqual([usuario.pk for pagina in paginas for usuario in pagina], esperado)
+        self.volver(paginas)
+
+    def test_el_directorio_muestra_a_los_usuarios_sin_perfil(self):
+        usuario = CreateUser.objects.get(username='jugador0')
+        Perfil.objects.filter(user=usuario).delete()
+
+        cache.clear()
+        respuesta = self.client.get(reverse('jugadores'))
+
+        self.assertEqual(respuesta.context['resultados'], 11)
+        self.assertIn(usuario.pk, [jugador.pk for jugador in respuesta.context['jugadores']])
+
+    def test_cursor_alterado_lleva_a_la_primera_pagina(self):
+        siguiente = self.pagina().siguiente
+        pagina = self.pagina(siguiente[:-2] + 'xx')
+
+        self.assertEqual(pagina.number, 1)
+        self.assertEqual([usuario.pk for usuario in pagina], self.esperado[:3])
+
+    def test_cambiar_el_nickname_actualiza_el_orden(self):
+        usuario = CreateUser.objects.get(username='jugador0')
+        usuario.nickname = 'Zorro'
+        usuario.save(update_fields=['nickname'])
+
+        self.assertEqual(Perfil.objects.get(user=usuario).nickname_orden, 'Zorro')
+
+
+def add_exp_anterior(perfil, amount):
+    """
+    El bucle original de Perfil.add_exp, un nivel cada vez.
+
+    Returns:
+        Tupla (nivel, puntos_exp, xp_siguiente_nivel, rango, niveles ganados, ascensos)
+    """
+    nivel, exp, siguiente = perfil.nivel, perfil.puntos_exp + amount, perfil.xp_siguiente_nivel
+    rangos = Perfil(user=perfil.user, rango=perfil.rango)
+    niveles = ascensos = 0
+    while exp >= siguiente:
+        nivel += 1
+        exp -= siguiente
+        siguiente = int(100 * math.pow(1.2, nivel))
+        niveles += 1
+        # El original creaba un RANK_UP en cada nivel del día del ascenso; se cuentan los cambios
+        ascensos += rangos.check_rank_promotion(nivel) is not None
+    return nivel, exp, siguiente, rangos.rango, niveles, ascensos
+
+
+class AddExpTests(TestCase):
+
+    def setUp(self):
+        usuario = CreateUser.objects.create_user(
+            username='lobo', password='x', nickname='Lobo', pais='', ciudad='', estado_cpl='', modo_de_juego='',
+        )
+        self.perfil = usuario.perfil
+
+    def aplicar(self, amount, **perfil):
+        Perfil.objects.filter(pk=self.perfil.pk).update(**perfil)
+        Notificacion.objects.all().delete()
+        self.perfil.refresh_from_db()
+        esperado = add_exp_anterior(self.perfil, amount)
+
+        self.perfil.add_exp(amount)
+        self.perfil.refresh_from_db()
+        tipos = list(Notificacion.objects.order_by('id').values_list('tipo', flat=True))
+        return esperado, (
+            self.perfil.nivel, self.perfil.puntos_exp, self.perfil.xp_siguiente_nivel, self.perfil.rango,
+            tipos.count('LEVEL_UP'), tipos.count('RANK_UP'),
+        )
+
+    def test_igual_que_el_bucle_original(self):
+        casos = [
+            (amount, {'nivel': 1, 'puntos_exp': 0, 'xp_siguiente_nivel': 100, 'rango': 'Recluta'})
+            for amount in (0, 99, 100, 101, 5000, 10 ** 6, 10 ** 9)
+        ] + [
+            # XP guardada que no sigue la curva, y un rango que no corresponde a su nivel
+            (700, {'nivel': 3, 'puntos_exp': 40, 'xp_siguiente_nivel': 50, 'rango': 'Recluta'}),
+            (10 ** 7, {'nivel': 35, 'puntos_exp': 0, 'xp_siguiente_nivel': 59000, 'rango': 'Recluta'}),
+        ]
+        for amount, perfil in casos:
+            with self.subTest(amount=amount, **perfil):
+                esperado, obtenido = self.aplicar(amount, **perfil)
+                self.assertEqual(obtenido, esperado)
+
+    def test_gran_cantidad_de_xp_notifica_cada_nivel_y_cada_ascenso(self):
+        esperado, obtenido = self.aplicar(10 ** 7, nivel=1, puntos_exp=0, xp_siguiente_nivel=100, rango='Recluta')
+
+        self.assertEqual(obtenido[0], 54)
+        self.assertEqual(obtenido[3:], ('LEGEND', 53, 5))
+        self.assertEqual(obtenido, esperado)
+        # Cada ascenso justo después del nivel que lo provoca
+        tipos = list(Notificacion.objects.order_by('id').values_list('tipo', flat=True))
+        self.assertEqual([numero for numero, tipo in enumerate(tipos) if tipo == 'RANK_UP'], [9, 20, 31, 42, 53])
+
+    def test_nivel_fuera_de_la_curva_precalculada(self):
+        nivel = len(XP_ACUMULADA) + 3
+        curva = _curva_hasta(nivel, 10)
+
+        self.assertEqual(curva, _curva_xp(limite=curva[nivel] + 10))
+        self.assertGreater(curva[-1], curva[nivel] + 10)
+        self.assertEqual(len(XP_ACUMULADA), len(_curva_xp()))
+
+        # Esos valores no caben en la base de datos: solo se comprueba el cálculo
+        self.perfil.nivel, self.perfil.puntos_exp, self.perfil.xp_siguiente_nivel = nivel, 0, 10
+        with mock.patch.object(Perfil, 'save'), mock.patch.object(Notificacion.objects, 'bulk_create'):
+            self.perfil.add_exp(10)
+        self.assertEqual((self.perfil.nivel, self.perfil.puntos_exp), (nivel + 1, 0))
+        self.assertEqual(self.perfil.xp_siguiente_nivel, int(100 * math.pow(1.2, nivel + 1)))
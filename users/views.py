@@ -5,21 +5,29 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+import hashlib
 import json
 import logging
 from django.shortcuts import get_object_or_404
 from .forms import UserForm
 
-from django.core.paginator import Paginator
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Q
 from django.db.models import Count
 
 
 from .models import CreateUser, Perfil, LogroUsuario, Create_subs
+from .busqueda import buscar_jugadores
+from .indice_nicknames import obtener_indice
+from .paginacion import paginar
 
 # Configuración de logging
 logger = logging.getLogger(__name__)
 
+# Estadísticas del directorio de jugadores en caché (ver estadisticas_jugadores)
+CLAVE_ESTADISTICAS_JUGADORES = 'jugadores:estadisticas'
+
 @require_http_methods(["GET", "POST"])
 def registrar_usuario(request):
     """
@@ -174,44 +182,77 @@ def recuperar_contrasena(request):
     return render(request, 'contraseña_olvidada.html')
 
 
+def estadisticas_jugadores():
+    """
+    Total de jugadores activos y cuántos están en línea, en una sola consulta.
+
+    Se guardan en caché JUGADORES_ESTADISTICAS_TIMEOUT segundos: cada página del
+    directorio las muestra y no necesitan estar al segundo.
+    """
+    estadisticas = cache.get(CLAVE_ESTADISTICAS_JUGADORES)
+    if estadisticas is None:
+        estadisticas = CreateUser.objects.filter(is_active=True).aggregate(
+            total=Count('id'),
+            online=Count('id', filter=Q(perfil__estado_actividad='ONLINE')),
+        )
+        cache.set(CLAVE_ESTADISTICAS_JUGADORES, estadisticas,
+                  getattr(settings, 'JUGADORES_ESTADISTICAS_TIMEOUT', 10))
+    return estadisticas
+
+
+def contar_resultados(jugadores_list, search, rango):
+    """Número de jugadores que cumplen los filtros, en caché igual que las estadísticas."""
+    huella = hashlib.sha1(repr((search, rango)).encode('utf-8')).hexdigest()
+    clave = f'{CLAVE_ESTADISTICAS_JUGADORES}:{huella}'
+    resultados = cache.get(clave)
+    if resultados is None:
+        resultados = jugadores_list.count()
+        cache.set(clave, resultados, getattr(settings, 'JUGADORES_ESTADISTICAS_TIMEOUT', 10))
+    return resultados
+
+
 def jugadores(request):
    
-    # Obtener todos los jugadores con sus perfiles relacionados
+    # Obtener todos los jugadores con sus perfiles relacionados (también los que no tienen
+    # perfil, que cuentan en el total de jugadores y se muestran al final)
     jugadores_list = CreateUser.objects.select_related('perfil').filter(is_active=True)
     
-    # Búsqueda por nickname
-    search = request.GET.get('search')
-    if search:
-        jugadores_list = jugadores_list.filter(
-            Q(nickname__icontains=search) | 
-            Q(username__icontains=search) |
-            Q(first_name__icontains=search)
-        )
-    
     # Filtro por rango
     rango = request.GET.get('rango')
     if rango:
         jugadores_list = jugadores_list.filter(perfil__rango=rango)
     
-    # Ordenar por nivel (descendente) y después por puntos de experiencia
-    jugadores_list = jugadores_list.order_by('-perfil__nivel', '-perfil__puntos_exp', 'nickname')
+    # Ordenar por nivel (descendente), después por puntos de experiencia y nickname;
+    # el usuario desempata para que el orden sea total (lo necesita la paginación por
+    # cursor). Son las columnas del índice perfil_clasificacion_idx de Perfil; el id del
+    # usuario en lugar de perfil__user_id porque sin perfil sería nulo (esos van al final)
+    orden = [
+        ('perfil__nivel', True), ('perfil__puntos_exp', True),
+        ('perfil__nickname_orden', False), ('id', False),
+    ]
+    
+    # Búsqueda por nickname, username o nombre en el índice de trigramas (users.busqueda),
+    # los más parecidos primero
+    search = request.GET.get('search')
+    if search:
+        jugadores_list = buscar_jugadores(jugadores_list, search)
+        orden.insert(0, ('relevancia', True))
     
-    # Paginación
-    paginator = Paginator(jugadores_list, 12)  # 12 jugadores por página
-    page_number = request.GET.get('page')
-    jugadores = paginator.get_page(page_number)
+    # Paginación por cursor: 12 jugadores por página, sin OFFSET ni COUNT(*) por página
+    jugadores = paginar(jugadores_list, orden, request.GET.get('cursor'), tamano=12)
     
     # Estadísticas para mostrar
-    total_jugadores = CreateUser.objects.filter(is_active=True).count()
-    jugadores_online = CreateUser.objects.filter(
-        is_active=True, 
-        perfil__estado_actividad='ONLINE'
-    ).count()
+    estadisticas = estadisticas_jugadores()
+    if search or rango:
+        resultados = contar_resultados(jugadores_list, search, rango)
+    else:
+        resultados = estadisticas['total']
     
     context = {
         'jugadores': jugadores,
-        'total_jugadores': total_jugadores,
-        'jugadores_online': jugadores_online,
+        'total_jugadores': estadisticas['total'],
+        'jugadores_online': estadisticas['online'],
+        'resultados': resultados,
         'search': search,
         'rango_filter': rango,
     }
@@ -239,23 +280,18 @@ def eliminar_jugador(request):
     return render(request, 'eliminar_jugador.html', {'jugador_list': jugador_list})
 
 def autocomplete_nicknames(request):
-    """Endpoint para autocompletado de nicknames"""
-    print(f"Autocomplete request received: {request.method}, term: {request.GET.get('term', '')}")
-    
+    """
+    Endpoint para autocompletado de nicknames.
+
+    Busca en el índice en memoria de usuarios activos (ver users.indice_nicknames); solo
+    consulta la base de datos para cargarlo cuando aún no está cargado o está desfasado.
+    """
     if request.method == 'GET':
-        term = request.GET.get('term', '')
-        print(f"Searching for term: '{term}', length: {len(term)}")
+        term = request.GET.get('term', '').strip()
         
         if len(term) >= 2:  # Solo buscar si hay al menos 2 caracteres
-            from .models import CreateUser
-            nicknames = CreateUser.objects.filter(
-                Q(nickname__icontains=term) | Q(username__icontains=term)
-            ).values_list('nickname', 'username', 'id')[:10]  # Limitar a 10 resultados
-            
-            print(f"Found {nicknames.count() if hasattr(nicknames, 'count') else len(nicknames)} results")
-            
             results = []
-            for nickname, username, user_id in nicknames:
+            for user_id, nickname, username in obtener_indice().buscar(term, limite=10):
                 display_name = nickname if nickname else username
                 results.append({
                     'id': user_id,
@@ -264,7 +300,7 @@ def autocomplete_nicknames(request):
                     'username': username
                 })
             
-            print(f"Returning results: {results}")
+            logger.debug("Autocompletado - Término: '%s', Resultados: %s", term, len(results))
             return JsonResponse(results, safe=False)
         else:
             return JsonResponse([], safe=False)
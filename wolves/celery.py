@@ -0,0 +1,17 @@
+"""
+Celery config for wolves project.
+
+Workers: celery -A wolves worker -l info
+Sin CELERY_BROKER_URL en el entorno, las tareas se ejecutan en el mismo proceso
+(ver CELERY_TASK_ALWAYS_EAGER en settings).
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wolves.settings')
+
+app = Celery('wolves')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -51,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'home.trazas.TrazasMiddleware',
 ]
 
 ROOT_URLCONF = 'wolves.urls'
@@ -90,6 +91,72 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# La clasificación de puntos_generales se guarda en caché con un contador de versión
+# (ver home/cache.py). Con varios procesos de gunicorn usar un backend compartido
+# (archivos o Redis), ya que la memoria local es propia de cada proceso.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'wolves',
+    }
+}
+
+# Segundos que una clasificación calculada permanece en caché
+CLASIFICACION_CACHE_TIMEOUT = 3600
+
+# Lo mismo cuando la caché no es compartida (LocMemCache): un cambio solo invalida la copia
+# del proceso que lo hizo, los demás la vuelven a calcular al caducar
+CLASIFICACION_CACHE_TIMEOUT_PROCESO = 30
+
+# Segundos que verificar_nickname guarda los datos de un jugador (se borran antes si
+# el jugador registra asistencia)
+JUGADOR_CACHE_TIMEOUT = 60
+
+# Segundos que cada proceso guarda las fechas de evento cuando la caché no es compartida
+# (LocMemCache): guardar o borrar una Fecha solo borra la copia del proceso que la cambió,
+# los demás la vuelven a leer al caducar. Con una caché compartida no caducan.
+FECHAS_CACHE_TIMEOUT = 30
+
+# Igual para la tabla de posiciones en memoria (home/tabla_posiciones.py) y el índice de
+# nicknames del autocompletado (users/indice_nicknames.py): con LocMemCache cada proceso
+# los recarga de la base de datos tras estos segundos para ver los cambios de los demás
+CLASIFICACION_TABLA_TIMEOUT = 30
+NICKNAMES_INDICE_TIMEOUT = 30
+
+# Segundos que el directorio de jugadores guarda el total, los jugadores en línea y el
+# número de resultados de cada búsqueda
+JUGADORES_ESTADISTICAS_TIMEOUT = 10
+
+# Segundos que se recuerda que una miniatura no se pudo generar (imagen dañada, ausente o
+# demasiado grande): mientras, las plantillas muestran el original sin volver a intentarlo
+MINIATURAS_FALLO_TIMEOUT = 300
+
+
+# Celery
+# https://docs.celeryq.dev/en/stable/django/first-steps-with-django.html
+# Sin broker configurado se usa el transporte en memoria y las tareas se ejecutan
+# en el mismo proceso (modo eager), útil en desarrollo y en tests.
+
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'memory://')
+CELERY_TASK_ALWAYS_EAGER = 'CELERY_BROKER_URL' not in os.environ
+CELERY_TASK_EAGER_PROPAGATES = True
+
+# Segundos que se agrupan los registros de asistencia antes de recalcular la clasificación.
+# Solo se agrupan con una caché compartida (Redis, Memcached...) y un broker de Celery: sin
+# broker el recálculo se hace dentro de la petición que registra la asistencia (ver home/tasks.py)
+CLASIFICACION_DEBOUNCE_SEGUNDOS = 5
+
+# Instantánea de la clasificación que todos los workers leen con mmap (home/instantanea.py).
+# Se reescribe tras cada recálculo; None (por defecto) la desactiva y cada proceso usa su
+# propia tabla. Su versión se compara con un contador de la caché, así que solo se usa con
+# una caché compartida entre procesos (Redis, Memcached...): con LocMemCache se ignora.
+# Conviene un directorio en memoria fuera del proyecto, ej: /dev/shm/wolves/clasificacion.bin
+CLASIFICACION_INSTANTANEA = os.environ.get('CLASIFICACION_INSTANTANEA') or None
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -130,6 +197,70 @@ STATICFILES_DIRS = [
 ]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Segundos durante los que una imagen recién subida no se borra aunque aún no la use ningún
+# registro (ver home/almacenamiento.py); después la borra el comando limpiar_archivos
+ARCHIVOS_GRACIA_SEGUNDOS = 600
+
+# Logging
+# https://docs.djangoproject.com/en/5.1/topics/logging/
+# El logger 'asistencia_debug' escribe sin bloquear las peticiones: los mensajes pasan
+# por una cola y un hilo aparte los guarda en logs/asistencia_debug.<pid>.log (un archivo
+# rotativo por proceso, con los más antiguos borrados al pasar de max_total_bytes).
+# Ver home/logs.py.
+
+LOGS_DIR = BASE_DIR / 'logs'
+
+# Nivel del log de asistencias: DEBUG escribe la traza completa; INFO o superior la
+# desactiva (cada logger.debug cuesta solo la comprobación del nivel)
+ASISTENCIA_LOG_NIVEL = os.environ.get('ASISTENCIA_LOG_NIVEL', 'DEBUG' if DEBUG else 'INFO')
+
+# Fracción de mensajes DEBUG que se escriben (1.0 = todos)
+ASISTENCIA_LOG_MUESTREO = float(os.environ.get('ASISTENCIA_LOG_MUESTREO', '1.0'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'asistencia': {
+            'format': '%(asctime)s - %(levelname)s - %(message)s',
+        },
+    },
+    'filters': {
+        'muestreo': {
+            '()': 'home.logs.FiltroMuestreo',
+            'proporcion': ASISTENCIA_LOG_MUESTREO,
+        },
+    },
+    'handlers': {
+        'asistencia_debug': {
+            '()': 'home.logs.ColaHandler',
+            'archivo': LOGS_DIR / 'asistencia_debug.log',
+            'max_bytes': 5 * 1024 * 1024,
+            'backup_count': 5,
+            'retencion_dias': 7,
+            # Entre todos los procesos (los pids cambian en cada reinicio y cada comando)
+            'max_total_bytes': 50 * 1024 * 1024,
+            'formatter': 'asistencia',
+            'filters': ['muestreo'],
+        },
+    },
+    'loggers': {
+        'asistencia_debug': {
+            'handlers': ['asistencia_debug'],
+            'level': ASISTENCIA_LOG_NIVEL,
+            'propagate': False,
+        },
+    },
+}
+
+# Trazas por petición (home/trazas.py): tiempo, consultas y tiempo de base de datos de
+# cada parte de la petición, en la cabecera Server-Timing y en /admin/trazas/
+TRAZAS_ACTIVAS = True
+
+# Número de peticiones recientes que conserva cada proceso para /admin/trazas/
+TRAZAS_GUARDADAS = 100
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -0,0 +1,17 @@
+"""
+Settings para medir el rendimiento sin un servidor MySQL.
+
+    python manage.py medir_rendimiento --settings=wolves.settings_medicion
+
+Todo es igual que en wolves/settings.py salvo la base de datos: SQLite, con la base de
+pruebas en memoria. Sin --settings, medir_rendimiento usa el motor configurado (y crea
+la base test_<nombre>).
+"""
+from wolves.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
@@ -20,8 +20,10 @@ from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    # home va antes que el admin de Django: sus vistas de staff viven bajo admin/ y
+    # el admin responde 404 a cualquier ruta admin/ que no reconozca
     path('', include('home.urls')),
+    path('admin/', admin.site.urls),
     path('users/', include('users.urls')),
     path('ger/', include('ger.urls')),
 ]